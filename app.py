@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.helpers import initialize_session_state
+from utils.warmup import start_warmup
 
 # Initialize session state MUST be the first Streamlit command
 initialize_session_state()
@@ -31,4 +32,8 @@ This application demonstrates how an agentic framework could potentially handle
 
 st.info("Please configure your OpenAI API key in `.streamlit/secrets.toml` before running.")
 
-# You can add more introductory content or images here.
\ No newline at end of file
+# You can add more introductory content or images here.
+
+# The page is on screen; load the embedding model, FAISS index and Gemini client in the
+# background so the other pages don't have to wait for them on first use.
+start_warmup()
@@ -0,0 +1,88 @@
+"""
+Import / first-paint time of the app's modules, each measured in fresh interpreters.
+
+"landing page" runs app.py once through Streamlit's AppTest (streamlit itself is
+imported beforehand, as it is in a running server), which is the time before the
+first page is complete. --ref compares against another git revision, checked out
+in a temporary worktree (e.g. the commit before lazy initialization).
+
+    python benchmarks/import_time.py [--repeat 5] [--ref HEAD~1]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "landing page (app.py)": "from streamlit.testing.v1 import AppTest; AppTest.from_file('app.py', default_timeout=600).run()",
+    "import utils.helpers": "import utils.helpers",
+    "import utils.agents": "import utils.agents",
+    "import utils.pipeline": "import utils.pipeline",
+}
+
+# Runs one statement in the child and prints how long it took
+_CHILD = """
+import sys, time, json, logging, warnings
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+import streamlit
+sys.path.insert(0, ".")
+started = time.perf_counter()
+exec({statement!r})
+print(json.dumps(time.perf_counter() - started))
+"""
+
+def measure(tree, statement, repeat):
+    """Median and all timings (seconds) of running statement in `repeat` fresh interpreters inside tree."""
+    env = {**os.environ, "WARMUP": "0"} # Measure the page itself, not the background warm-up
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", _CHILD.format(statement=statement)],
+                                cwd=tree, env=env, capture_output=True, text=True, timeout=900)
+        if result.returncode != 0:
+            raise RuntimeError(f"{statement!r} failed in {tree}:\n{result.stderr[-2000:]}")
+        timings.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings), timings
+
+def _worktree(ref):
+    path = tempfile.mkdtemp(prefix="import-time-")
+    subprocess.run(["git", "worktree", "add", "--detach", path, ref], cwd=ROOT, check=True, capture_output=True)
+    # Same knowledge base files and saved index as the working tree, so both load the same data
+    for name in ("data", ".kb_index", ".streamlit"):
+        if os.path.exists(os.path.join(ROOT, name)) and not os.path.exists(os.path.join(path, name)):
+            os.symlink(os.path.join(ROOT, name), os.path.join(path, name))
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ref", help="git revision to compare against")
+    args = parser.parse_args()
+
+    trees = {"working tree": ROOT}
+    if args.ref:
+        trees = {args.ref: _worktree(args.ref), **trees}
+    try:
+        results = {}
+        for name, statement in TARGETS.items():
+            for label, tree in trees.items():
+                median, timings = measure(tree, statement, args.repeat)
+                results[(name, label)] = median
+                print(f"{name:<26} {label:<14} median {median * 1000:8.0f}ms  "
+                      f"(min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms)")
+            if args.ref:
+                before, after = results[(name, args.ref)], results[(name, "working tree")]
+                print(f"{'':<26} {'speed-up':<14} {before / after:8.1f}x")
+    finally:
+        if args.ref:
+            subprocess.run(["git", "worktree", "remove", "--force", trees[args.ref]], cwd=ROOT, capture_output=True)
+            shutil.rmtree(trees[args.ref], ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
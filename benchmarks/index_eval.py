@@ -0,0 +1,92 @@
+"""
+Recall vs latency of the knowledge base index types (see utils/index_spec.py) on a
+synthetic corpus, against the exact flat index.
+
+The corpus is a mixture of Gaussian clusters on the unit sphere (roughly how sentence
+embeddings of related documents sit), and the queries are held-out points from the
+same mixture. For each spec it reports build (incl. training) time, index size,
+p50/p99 single-query latency and recall@k: the share of the flat index's top k that
+the index also returns.
+
+    python benchmarks/index_eval.py [--vectors 20000] [--queries 500] [--k 10]
+                                    [--specs flat hnsw ivf ivfpq hnsw:ef_search=128 ivf:nprobe=4]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.index_spec import parse_index_spec, build_index, MIN_APPROXIMATE_VECTORS
+
+DIMENSIONS = 384  # all-MiniLM-L6-v2
+
+def synthetic_corpus(vectors, queries, dimensions=DIMENSIONS, clusters=None, spread=2.5, seed=0):
+    """(corpus, queries): unit vectors drawn around `clusters` random centres; spread sets how much clusters overlap."""
+    rng = np.random.default_rng(seed)
+    clusters = clusters or max(1, vectors // 100)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    def _draw(n):
+        points = centres[rng.integers(clusters, size=n)] + spread * rng.standard_normal((n, dimensions)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+    return _draw(vectors), _draw(queries)
+
+def _build(spec, corpus):
+    import faiss
+    started = time.perf_counter()
+    index = build_index(spec, corpus)
+    if index is None:  # flat
+        index = faiss.IndexFlatL2(corpus.shape[1])
+        index.add(corpus)
+    return index, time.perf_counter() - started
+
+def evaluate(spec, corpus, queries, k, exact):
+    """Build seconds, size (MB), latencies (ms) and recall@k of one spec against the exact top k."""
+    import faiss
+    index, build_seconds = _build(spec, corpus)
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(ids) & set(truth)) / k for ids, truth in zip(found, exact)])
+    return {
+        "build_s": build_seconds,
+        "size_mb": faiss.serialize_index(index).nbytes / 2**20,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "recall": float(recall),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (the app searches one query batch at a time)")
+    parser.add_argument("--spread", type=float, default=2.5, help="cluster overlap: higher is harder for IVF/PQ")
+    parser.add_argument("--specs", nargs="+", default=["flat", "hnsw", "ivf", "ivfpq"])
+    args = parser.parse_args()
+    specs = [parse_index_spec(spec) for spec in args.specs]  # fail on a typo before building anything
+    if args.vectors < MIN_APPROXIMATE_VECTORS:
+        parser.error(f"--vectors must be at least {MIN_APPROXIMATE_VECTORS}; smaller corpora always use the flat index")
+
+    import faiss
+    faiss.omp_set_num_threads(args.threads)
+    corpus, queries = synthetic_corpus(args.vectors, args.queries, spread=args.spread)
+    flat = faiss.IndexFlatL2(DIMENSIONS)
+    flat.add(corpus)
+    _, exact = flat.search(queries, args.k)
+
+    print(f"{args.vectors} vectors x {DIMENSIONS} dims, {args.queries} queries, recall@{args.k} vs flat, {args.threads} thread(s)\n")
+    print(f"{'spec':<28} {'build':>8} {'size':>9} {'p50':>9} {'p99':>9} {'recall':>7}")
+    for spec in specs:
+        result = evaluate(spec, corpus, queries, args.k, exact)
+        print(f"{str(spec):<28} {result['build_s']:7.2f}s {result['size_mb']:7.1f}MB "
+              f"{result['p50_ms']:7.3f}ms {result['p99_ms']:7.3f}ms {result['recall']:7.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-process memory of the saved FAISS index with several server processes attached,
+memory-mapped (KB_MMAP_INDEX=1, the default) vs read into each process.
+
+Builds a synthetic index of --vectors random embeddings, then starts --workers
+processes that all load it and run a search at the same time. Reports each worker's
+PSS growth (shared pages are divided between the processes mapping them), which is
+what the index costs per worker. Linux only (reads /proc/self/smaps_rollup).
+
+    python benchmarks/index_memory.py [--vectors 200000] [--workers 4]
+"""
+import os
+import sys
+import logging
+import argparse
+import tempfile
+import warnings
+import multiprocessing
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.index_store import index_settings, build_manifest, load_index, save_index
+
+import langchain.vectorstores  # noqa: E402,F401 -- resets the warning filters on import, so silence after it
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING) # langchain's deprecation notices, repeated by every worker
+
+DIMENSIONS = 384  # all-MiniLM-L6-v2
+SETTINGS = index_settings("synthetic", 0, 0)
+
+def _memory_mb():
+    """{"Rss", "Pss", ...} of this process in MB."""
+    with open("/proc/self/smaps_rollup") as f:
+        fields = (line.split() for line in f if line.rstrip().endswith("kB"))
+        return {parts[0].rstrip(":"): int(parts[1]) / 1024 for parts in fields}
+
+def _worker(index_dir, mmap, ready, done, results):
+    import faiss  # noqa: F401 -- imported first so only the index itself is measured
+    before = _memory_mb()
+    vector_store, _ = load_index(None, SETTINGS, index_dir, mmap=mmap)
+    # Touch every page of the index, as a search over a flat index does
+    vector_store.index.search(np.random.rand(1, DIMENSIONS).astype("float32"), 4)
+    ready.wait()  # everyone has it loaded: shared pages are now split between all workers
+    after = _memory_mb()
+    results.put({key: after[key] - before[key] for key in ("Rss", "Pss")})
+    done.wait()
+
+def build(index_dir, vectors):
+    import faiss
+    from langchain.vectorstores import FAISS
+    from langchain.docstore.in_memory import InMemoryDocstore
+    index = faiss.IndexFlatL2(DIMENSIONS)
+    index.add(np.random.rand(vectors, DIMENSIONS).astype("float32"))
+    vector_store = FAISS(None, index, InMemoryDocstore({}), {})
+    save_index(vector_store, build_manifest(SETTINGS, {}), index_dir)
+    return os.path.getsize(os.path.join(index_dir, "index.faiss")) / 2**20
+
+def run(index_dir, workers, mmap):
+    context = multiprocessing.get_context("spawn")
+    ready, done, results = context.Barrier(workers), context.Barrier(workers + 1), context.Queue()
+    processes = [context.Process(target=_worker, args=(index_dir, mmap, ready, done, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measured = [results.get(timeout=600) for _ in processes]
+    done.wait()
+    for process in processes:
+        process.join()
+    return measured
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        size = build(index_dir, args.vectors)
+        print(f"Index: {args.vectors} vectors, {size:.0f}MB on disk, {args.workers} workers\n")
+        for label, mmap in (("read", False), ("mmap", True)):
+            measured = run(index_dir, args.workers, mmap)
+            pss = sum(m["Pss"] for m in measured) / len(measured)
+            rss = sum(m["Rss"] for m in measured) / len(measured)
+            print(f"{label:<5} per worker: PSS +{pss:7.1f}MB  RSS +{rss:7.1f}MB  "
+                  f"(all workers: PSS +{pss * args.workers:.0f}MB)")
+
+if __name__ == "__main__":
+    main()
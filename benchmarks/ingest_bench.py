@@ -0,0 +1,102 @@
+"""
+Throughput and peak memory of knowledge base ingestion (utils/ingest.py) on a
+synthetic archive of txt/md/html/pdf files.
+
+For each --files size it writes that many files (a quarter of each format) into a
+temporary data/ subdirectory, indexes them from scratch with a fresh
+KnowledgeBaseIndexer and reports the per-stage rates and the Python heap: what the
+indexer keeps afterwards (chunks, BM25 and FAISS indexes) and the transient peak on
+top of that. Files are extracted a bounded window at a time and dropped once split,
+and chunks are embedded in fixed-size batches into float32 arrays, so the transient
+part grows with the number of chunks (the BM25 build and the final copy into FAISS)
+rather than with the archive's size in bytes. tracemalloc slows the run down:
+compare the rates between modes and sizes, not with production.
+
+    KB_INGEST_WORKERS=4 python benchmarks/ingest_bench.py [--files 200 1000 5000] [--mode dense|bm25]
+"""
+import os
+import sys
+import zlib
+import logging
+import argparse
+import tempfile
+import warnings
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.knowledge_base import KnowledgeBaseIndexer
+
+COURSES = ["MBA", "B.Tech Computer Science", "B.Tech Data Science", "M.Sc Physics", "BBA"]
+
+def _lines(i):
+    course = COURSES[i % len(COURSES)]
+    return [
+        f"Notice {i}:",
+        f"- Course: {course}",
+        f"- Orientation for {course} batch {i} is held in hall {i % 17} at {9 + i % 8}am.",
+        f"- Submit the signed undertaking and fee receipt {i} to the admissions office.",
+        "General:",
+        f"- Hostel allotment list {i} will be posted on the notice board within {i % 5 + 2} days.",
+    ]
+
+def _pdf(lines):
+    # One page, one Flate content stream: what the built-in extractor handles without pypdf
+    escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+    content = zlib.compress(("BT /F1 11 Tf 72 720 Td " + " T* ".join(f"({line}) Tj" for line in escaped) + " ET").encode("latin-1"))
+    return (b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog >>\nendobj\n"
+            + b"4 0 obj\n<< /Length " + str(len(content)).encode() + b" /Filter /FlateDecode >>\nstream\n"
+            + content + b"\nendstream\nendobj\n%EOF\n")
+
+def write_archive(data_dir, files):
+    """Writes `files` notices under data_dir/archive/<format>/."""
+    for i in range(files):
+        lines = _lines(i)
+        kind = ("txt", "md", "html", "pdf")[i % 4]
+        folder = os.path.join(data_dir, "archive", kind)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"notice_{i}.{kind}")
+        if kind == "pdf":
+            with open(path, "wb") as f:
+                f.write(_pdf(lines))
+            continue
+        if kind == "md":
+            text = "\n".join(("## " + line.rstrip(":")) if line.endswith(":") else line.replace("- ", "* ", 1) for line in lines)
+        elif kind == "html":
+            text = "<html><body>" + "".join(
+                f"<h2>{line.rstrip(':')}</h2>" if line.endswith(":") else f"<li>{line[2:]}</li>" for line in lines
+            ) + "</body></html>"
+        else:
+            text = "\n".join(lines)
+        with open(path, "w") as f:
+            f.write(text)
+
+def run(files, mode):
+    with tempfile.TemporaryDirectory() as root:
+        data_dir = os.path.join(root, "data")
+        write_archive(data_dir, files)
+        indexer = KnowledgeBaseIndexer(data_dir=data_dir, index_dir=os.path.join(root, "index"), mode=mode)
+        tracemalloc.start()
+        indexer.load()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return indexer.last_ingest, retained / 2**20, (peak - retained) / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--mode", choices=["dense", "bm25"], default="dense",
+                        help="bm25 skips the embedding model (extraction and splitting only)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.disable(logging.WARNING)
+    print(f"{'files':>6} {'files/s':>9} {'MB/s':>7} {'chunks':>7} {'chunks/s':>9} {'emb/s':>8} {'total':>8} {'retained':>9} {'transient':>10}")
+    for files in args.files:
+        stats, retained, transient = run(files, args.mode)
+        rates = stats.rates()
+        print(f"{stats.files:>6} {rates['files/s']:9.0f} {rates['MB/s']:7.2f} {stats.chunks:>7} {rates['chunks/s']:9.0f} "
+              f"{rates['embeddings/s']:8.0f} {stats.total_seconds:7.2f}s {retained:7.1f}MB {transient:8.1f}MB")
+
+if __name__ == "__main__":
+    main()
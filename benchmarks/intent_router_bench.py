@@ -0,0 +1,127 @@
+"""
+Accuracy and latency of the director bot's intent router (utils/intents.py).
+
+Routes a held-out set of labeled questions (rephrasings not in INTENT_EXAMPLES, plus
+open-ended questions that should go to the LLM) and compares the embedding router
+with the bot's original keyword rules.
+
+    python benchmarks/intent_router_bench.py [--threshold 0.6] [--sweep]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.embeddings import HuggingFaceEmbeddings
+from utils.intents import IntentRouter, keyword_intent, DEFAULT_THRESHOLD
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # same model as the knowledge base (utils/knowledge_base.py)
+
+# (question, expected intent); None means "open question, should go to the LLM"
+EVAL_SET = [
+    ("How many applications are there right now?", "total_applications"),
+    ("what's our applicant count", "total_applications"),
+    ("How many students applied in total?", "total_applications"),
+    ("Tell me the number of submissions we've had", "total_applications"),
+    ("total number of applicants?", "total_applications"),
+    ("Give me an overview of where every application stands", "status_overview"),
+    ("status summary please", "status_overview"),
+    ("Break down the applications by their current status", "status_overview"),
+    ("What stage are applications at?", "status_overview"),
+    ("How far along is the admissions process overall?", "status_overview"),
+    ("How many candidates are on the shortlist?", "shortlisted_count"),
+    ("shortlisted applicants count", "shortlisted_count"),
+    ("How many students got shortlisted?", "shortlisted_count"),
+    ("How many people passed shortlisting?", "shortlisted_count"),
+    ("How many students have confirmed admission?", "confirmed_count"),
+    ("number of seats confirmed", "confirmed_count"),
+    ("How many admissions have been finalized?", "confirmed_count"),
+    ("How many offers have been accepted so far?", "confirmed_count"),
+    ("How much is left in the loan budget?", "loan_budget"),
+    ("remaining loan money", "loan_budget"),
+    ("What funds remain for student loans?", "loan_budget"),
+    ("Do we still have budget for loans?", "loan_budget"),
+    ("How many student loans did we approve?", "approved_loans"),
+    ("What's the total value of loans approved?", "approved_loans"),
+    ("loan approvals so far", "approved_loans"),
+    ("How much money has been lent out?", "approved_loans"),
+    ("Which course has the most applicants?", "course_breakdown"),
+    ("applications per programme", "course_breakdown"),
+    ("How are applications split across courses?", "course_breakdown"),
+    ("How many applied for each course?", "course_breakdown"),
+    ("What is the procedure after shortlisting?", None),
+    ("What documents does a student need to submit?", None),
+    ("Explain the fee structure for MBA", None),
+    ("What are the eligibility criteria for B.Tech?", None),
+    ("How should we improve the admission process?", None),
+    ("Who is eligible for a student loan?", None),
+    ("Write a welcome message for new students", None),
+    ("When does the semester start?", None),
+    ("What is the hostel fee?", None),
+    ("Can international students apply?", None),
+]
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def evaluate(predict, eval_set=EVAL_SET):
+    """Runs predict(question) -> intent over the eval set; returns accuracy figures and latencies (ms)."""
+    latencies, correct, in_scope_correct, misrouted_open = [], 0, 0, 0
+    errors = []
+    for question, expected in eval_set:
+        started = time.perf_counter()
+        predicted = predict(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if predicted == expected:
+            correct += 1
+            in_scope_correct += expected is not None
+        else:
+            errors.append((question, expected, predicted))
+            misrouted_open += expected is None and predicted is not None
+    in_scope = sum(1 for _, expected in eval_set if expected is not None)
+    return {
+        "accuracy": correct / len(eval_set),
+        "in_scope_recall": in_scope_correct / in_scope,
+        "open_misrouted": misrouted_open,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 0.95),
+        "errors": errors,
+    }
+
+def _print_result(name, result, show_errors=False):
+    print(f"{name:<28} accuracy {result['accuracy']:.1%}  in-scope recall {result['in_scope_recall']:.1%}  "
+          f"open->intent {result['open_misrouted']}  p50 {result['p50_ms']:.2f}ms  p95 {result['p95_ms']:.2f}ms")
+    if show_errors:
+        for question, expected, predicted in result["errors"]:
+            print(f"    {question!r}: expected {expected}, got {predicted}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--sweep", action="store_true", help="also report accuracy over a range of thresholds")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    router = IntentRouter(embeddings, threshold=args.threshold)
+    print(f"Loaded model and embedded {len(router.labels)} examples in {time.perf_counter() - started:.2f}s")
+    print(f"{len(EVAL_SET)} held-out questions ({sum(1 for _, e in EVAL_SET if e is None)} open-ended)\n")
+
+    _print_result("keyword rules", evaluate(keyword_intent))
+    _print_result(f"router (cold, t={args.threshold})", evaluate(lambda q: router.route(q)[0]), show_errors=True)
+    _print_result(f"router (cached, t={args.threshold})", evaluate(lambda q: router.route(q)[0]))
+    # What the bot actually does: keyword rules first, router for everything else
+    _print_result("keywords + router", evaluate(lambda q: keyword_intent(q) or router.route(q)[0]))
+
+    if args.sweep:
+        print()
+        for threshold in (0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.75):
+            router.threshold = threshold
+            _print_result(f"router t={threshold}", evaluate(lambda q: router.route(q)[0]))
+
+if __name__ == "__main__":
+    main()
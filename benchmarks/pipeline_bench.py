@@ -0,0 +1,252 @@
+"""
+End-to-end throughput and latency of the agents on synthetic applications, run
+headless against the local FakeModel (utils/llm.py) instead of Gemini.
+
+Applications (benchmarks/synthetic_applicants.py) take the officer view's path, one
+agent call at a time: submitted -> document_checking_agent -> shortlisting_agent ->
+student_counsellor_agent with the decision; --accept-rate of the shortlisted then
+have their admission confirmed (with the final letter and fee slip), and those who
+asked for a loan go through student_loan_agent. After every batch director_bot_agent
+answers DIRECTOR_QUERIES, so its latency can be followed as the tables grow. Every
+call is timed: the report gives per-stage throughput (calls per second of time spent
+in that stage) and p50/p95/p99 latency.
+
+Everything runs in a scratch working directory with its own SQLite stores, uploads,
+LLM response cache, outbox and knowledge base index (data/ is copied in), so the
+app's storage/ is never touched. Each run is appended to --output as one JSON line
+with the git revision, and compared with the last saved run of the same configuration.
+
+    python benchmarks/pipeline_bench.py [--applications 1000] [--batch-size 500]
+        [--llm-latency 0.05] [--llm-failure-rate 0] [--retrieval-mode bm25]
+        [--output benchmarks/results/pipeline_bench.jsonl] [--no-save]
+"""
+import os
+import sys
+import json
+import time
+import array
+import random
+import shutil
+import logging
+import argparse
+import resource
+import contextlib
+import tempfile
+import warnings
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_applicants import DocumentPool, generate_applications, loan_request
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "pipeline_bench.jsonl")
+STAGES = ("submit", "document_check", "shortlisting", "counsellor", "confirm", "loan", "director")
+
+# A dashboard's worth of director questions: local analytics, intents and one open question for the LLM
+DIRECTOR_QUERIES = [
+    "How many applications are there?",
+    "status overview",
+    "What is the remaining loan budget?",
+    "How many loans have been approved?",
+    "average grade 12 of shortlisted MBA applicants by status",
+    "How could we make the admission process easier for first-generation students?",
+]
+
+class StageTimer:
+    """Latencies of one stage's calls (kept as doubles: a million calls is 8MB)."""
+
+    def __init__(self):
+        self.latencies = array.array("d")
+
+    def time(self, function, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def summary(self):
+        if not self.latencies:
+            return {"calls": 0}
+        latencies = np.frombuffer(self.latencies, dtype=np.float64)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        return {
+            "calls": len(latencies),
+            "seconds": round(float(latencies.sum()), 3),
+            "per_second": round(len(latencies) / float(latencies.sum()), 1) if latencies.sum() > 0 else None,
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(latencies.max()) * 1000, 3),
+        }
+
+def _git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _prepare_environment(workdir, args):
+    # The app's stores, caches and clients all use paths relative to the working directory
+    # and read their settings from the environment when first created, so both are set
+    # before anything from utils is imported.
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY": str(args.llm_latency),
+        "LLM_FAKE_FAILURE_RATE": str(args.llm_failure_rate),
+        "KB_RETRIEVAL_MODE": args.retrieval_mode,
+        "WARMUP": "0",
+    })
+    warnings.filterwarnings("ignore")
+    logging.disable(logging.WARNING)  # Streamlit complains about every call made outside `streamlit run`
+
+def run(args):
+    """Runs the pipeline; returns the result record (config, stages, outcomes, ...)."""
+    import streamlit as st
+    from utils.agents import (
+        document_checking_agent, shortlisting_agent, student_counsellor_agent, student_loan_agent, director_bot_agent
+    )
+    from utils.helpers import get_gemini_model, get_llm_cache_stats, get_outbox, initialize_session_state
+    from utils.db import get_repository
+    from utils.uploads import get_upload_store
+    from utils.knowledge_base import get_indexer
+
+    initialize_session_state()
+    rng = random.Random(args.seed)
+    timers = {stage: StageTimer() for stage in STAGES}
+    repository = get_repository()
+    documents = DocumentPool(get_upload_store(), distinct=args.distinct_documents, seed=args.seed)
+    get_indexer()  # load the knowledge base up front, not inside the first timed call
+
+    started = time.perf_counter()
+    done = 0
+    while done < args.applications:
+        batch = list(generate_applications(min(args.batch_size, args.applications - done), documents, seed=args.seed, start=done))
+        for application in batch:
+            timers["submit"].time(repository.add, application)
+        for application in batch:
+            timers["document_check"].time(document_checking_agent, application)
+            if application["status"] == "Documents Complete":
+                timers["shortlisting"].time(shortlisting_agent, application)
+            timers["counsellor"].time(student_counsellor_agent, application)
+
+        for application in batch:
+            if application["status"] != "Shortlisted" or rng.random() >= args.accept_rate:
+                continue
+            # What the officer's "Confirm Admission" button does
+            def _confirm():
+                if repository.transition_status(application["id"], "Shortlisted", "Admission Confirmed", "Seat confirmed pending payment."):
+                    confirmed = repository.get(application["id"])
+                    student_counsellor_agent(confirmed)
+                    return confirmed
+            confirmed = timers["confirm"].time(_confirm)
+            if confirmed and confirmed.get("loan_interest") and confirmed["loan_status"] == "Pending Request":
+                confirmed["loan_amount_requested"], confirmed["loan_reason"] = loan_request(rng)
+                timers["loan"].time(student_loan_agent, confirmed)
+
+        for query in DIRECTOR_QUERIES:
+            timers["director"].time(director_bot_agent, query)
+        # The UI's communication log lives in session state and would otherwise grow with every message
+        st.session_state.communication_log.clear()
+        done += len(batch)
+        print(f"  {done}/{args.applications} applications, {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    wall_seconds = time.perf_counter() - started
+    get_outbox().stop()
+    model = get_gemini_model()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "config": {key: getattr(args, key) for key in (
+            "applications", "batch_size", "seed", "accept_rate", "distinct_documents",
+            "llm_latency", "llm_failure_rate", "retrieval_mode")},
+        "wall_seconds": round(wall_seconds, 3),
+        "applications_per_second": round(args.applications / wall_seconds, 2),
+        "stages": {stage: timer.summary() for stage, timer in timers.items()},
+        "outcomes": repository.status_counts(),
+        "loans": repository.loan_totals(),
+        "llm": {"model_calls": getattr(model, "calls", None), "cache": get_llm_cache_stats()},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def _previous_run(output, config):
+    """The last saved run with the same configuration, or None."""
+    if not os.path.exists(output):
+        return None
+    previous = None
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("config") == config:
+                previous = record
+    return previous
+
+def _change(new, old):
+    return f"{(new - old) / old:+.0%}" if new is not None and old else ""
+
+def report(result, previous=None):
+    config = result["config"]
+    print(f"\n{config['applications']} applications in {result['wall_seconds']:.1f}s "
+          f"({result['applications_per_second']:.1f}/s), LLM latency {config['llm_latency']}s, "
+          f"retrieval {config['retrieval_mode']}, revision {result['revision']}")
+    if previous:
+        print(f"compared with {previous['revision']} ({previous['timestamp']})")
+    print(f"\n{'stage':<15} {'calls':>8} {'calls/s':>9} {'p50':>10} {'p95':>10} {'p99':>10}" + (f" {'calls/s':>8} {'p95':>6}" if previous else ""))
+    for stage, summary in result["stages"].items():
+        if not summary["calls"]:
+            continue
+        line = (f"{stage:<15} {summary['calls']:>8} {summary['per_second'] or 0:9.1f} "
+                f"{summary['p50_ms']:8.2f}ms {summary['p95_ms']:8.2f}ms {summary['p99_ms']:8.2f}ms")
+        old = previous and previous["stages"].get(stage)
+        if old and old.get("calls"):
+            line += f" {_change(summary['per_second'], old['per_second']):>8} {_change(summary['p95_ms'], old['p95_ms']):>6}"
+        print(line)
+    print(f"\noutcomes: {result['outcomes']}")
+    print(f"loans: {result['loans']}, LLM: {result['llm']['model_calls']} model calls, "
+          f"cache hit rate {result['llm']['cache'].get('hit_rate')}, peak RSS {result['peak_rss_mb']}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=1000, help="1k to 1M")
+    parser.add_argument("--batch-size", type=int, default=500, help="applications generated and processed at a time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--accept-rate", type=float, default=0.7, help="share of shortlisted applicants whose admission is confirmed")
+    parser.add_argument("--distinct-documents", type=int, default=2000, help="size of the stored document pool")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM reply")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of fake LLM calls failing transiently")
+    parser.add_argument("--retrieval-mode", choices=["dense", "bm25", "hybrid"], default="bm25",
+                        help="bm25 (default) needs no embedding model")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--no-save", action="store_true", help="report only, don't append to --output")
+    args = parser.parse_args()
+    args.output = os.path.abspath(args.output)
+
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as workdir:
+        cwd = os.getcwd()
+        _prepare_environment(workdir, args)
+        try:
+            # The agents print a line per message queued; progress goes to stderr
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = run(args)
+        finally:
+            os.chdir(cwd)
+
+    report(result, _previous_run(args.output, result["config"]))
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        print(f"saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
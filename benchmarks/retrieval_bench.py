@@ -0,0 +1,89 @@
+"""
+Top-1 accuracy and latency of knowledge base retrieval per mode (dense / bm25 / hybrid).
+
+Each question is labeled with the data/ file that answers it; a hit is the top
+result coming from that file. The index is built in a temporary directory, so the
+app's saved index is left alone. bm25 needs no embedding model.
+
+    python benchmarks/retrieval_bench.py [--modes dense bm25 hybrid] [--k 1]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING) # Streamlit complains about running outside `streamlit run`
+
+from utils.knowledge_base import KnowledgeBaseIndexer, Retriever, RETRIEVAL_MODES, query_knowledge_base_batch, _result_cache
+
+# (question, file expected to answer it) -- includes the agents' own query templates
+EVAL_SET = [
+    ("Eligibility criteria for B.Tech Computer Science", "eligibility_criteria.txt"),
+    ("Eligibility criteria for MBA", "eligibility_criteria.txt"),
+    ("What percentage do I need in class 12 to get in?", "eligibility_criteria.txt"),
+    ("minimum marks required for admission", "eligibility_criteria.txt"),
+    ("Which entrance exams are accepted?", "eligibility_criteria.txt"),
+    ("Fee structure for the MBA course", "fee_structure.txt"),
+    ("How much is the hostel fee?", "fee_structure.txt"),
+    ("tuition cost per year for B.Tech", "fee_structure.txt"),
+    ("When is the payment deadline?", "fee_structure.txt"),
+    ("total annual fees", "fee_structure.txt"),
+    ("Student loan eligibility and policy", "loan_policy.txt"),
+    ("What is the maximum loan amount?", "loan_policy.txt"),
+    ("How big is the university loan budget?", "loan_policy.txt"),
+    ("How long does a loan decision take?", "loan_policy.txt"),
+    ("Can I borrow money to pay my tuition?", "loan_policy.txt"),
+    ("What happens after I submit the online application form?", "admission_procedure.txt"),
+    ("Draft an email for Shortlisted. Details: Meets criteria.", "admission_procedure.txt"),
+    ("steps of the admission process", "admission_procedure.txt"),
+    ("How is document verification done?", "admission_procedure.txt"),
+    ("When will I get the final admission letter?", "admission_procedure.txt"),
+]
+
+def evaluate(retriever, eval_set=EVAL_SET, k=1):
+    """Top-1 accuracy, hit@k and per-query latencies (ms, cold cache) for one retriever."""
+    latencies, top1, hit_k = [], 0, 0
+    for question, expected in eval_set:
+        _result_cache.clear()
+        started = time.perf_counter()
+        docs = query_knowledge_base_batch(retriever, [question], k=max(k, 1))[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        sources = [doc.metadata.get("source") for doc in docs]
+        top1 += bool(sources) and sources[0] == expected
+        hit_k += expected in sources
+    return {
+        "top1": top1 / len(eval_set),
+        "hit_at_k": hit_k / len(eval_set),
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(RETRIEVAL_MODES), choices=RETRIEVAL_MODES)
+    parser.add_argument("--k", type=int, default=3, help="also report hit@k")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        started = time.perf_counter()
+        # Only load the embedding model if a mode needs it
+        indexer = KnowledgeBaseIndexer(index_dir=index_dir, mode="bm25" if args.modes == ["bm25"] else "hybrid")
+        indexer.load()
+        print(f"Indexed {len(indexer.chunks)} chunks from {len(indexer.files)} files in {time.perf_counter() - started:.2f}s\n")
+        for mode in args.modes:
+            retriever = Retriever(indexer, mode)
+            if retriever.effective_mode != mode:
+                print(f"{mode:<8} unavailable (the embedding model could not be loaded)")
+                continue
+            result = evaluate(retriever, k=args.k)
+            print(f"{mode:<8} top-1 {result['top1']:.1%}  hit@{args.k} {result['hit_at_k']:.1%}  "
+                  f"p50 {result['p50_ms']:.2f}ms  max {result['max_ms']:.2f}ms")
+
+if __name__ == "__main__":
+    main()
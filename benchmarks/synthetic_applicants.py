@@ -0,0 +1,192 @@
+"""
+Synthetic applications for benchmarks, shaped like the ones the Apply Now page stores.
+
+Applicants get a course (weighted like a real intake), grades around a realistic
+mean, the entrance exam that goes with their course, parent details and, for some,
+a loan request. Their documents are real files in an UploadStore: a pool of distinct
+PDFs, PNGs and JPEGs that pass verification, plus a share of broken ones (truncated,
+too small, or not the type their name says) that the document check should catch.
+Everything is drawn from one seeded generator, so a seed always gives the same applicants.
+
+    python benchmarks/synthetic_applicants.py [--applications 5] [--seed 0]   # prints a sample
+"""
+import os
+import sys
+import json
+import zlib
+import random
+import struct
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (course, share of applicants); the options of the Apply Now form
+COURSES = [
+    ("B.Tech Computer Science", 0.22),
+    ("B.Tech Information Technology", 0.09),
+    ("B.Tech Electronics and Communication", 0.08),
+    ("B.Tech Electrical Engineering", 0.06),
+    ("B.Tech Mechanical Engineering", 0.07),
+    ("B.Tech Civil Engineering", 0.05),
+    ("B.Tech Artificial Intelligence", 0.08),
+    ("B.Tech Data Science", 0.08),
+    ("MBA", 0.18),
+    ("B.Sc Physics", 0.06),
+    ("Other", 0.03),
+]
+EXAMS = {"B.Tech": ["JEE Main", "WBJEE"], "MBA": ["CAT"], "B.Sc": ["WBJEE", "Not Applicable"], "Other": ["Other", "Not Applicable"]}
+
+FIRST_NAMES = ["Aarav", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Meera", "Nikhil", "Priya", "Rahul",
+               "Riya", "Rohan", "Sanya", "Siddharth", "Sneha", "Tanvi", "Vihaan", "Zara", "Aditya", "Neha"]
+LAST_NAMES = ["Banerjee", "Chatterjee", "Das", "Ghosh", "Gupta", "Iyer", "Khan", "Mehta", "Mukherjee", "Nair",
+              "Patel", "Rao", "Reddy", "Roy", "Sen", "Sharma", "Singh", "Verma", "Bose", "Kapoor"]
+CITIES = ["Kolkata", "Mumbai", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Pune", "Durgapur", "Siliguri", "Asansol"]
+LOAN_REASONS = [
+    "Tuition for the first year; my family's savings cover the hostel fee.",
+    "My father's business had a difficult year and we need help with the fees.",
+    "To cover the tuition fee until my scholarship is disbursed.",
+    "Single-parent household; the loan would cover most of the course fee.",
+]
+
+GRADE_MEAN, GRADE_SD = 74.0, 11.0  # grade 12 percentage
+LOAN_INTEREST_RATE = 0.3           # share of applicants asking for a loan
+MISSING_DOCUMENT_RATE = 0.04       # share of applicants who skip a required upload
+BROKEN_DOCUMENT_RATE = 0.03        # share of the document pool that fails verification
+
+# -------------------------
+# Documents
+# -------------------------
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def _png(width, height, salt):
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + _png_chunk(b"IDAT", zlib.compress(salt * 64))
+            + _png_chunk(b"IEND", b""))
+
+def _jpeg(width, height, salt):
+    app0 = b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return (b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", len(app0) + 2) + app0
+            + b"\xff\xc0" + struct.pack(">H", len(sof) + 2) + sof
+            + b"\xff\xfe" + struct.pack(">H", len(salt) + 2) + salt  # comment segment: makes each file distinct
+            + b"\xff\xd9")
+
+def _pdf(pages, salt, truncated=False):
+    kids = " ".join(f"{3 + i} 0 R" for i in range(pages))
+    body = (f"%PDF-1.4\n% {salt.hex()}\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+            f"2 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n"
+            + "".join(f"{3 + i} 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>\nendobj\n" for i in range(pages)))
+    return body.encode() + (b"" if truncated else b"trailer\n<< /Root 1 0 R >>\n%%EOF\n")
+
+def _document(rng, broken):
+    """(extension, bytes) of one scanned document; broken ones fail verification in a realistic way."""
+    salt = rng.getrandbits(64).to_bytes(8, "big")
+    kind = rng.choice(["pdf", "pdf", "png", "jpg"])
+    if broken:
+        flaw = rng.choice(["truncated", "small", "mismatch"])
+        if flaw == "truncated":
+            return "pdf", _pdf(rng.randint(1, 2), salt, truncated=True)
+        if flaw == "small":
+            return "png", _png(rng.randint(80, 250), rng.randint(80, 250), salt)
+        return "pdf", _png(1200, 1600, salt)  # a photo saved with a .pdf name
+    if kind == "pdf":
+        return "pdf", _pdf(rng.randint(1, 3), salt)
+    width, height = rng.randint(800, 2480), rng.randint(1000, 3508)
+    return kind, (_png if kind == "png" else _jpeg)(width, height, salt)
+
+class DocumentPool:
+    """
+    A fixed set of distinct stored documents that applications draw from, so a
+    million applications don't need three million files. The verifier caches verdicts
+    by content, so once every pool file has been seen it answers from its cache: make
+    the pool larger for a colder cache.
+    """
+
+    def __init__(self, store, distinct=2000, broken_rate=BROKEN_DOCUMENT_RATE, seed=0):
+        import io
+        rng = random.Random(seed)
+        self.references = []
+        for i in range(distinct):
+            extension, data = _document(rng, broken=rng.random() < broken_rate)
+            self.references.append(store.store(io.BytesIO(data), f"scan_{i}.{extension}"))
+
+    def pick(self, rng, filename):
+        """A stored document's reference under the applicant's own file name (the extension is kept)."""
+        reference = dict(rng.choice(self.references))
+        reference["filename"] = f"{filename}.{reference['filename'].rsplit('.', 1)[1]}"
+        return reference
+
+# -------------------------
+# Applications
+# -------------------------
+def _exam_for(course):
+    return EXAMS.get(course.split()[0], EXAMS["Other"])
+
+def generate_applications(count, documents, seed=0, start=0):
+    """
+    Yields `count` new application dicts (status "Application Submitted", no id yet),
+    numbered from `start` so names and emails stay unique across calls.
+    documents: a DocumentPool.
+    """
+    rng = random.Random(seed * 1_000_003 + start)
+    courses, weights = zip(*COURSES)
+    today = datetime.date.today()
+    for n in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        course = rng.choices(courses, weights)[0]
+        grade_12 = round(min(99.5, max(35.0, rng.gauss(GRADE_MEAN, GRADE_SD))), 1)
+        exam = rng.choice(_exam_for(course))
+        uploads = {
+            field: documents.pick(rng, f"{first.lower()}_{field.split('_details')[0]}")
+            for field in ("grade10_marksheet_details", "grade12_marksheet_details", "id_proof_details")
+        }
+        if rng.random() < MISSING_DOCUMENT_RATE:
+            uploads[rng.choice(list(uploads))] = None
+        loan_interest = rng.random() < LOAN_INTEREST_RATE
+        yield {
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}.{n}@example.com",
+            "dob": str(datetime.date(today.year - rng.randint(18, 27), 1, 1) + datetime.timedelta(days=rng.randint(0, 364))),
+            "gender": rng.choice(["Male", "Female", "Other", "Prefer not to say"]),
+            "address": f"{rng.randint(1, 300)}, {rng.choice(['Park', 'Lake', 'Station', 'Temple'])} Road, {rng.choice(CITIES)}",
+            "course": course,
+            "grade_10_percentage": round(min(99.5, max(35.0, grade_12 + rng.gauss(2, 6))), 1),
+            "grade_12_percentage": grade_12,
+            "entrance_exam": exam,
+            "entrance_exam_rank": "N/A" if exam == "Not Applicable" else rng.randint(1, 200000),
+            **uploads,
+            "other_docs_details": [documents.pick(rng, f"{first.lower()}_rank_card")] if exam != "Not Applicable" else [],
+            "docs_uploaded_status": all(uploads.values()),
+            "parent_name": f"{rng.choice(FIRST_NAMES)} {last}",
+            "parent_phone": f"+91 9{rng.randint(100000000, 999999999)}",
+            "parent_email": f"{last.lower()}.family.{n}@example.com" if rng.random() < 0.6 else "",
+            "loan_interest": loan_interest,
+            "status": "Application Submitted",
+            "status_details": "Pending initial review (includes document verification).",
+            "timestamp": str(datetime.datetime.now()),
+            "communication_history": [],
+            "loan_status": "Pending Request" if loan_interest else "Not Requested",
+            "loan_amount_requested": 0,
+        }
+
+def loan_request(rng):
+    """(amount, reason) as the loan request form would submit them."""
+    return rng.randrange(1000, 50001, 500), rng.choice(LOAN_REASONS)
+
+def main():
+    import tempfile
+    from utils.uploads import UploadStore
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        documents = DocumentPool(UploadStore(root), distinct=50, seed=args.seed)
+        for application in generate_applications(args.applications, documents, seed=args.seed):
+            print(json.dumps(application, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,10 @@
 import streamlit as st
 import pandas as pd
 from utils.helpers import initialize_session_state
+from utils.db import get_repository
 from utils.agents import student_counsellor_agent
+from utils.uploads import get_upload_store, UploadTooLarge
 import datetime # Import datetime for default date
-import os # Potentially needed if saving files locally (though not implemented here)
 
 # Ensure state is initialized
 initialize_session_state()
@@ -15,7 +16,7 @@ st.write("Please provide detailed information and upload required documents.")
 
 # Define allowed file types and max size (for display/help text)
 ALLOWED_TYPES = ["pdf", "png", "jpg", "jpeg"]
-MAX_FILE_SIZE_MB = 5 # Example limit
+MAX_FILE_SIZE_MB = 5 # Enforced while each upload is stored
 
 # --- Application Form ---
 with st.form("application_form"):
@@ -76,7 +77,7 @@ with st.form("application_form"):
 
     # --- Document Upload ---
     st.subheader("📄 Document Upload")
-    st.info(f"Allowed file types: {', '.join(ALLOWED_TYPES)}. Max size: {MAX_FILE_SIZE_MB}MB per file (Example Limit).")
+    st.info(f"Allowed file types: {', '.join(ALLOWED_TYPES)}. Max size: {MAX_FILE_SIZE_MB}MB per file.")
 
     col_doc1, col_doc2 = st.columns(2)
     with col_doc1:
@@ -134,42 +135,52 @@ with st.form("application_form"):
 
     if submitted:
         # --- File Upload Handling (Inside Submission Logic) ---
-        # We check if the file uploader objects are not None
+        # Each upload is streamed into the content-addressed store; the application keeps the reference
+        upload_store = get_upload_store()
+        upload_errors = []
+        oversized_uploads = set()
+
+        def store_upload(uploaded_file, label):
+            """Stores one upload; returns its reference, or None (with an error recorded) if it is too large."""
+            try:
+                return upload_store.store(uploaded_file, uploaded_file.name, max_bytes=MAX_FILE_SIZE_MB * 1024 * 1024)
+            except UploadTooLarge as e:
+                upload_errors.append(f"{label}: {e}")
+                oversized_uploads.add(label)
+                return None
 
         grade10_marksheet_details = None
         if uploaded_grade_10_marksheet is not None:
-            # **In a real app, save the file here:**
-            # Eg: save_path = os.path.join("uploads", f"app_{st.session_state.next_app_id}_grade10_{uploaded_grade_10_marksheet.name}")
-            # with open(save_path, "wb") as f:
-            #     f.write(uploaded_grade_10_marksheet.getbuffer())
-            grade10_marksheet_details = {"filename": uploaded_grade_10_marksheet.name, "size": uploaded_grade_10_marksheet.size}
-            st.write(f"✔️ Class X Marksheet '{uploaded_grade_10_marksheet.name}' selected.") # User feedback
+            grade10_marksheet_details = store_upload(uploaded_grade_10_marksheet, "Class X Marksheet")
+            if grade10_marksheet_details:
+                st.write(f"✔️ Class X Marksheet '{uploaded_grade_10_marksheet.name}' saved.") # User feedback
         else:
              st.write("⚠️ Class X Marksheet was not uploaded.") # User feedback
 
 
         grade12_marksheet_details = None
         if uploaded_grade_12_marksheet is not None:
-            # **Save file here**
-            grade12_marksheet_details = {"filename": uploaded_grade_12_marksheet.name, "size": uploaded_grade_12_marksheet.size}
-            st.write(f"✔️ Class XII Marksheet '{uploaded_grade_12_marksheet.name}' selected.") # User feedback
+            grade12_marksheet_details = store_upload(uploaded_grade_12_marksheet, "Class XII Marksheet")
+            if grade12_marksheet_details:
+                st.write(f"✔️ Class XII Marksheet '{uploaded_grade_12_marksheet.name}' saved.") # User feedback
         else:
              st.write("⚠️ Class XII Marksheet was not uploaded.") # User feedback
 
         id_proof_details = None
         if uploaded_id_proof is not None:
-             # **Save file here**
-             id_proof_details = {"filename": uploaded_id_proof.name, "size": uploaded_id_proof.size}
-             st.write(f"✔️ ID Proof '{uploaded_id_proof.name}' selected.") # User feedback
+             id_proof_details = store_upload(uploaded_id_proof, "ID Proof")
+             if id_proof_details:
+                 st.write(f"✔️ ID Proof '{uploaded_id_proof.name}' saved.") # User feedback
         else:
              st.write("⚠️ ID Proof was not uploaded.") # User feedback
 
         other_docs_details = []
         if uploaded_other_docs: # Check if list is not empty
             for doc in uploaded_other_docs:
-                 # **Save each file here**
-                 other_docs_details.append({"filename": doc.name, "size": doc.size})
-            st.write(f"✔️ {len(other_docs_details)} Other document(s) selected.") # User feedback
+                 doc_details = store_upload(doc, f"'{doc.name}'")
+                 if doc_details:
+                     other_docs_details.append(doc_details)
+            st.write(f"✔️ {len(other_docs_details)} Other document(s) saved.") # User feedback
         else:
              st.write("ℹ️ No optional documents were uploaded.") # User feedback
 
@@ -199,7 +210,7 @@ with st.form("application_form"):
             "ID Proof": id_proof_details,
         }
 
-        errors = []
+        errors = list(upload_errors) # Oversized files are reported first
         for field_name, value in required_fields.items():
             if not value or (isinstance(value, (float, int)) and value <= 0) \
                or (field_name == "Gender" and value == "Select...") \
@@ -212,7 +223,7 @@ with st.form("application_form"):
 
         # Validate required uploads
         for field_name, details in required_uploads.items():
-             if details is None: # Check if the details dict was created (meaning file was uploaded)
+             if details is None and field_name not in oversized_uploads: # Not uploaded at all
                  errors.append(f"'{field_name}' upload is required.")
 
         # Specific check for entrance exam rank if exam selected
@@ -223,14 +234,10 @@ with st.form("application_form"):
             st.error("Please fix the following errors:\n\n" + "\n".join(f"- {error}" for error in errors))
         else:
             # --- Application Data Assembly ---
-            app_id = st.session_state.next_app_id
-            st.session_state.next_app_id += 1
-
             # Determine overall document status based on *required* uploads
             all_required_docs_uploaded = bool(grade10_marksheet_details and grade12_marksheet_details and id_proof_details)
 
             new_application = {
-                "id": app_id,
                 # Personal
                 "name": name,
                 "email": email,
@@ -243,10 +250,10 @@ with st.form("application_form"):
                 "grade_12_percentage": grade_12_percentage,
                 "entrance_exam": entrance_exam,
                 "entrance_exam_rank": entrance_exam_rank if entrance_exam != "Not Applicable" else "N/A",
-                # Document Meta-Data (NOT content)
-                "grade10_marksheet_details": grade10_marksheet_details, # Dict with filename/size or None
-                "grade12_marksheet_details": grade12_marksheet_details, # Dict with filename/size or None
-                "id_proof_details": id_proof_details,                 # Dict with filename/size or None
+                # Document references into the upload store (content lives in storage/uploads)
+                "grade10_marksheet_details": grade10_marksheet_details, # Dict with filename/size/sha256/path or None
+                "grade12_marksheet_details": grade12_marksheet_details, # Dict with filename/size/sha256/path or None
+                "id_proof_details": id_proof_details,                 # Dict with filename/size/sha256/path or None
                 "other_docs_details": other_docs_details,             # List of dicts or empty list
                 "docs_uploaded_status": all_required_docs_uploaded,   # Boolean based on required docs
                 # Parent
@@ -264,7 +271,7 @@ with st.form("application_form"):
                 "loan_amount_requested": 0 # Placeholder
             }
 
-            st.session_state.applications.append(new_application)
+            app_id = get_repository().add(new_application) # The repository assigns the id
             st.success(f"Application #{app_id} submitted successfully! Thank you, {name}. Your documents are being processed. You should receive an acknowledgment soon.")
 
             # Trigger initial communication
@@ -278,11 +285,12 @@ with st.form("application_form"):
 
 
 st.write("---")
-st.subheader("Submitted Applications (Current Session)")
-if st.session_state.applications:
+st.subheader("Recently Submitted Applications")
+recent_applications = get_repository().list(limit=20, newest_first=True)
+if recent_applications:
     # Select key columns for display, including doc status
     display_cols = ['id', 'name', 'email', 'course', 'grade_12_percentage', 'docs_uploaded_status', 'status', 'timestamp']
-    apps_df = pd.DataFrame(st.session_state.applications)
+    apps_df = pd.DataFrame(recent_applications)
 
     # Handle potential missing columns gracefully if structure changes later
     cols_to_show = [col for col in display_cols if col in apps_df.columns]
@@ -308,7 +316,7 @@ if st.session_state.applications:
 
     st.dataframe(display_df[final_display_cols_present])
 else:
-    st.info("No applications submitted in this session yet.")
+    st.info("No applications submitted yet.")
 
 
 
@@ -1,12 +1,16 @@
 import streamlit as st
 import pandas as pd
-from utils.helpers import initialize_session_state
+from utils.helpers import initialize_session_state, sync_delivery_status, get_llm_cache_stats
+from utils.db import get_repository
 from utils.agents import (
     document_checking_agent,
     shortlisting_agent,
     student_counsellor_agent,
-    student_loan_agent
+    student_loan_agent,
+    bulk_shortlisting_agent
 )
+from utils.knowledge_base import get_retrieval_cache_stats
+from utils.pipeline import process_pending_applications, PENDING_STATUSES, DEFAULT_MAX_WORKERS
 
 # Ensure state is initialized
 initialize_session_state()
@@ -14,26 +18,68 @@ initialize_session_state()
 st.header("🧑‍💼 Admission Officer Dashboard")
 st.write("View applications and trigger processing steps (simulating orchestration).")
 
-if not st.session_state.applications:
+repository = get_repository()
+PAGE_SIZE = 50
+
+if repository.count() == 0:
     st.info("No applications submitted yet.")
 else:
-    apps_df = pd.DataFrame(st.session_state.applications)
-
     st.subheader("Application Status Overview")
+    total_pages = (repository.count() - 1) // PAGE_SIZE + 1
+    page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages, value=1, step=1, key="officer_page")
+    apps_df = repository.as_dataframe(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
     st.dataframe(apps_df[['id', 'name', 'course', 'status', 'status_details', 'loan_status', 'timestamp']])
 
-    st.subheader("Process Individual Applications")
-    app_id_to_process = st.selectbox("Select Application ID to Process:", apps_df['id'])
+    st.subheader("Bulk Actions")
+    pending_shortlist = repository.count(status="Documents Complete")
+    if st.button(f"Shortlist All Document-Complete Applications ({pending_shortlist})", key="bulk_shortlist",
+                 disabled=pending_shortlist == 0):
+        pending_apps = repository.list(status="Documents Complete")
+        decided_df, summary = bulk_shortlisting_agent(pending_apps)
+        for app, status, details in zip(pending_apps, decided_df['status'], decided_df['status_details']):
+            app['status'], app['status_details'] = status, details
+        repository.update_many(pending_apps)
+        st.rerun()
+
+    pending_count = repository.count(status=PENDING_STATUSES)
+    max_workers = st.slider("Parallel LLM workers for batch processing", 1, 32, DEFAULT_MAX_WORKERS, key="batch_workers")
+    if st.button(f"Process All Pending ({pending_count})", key="process_all_pending", disabled=pending_count == 0):
+        progress_bar = st.progress(0.0, text="Starting batch run...")
+        pending_apps = repository.list(status=PENDING_STATUSES)
+        try:
+            st.session_state.last_batch_run = process_pending_applications(
+                pending_apps,
+                max_workers=max_workers,
+                on_progress=lambda fraction, text: progress_bar.progress(fraction, text=text)
+            )
+        finally:
+            # Keep whatever progress was made, even if a stage failed part-way
+            repository.update_many(pending_apps)
+        st.rerun()
+
+    last_batch_run = st.session_state.get('last_batch_run')
+    if last_batch_run:
+        st.write("Last batch run (per-stage timings):")
+        st.dataframe(pd.DataFrame(last_batch_run['stages']))
+        if last_batch_run['failed']:
+            st.warning("Failed: " + ", ".join(f"#{app_id} ({error})" for app_id, error in last_batch_run['failed']))
 
-    if app_id_to_process:
-        # Find the application (convert back to dict for easier modification)
-        app_index = apps_df[apps_df['id'] == app_id_to_process].index[0]
-        # IMPORTANT: Work on a *copy* from session state list for modification
-        # then update the original list element
-        application = st.session_state.applications[app_index].copy()
+    st.subheader("Process Individual Applications")
+    app_id_to_process = st.selectbox("Select Application ID to Process:", repository.ids())
 
+    # Fetched fresh by primary key on every rerun, so changes made by other sessions show up
+    application = repository.get(app_id_to_process) if app_id_to_process else None
+    if application:
         st.write(f"--- Processing Application #{application['id']} ({application['name']}) ---")
         st.write(f"Current Status: **{application['status']}**")
+        if application.get('document_verdicts'):
+            with st.expander("Document verification"):
+                st.dataframe(pd.DataFrame([
+                    {"document": label, "file": verdict["filename"], "ok": verdict["ok"],
+                     "pages": verdict.get("pages"), "size (px)": f"{verdict['width']}x{verdict['height']}" if verdict.get("width") else None,
+                     "problems": "; ".join(verdict["problems"]), "ms": round(verdict["seconds"] * 1000, 2)}
+                    for label, verdict in application['document_verdicts'].items()
+                ]))
 
         col1, col2, col3, col4 = st.columns(4)
 
@@ -42,8 +88,7 @@ else:
             if st.button(f"Check Docs #{app_id_to_process}", key=f"check_{app_id_to_process}",
                          disabled=application['status'] not in ["Application Submitted", "Documents Incomplete"]):
                 with st.spinner(f"Running Document Check Agent for {app_id_to_process}..."):
-                    new_status, details = document_checking_agent(application)
-                    st.session_state.applications[app_index] = application # Update the state list
+                    new_status, details = document_checking_agent(application) # Saves the new status
                     # Trigger communication if incomplete
                     if new_status == "Documents Incomplete":
                          student_counsellor_agent(application)
@@ -54,8 +99,7 @@ else:
             if st.button(f"Shortlist #{app_id_to_process}", key=f"shortlist_{app_id_to_process}",
                          disabled=application['status'] != "Documents Complete"):
                  with st.spinner(f"Running Shortlisting Agent for {app_id_to_process}..."):
-                    new_status, details = shortlisting_agent(application)
-                    st.session_state.applications[app_index] = application # Update state
+                    new_status, details = shortlisting_agent(application) # Saves the new status
                     # Trigger communication based on outcome
                     student_counsellor_agent(application)
                     st.rerun()
@@ -64,9 +108,12 @@ else:
         with col3:
              if st.button(f"Confirm Admission #{app_id_to_process}", key=f"confirm_{app_id_to_process}",
                           disabled=application['status'] != "Shortlisted"):
-                 application['status'] = "Admission Confirmed"
-                 application['status_details'] = "Seat confirmed pending payment."
-                 st.session_state.applications[app_index] = application
+                 # Atomic: if another officer already moved this application on, nothing changes
+                 if not repository.transition_status(application['id'], "Shortlisted", "Admission Confirmed",
+                                                     "Seat confirmed pending payment."):
+                     st.warning(f"Application {app_id_to_process} is no longer shortlisted; it was updated elsewhere.")
+                     st.stop()
+                 application = repository.get(application['id'])
                  st.success(f"Admission confirmed for {app_id_to_process}.")
                  # Trigger final comms (letter + fee slip)
                  with st.spinner("Generating final letter & fee slip..."):
@@ -98,8 +145,17 @@ else:
 
 
         st.write("--- Communication Log ---")
+        sync_delivery_status() # Pick up deliveries made by the background dispatcher
         comm_log_df = pd.DataFrame(st.session_state.communication_log)
         if not comm_log_df.empty:
             st.dataframe(comm_log_df[comm_log_df['app_id'] == app_id_to_process].sort_values("timestamp", ascending=False))
         else:
-            st.write("No communications logged yet.")
\ No newline at end of file
+            st.write("No communications logged yet.")
+
+with st.expander("LLM Response Cache"):
+    st.caption("Replies are cached on disk by model, prompt and context, and shared across sessions.")
+    st.json(get_llm_cache_stats())
+
+with st.expander("Knowledge Base Retrieval Cache"):
+    st.caption("Repeated agent queries are served from cache; results are invalidated whenever the knowledge base is re-indexed.")
+    st.json(get_retrieval_cache_stats())
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-from utils.helpers import initialize_session_state
-from utils.agents import director_bot_agent
+from utils.helpers import initialize_session_state, render_stream
+from utils.llm import LLMStream
+from utils.db import get_repository
+from utils.agents import director_bot_agent, remaining_loan_budget
 
 
 # Ensure state is initialized
@@ -12,23 +14,20 @@ st.write("Ask questions about the admission process status.")
 
 # Display Summary Stats
 st.subheader("Quick Overview")
-num_apps = len(st.session_state.get('applications', []))
-apps_df = pd.DataFrame(st.session_state.get('applications', []))
+repository = get_repository()
+# All O(1) reads of aggregates the repository maintains on every write
+num_apps = repository.count()
+shortlisted_count = repository.count(status='Shortlisted')
+confirmed_count = repository.count(status='Admission Confirmed')
 
 col1, col2, col3 = st.columns(3)
 col1.metric("Total Applications", num_apps)
-if not apps_df.empty and 'status' in apps_df.columns:
-    shortlisted_count = apps_df[apps_df['status'] == 'Shortlisted'].shape[0]
-    confirmed_count = apps_df[apps_df['status'] == 'Admission Confirmed'].shape[0]
-else:
-    shortlisted_count = 0
-    confirmed_count = 0
 col2.metric("Shortlisted", shortlisted_count)
 col3.metric("Admission Confirmed", confirmed_count)
 
 col4, col5 = st.columns(2)
-remaining_budget = st.session_state.get('available_loan_budget', 'N/A')
-approved_loan_count = sum(1 for details in st.session_state.get('loan_requests', {}).values() if details['status'] == 'Loan Approved')
+remaining_budget = remaining_loan_budget()
+approved_loan_count = repository.loan_totals()['approved_count']
 col4.metric("Remaining Loan Budget", f"${remaining_budget}")
 col5.metric("Loans Approved", approved_loan_count)
 
@@ -38,19 +37,27 @@ st.subheader("Ask the Admission Bot")
 st.write("Examples: 'How many applications received?', 'Show status overview', 'What is the loan budget remaining?', 'What is the procedure after shortlisting?'")
 
 query = st.text_input("Your question:", key="director_query")
+fresh_answer = st.checkbox("Ask Gemini afresh (skip cached answers)", key="director_fresh")
 
 if st.button("Ask Bot", key="director_ask"):
     if query:
         with st.spinner("Thinking..."):
-            response = director_bot_agent(query)
-            st.info("Bot Response:")
+            response = director_bot_agent(query, use_cache=not fresh_answer, stream=True)
+        st.info("Bot Response:")
+        if isinstance(response, LLMStream):
+            response = render_stream(response) # Gemini answers appear as they are generated
+        else:
             st.markdown(response) # Use markdown for better formatting potentially
     else:
         st.warning("Please enter a question.")
 
 
 st.subheader("Full Application List (Director's View)")
-if not apps_df.empty:
+PAGE_SIZE = 50
+if num_apps:
+    total_pages = (num_apps - 1) // PAGE_SIZE + 1
+    page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages, value=1, step=1, key="director_page")
+    apps_df = repository.as_dataframe(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
     st.dataframe(apps_df[['id', 'name', 'course', 'status', 'status_details', 'loan_status', 'timestamp']])
 else:
     st.info("No applications to display.")
\ No newline at end of file
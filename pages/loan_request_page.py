@@ -1,6 +1,7 @@
 import streamlit as st
 from utils.helpers import initialize_session_state, get_gemini_justification
 from utils.agents import student_loan_agent
+from utils.db import get_repository
 
 # Initialize app state
 initialize_session_state()
@@ -53,10 +54,10 @@ def loan_request_page(applications):
         justification = get_gemini_justification(application)
         st.info(justification)
 
-        status, details = student_loan_agent(application)
+        status, details = student_loan_agent(application) # Saves the request details with the loan status
         st.success(f"Loan Status: {status}")
         st.markdown(f"**Details**: {details}")
 
 # Call the page function if this is the main file
 if __name__ == "__main__":
-    loan_request_page(st.session_state.applications)
+    loan_request_page(get_repository().list(status="Admission Confirmed"))
@@ -2,65 +2,123 @@
 # In a real system, they'd be independent processes/services.
 import streamlit as st
 import pandas as pd
-import google.generativeai as genai
+import numpy as np
+import time
 import os
 from dotenv import load_dotenv
 
 
 import random
-from .helpers import get_llm_response, simulate_communication, generate_fee_slip_content
-from .knowledge_base import query_knowledge_base, vector_store, raw_docs_content # Import the loaded KB
+from .helpers import get_llm_response, get_llm_responses, cached_generate, stream_llm_response, render_stream, simulate_communication, generate_fee_slip_content
+from .llm import fake_model_from_env
+from .knowledge_base import query_knowledge_base, query_knowledge_base_batch, get_policy_table, get_indexer, get_retriever, get_raw_docs # Loaded on first use
+from .intents import IntentRouter, keyword_intent
+from .analytics import AnalyticsEngine
+from .db import get_repository
+from .ledger import get_ledger
+from .doc_verify import DocumentVerifier, application_documents
+
+@st.cache_resource
+def get_document_verifier():
+    """Process-wide document verifier; its worker pool is started on the first large batch."""
+    return DocumentVerifier()
+
+def verify_application_documents(applications):
+    """
+    Verifies the stored documents of many applications in one batch (spread over the
+    verifier's process pool). Returns one {label: verdict} dict per application.
+    """
+    documents = [[(label, ref) for label, ref in application_documents(app) if ref] for app in applications]
+    verdicts = iter(get_document_verifier().verify_many([ref for docs in documents for _, ref in docs]))
+    return [{label: next(verdicts) for label, _ in docs} for docs in documents]
 
-def document_checking_agent(application):
+def check_documents(application, verdicts=None):
     """
-    Simulates checking documents.
-    In reality, this would involve file validation, possibly OCR.
-    Here, we just check if required fields are non-empty (or simulated uploads exist).
+    The document check itself, without any UI output: returns (status, details).
+    Every required document must have been uploaded and pass verification (file type,
+    integrity, page count / image size). Batch callers pass the verdicts they already
+    computed with verify_application_documents; otherwise the files are verified here.
+    Used directly by batch processing, where per-application messages would flood the page.
     """
-    st.write(f"🕵️ Document Agent checking application {application['id']}...")
-    missing = []
-    # Simulate checking based on form fields for simplicity
-    if not application.get('docs_uploaded'):
-        missing.append("Required Documents")
+    if verdicts is None:
+        verdicts = verify_application_documents([application])[0]
+    application['document_verdicts'] = verdicts
+    missing, failed = [], []
+    for label, reference in application_documents(application):
+        if not reference:
+            missing.append(label)
+        elif not verdicts[label]["ok"]:
+            failed.append(f"{label} ({'; '.join(verdicts[label]['problems'])})")
     if not application.get('grade_12_percentage'):
          missing.append("Grade 12 Percentage")
 
-    if missing:
-        status = "Documents Incomplete"
-        details = f"Missing: {', '.join(missing)}"
+    if missing or failed:
+        details = []
+        if missing:
+            details.append(f"Missing: {', '.join(missing)}")
+        if failed:
+            details.append(f"Failed verification: {', '.join(failed)}")
+        return "Documents Incomplete", ". ".join(details)
+    return "Documents Complete", "All required documents/info present and verified."
+
+def document_checking_agent(application):
+    """
+    Checks the application's documents: each stored file is verified (see utils/doc_verify.py)
+    and required fields must be filled in.
+    """
+    st.write(f"🕵️ Document Agent checking application {application['id']}...")
+    status, details = check_documents(application)
+    if status == "Documents Incomplete":
         st.warning(f"App {application['id']}: {status} - {details}")
     else:
-        status = "Documents Complete"
-        details = "All required documents/info present."
         st.success(f"App {application['id']}: {status}")
 
     application['status'] = status
     application['status_details'] = details
+    get_repository().update(application)
     return status, details
 
-def shortlisting_agent(application):
+def _eligibility_query(application):
+    return f"Eligibility criteria for {application.get('course', 'general courses')}"
+
+def _required_percentage(application):
+    """The course's minimum percentage from the compiled policy table, or None if it has no rule."""
+    course_policy = get_policy_table().for_course(application.get('course'))
+    return course_policy.min_percentage if course_policy else None
+
+def shortlisting_agent(application, eligibility_info=None):
     """
     Simulates shortlisting based on simplified criteria from knowledge base.
+    The threshold comes from the compiled policy table; only courses without a rule
+    there fall back to retrieving and parsing the criteria text.
+    Batch callers can pass eligibility_info they already retrieved (see shortlist_applications).
     """
     st.write(f"📋 Shortlisting Agent evaluating application {application['id']}...")
-    eligibility_info = ""
-    if vector_store: # Use RAG
-        context_docs = query_knowledge_base(vector_store, f"Eligibility criteria for {application.get('course', 'general courses')}", k=1)
-        if context_docs:
-            eligibility_info = context_docs[0].page_content # Get text from Langchain Document
-    elif raw_docs_content: # Fallback to raw text
-        eligibility_info = raw_docs_content.get('eligibility_criteria', '')
-
-    if not eligibility_info:
-        st.error("Could not retrieve eligibility criteria from Knowledge Base.")
-        application['status'] = "Error - Criteria Missing"
-        application['status_details'] = "Eligibility criteria not found."
-        return application['status'], application['status_details']
+    required_percentage = _required_percentage(application)
+    if required_percentage is None:
+        if eligibility_info is None:
+            eligibility_info = ""
+            retriever, raw_docs_content = get_retriever(), get_raw_docs()
+            if retriever: # Use RAG
+                context_docs = query_knowledge_base(retriever, _eligibility_query(application), k=1,
+                                                    source='eligibility_criteria', course=application.get('course'))
+                if context_docs:
+                    eligibility_info = context_docs[0].page_content # Get text from Langchain Document
+            elif raw_docs_content: # Fallback to raw text
+                eligibility_info = raw_docs_content.get('eligibility_criteria', '')
+
+        if not eligibility_info:
+            st.error("Could not retrieve eligibility criteria from Knowledge Base.")
+            application['status'] = "Error - Criteria Missing"
+            application['status_details'] = "Eligibility criteria not found."
+            get_repository().update(application)
+            return application['status'], application['status_details']
 
     # Simple simulated check (replace with LLM reasoning or structured parsing)
     try:
-        required_perc_str = eligibility_info.split("Minimum _PERCENTAGE_: ")[1].split('%')[0]
-        required_percentage = float(required_perc_str)
+        if required_percentage is None:
+            required_perc_str = eligibility_info.split("Minimum _PERCENTAGE_: ")[1].split('%')[0]
+            required_percentage = float(required_perc_str)
         student_percentage = float(application.get('grade_12_percentage', 0))
 
         if student_percentage >= required_percentage:
@@ -86,20 +144,105 @@ def shortlisting_agent(application):
 
     application['status'] = status
     application['status_details'] = details
+    get_repository().update(application)
     return status, details
 
-def student_counsellor_agent(application, message_type_override=None):
+def shortlist_applications(applications):
     """
-    Simulates drafting and sending communication based on application status.
-    Uses LLM with RAG for generating message content.
+    Runs the shortlisting agent over many applications. Courses without a rule in
+    the policy table get their eligibility criteria with one batched knowledge base query.
+    Returns a list of (status, details) in the same order.
     """
-    st.write(f"🗣️ Student Counsellor Agent preparing communication for application {application['id']}...")
+    eligibility_infos = [None] * len(applications)
+    unresolved = [i for i, app in enumerate(applications) if _required_percentage(app) is None]
+    retriever = get_retriever()
+    if unresolved and retriever:
+        context_docs = query_knowledge_base_batch(retriever, [_eligibility_query(applications[i]) for i in unresolved], k=1,
+                                                  source='eligibility_criteria', course=[applications[i].get('course') for i in unresolved])
+        for i, docs in zip(unresolved, context_docs):
+            eligibility_infos[i] = docs[0].page_content if docs else ""
+    return [shortlisting_agent(app, eligibility_info=info) for app, info in zip(applications, eligibility_infos)]
+
+def bulk_shortlisting_agent(applications):
+    """
+    Shortlists a whole application table in one pass.
+    Thresholds are resolved once per distinct course (policy table first, then one
+    batched retrieval for courses without a rule) and the decisions are made with
+    columnar comparisons, so the cost is a few array operations rather than a
+    retrieval and several UI writes per applicant.
+    Only rows in "Documents Complete" are decided; the rest pass through unchanged.
+    Returns (DataFrame with updated status/status_details, summary dict).
+    """
+    started = time.perf_counter()
+    apps_df = applications.copy() if isinstance(applications, pd.DataFrame) else pd.DataFrame(applications)
+    if apps_df.empty:
+        return apps_df, {"evaluated": 0, "shortlisted": 0, "rejected": 0, "errors": 0, "seconds": 0.0}
+
+    pending = apps_df['status'] == "Documents Complete"
+    courses = apps_df['course'].fillna('').astype(str)
+
+    # Resolve one threshold per distinct course (NaN = no rule -> generic fallback)
+    thresholds = {course: _required_percentage({'course': course}) for course in courses[pending].unique()}
+    missing_criteria = set()
+    unresolved = [course for course, threshold in thresholds.items() if threshold is None]
+    if unresolved:
+        retriever, raw_docs_content = get_retriever(), get_raw_docs()
+        if retriever:
+            context_docs = query_knowledge_base_batch(retriever, [_eligibility_query({'course': course}) for course in unresolved], k=1,
+                                                      source='eligibility_criteria', course=unresolved)
+            infos = [docs[0].page_content if docs else "" for docs in context_docs]
+        else:
+            infos = [raw_docs_content.get('eligibility_criteria', '') if raw_docs_content else ""] * len(unresolved)
+        for course, info in zip(unresolved, infos):
+            if not info:
+                missing_criteria.add(course)
+                continue
+            try:
+                thresholds[course] = float(info.split("Minimum _PERCENTAGE_: ")[1].split('%')[0])
+            except (IndexError, ValueError):
+                pass  # generic fallback below
+
+    required = courses.map(thresholds).astype(float)
+    grades = pd.to_numeric(apps_df['grade_12_percentage'], errors='coerce').fillna(0.0).astype(float)
+    has_rule = required.notna()
+    criteria_missing = pending & courses.isin(missing_criteria)
+    decide = pending & ~criteria_missing
+    passed = np.where(has_rule, grades >= required, grades > 60) # Generic fallback where no rule
+
+    # Only rejections quote the applicant's grade; format each distinct value once
+    # instead of converting every row to text.
+    details = np.where(passed, "Eligible based on fallback criteria.", "Does not meet fallback criteria.").astype(object)
+    rule_passed = (has_rule & passed).to_numpy()
+    rule_failed = (has_rule & ~passed & decide).to_numpy()
+    required_codes, required_values = pd.factorize(required)
+    # factorize codes rows without a rule as -1, which picks the trailing ""
+    required_text = np.array([str(value) for value in required_values] + [""], dtype=object)[required_codes]
+    details[rule_passed] = "Eligible based on " + required_text[rule_passed] + "% requirement."
+    grade_codes, grade_values = pd.factorize(grades[rule_failed])
+    grade_text = np.array([str(value) for value in grade_values], dtype=object)[grade_codes]
+    details[rule_failed] = "Does not meet " + required_text[rule_failed] + "% requirement (has " + grade_text + "%)."
+    status = np.where(passed, "Shortlisted", "Rejected - Eligibility")
+
+    apps_df['status'] = np.where(decide, status, np.where(criteria_missing, "Error - Criteria Missing", apps_df['status']))
+    apps_df['status_details'] = np.where(decide, details, np.where(criteria_missing, "Eligibility criteria not found.", apps_df['status_details']))
+
+    shortlisted = int((decide & passed).sum())
+    summary = {
+        "evaluated": int(pending.sum()),
+        "shortlisted": shortlisted,
+        "rejected": int(decide.sum()) - shortlisted,
+        "errors": int(criteria_missing.sum()),
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    st.success(
+        f"📋 Bulk shortlisting: {summary['evaluated']} evaluated, {summary['shortlisted']} shortlisted, "
+        f"{summary['rejected']} rejected, {summary['errors']} errors in {summary['seconds']}s."
+    )
+    return apps_df, summary
+
+def _communication_type(application, message_type_override=None):
+    """Picks the kind of message the counsellor sends for the application's current status."""
     status = application['status']
-    details = application['status_details']
-    student_email = application['email']
-    app_id = application['id']
-
-    # Determine the type of communication needed
     if message_type_override:
         comm_type = message_type_override
     elif status == "Application Submitted":
@@ -116,40 +259,172 @@ def student_counsellor_agent(application, message_type_override=None):
          comm_type = "Loan Status Update"
     else:
         comm_type = "Status Update" # Generic
+    return comm_type
 
-    # Use RAG to get context for the message
-    context = ""
-    query = f"Draft an email for {comm_type}. Student Name: {application['name']}. Details: {details}."
-    if vector_store:
-        # Get relevant procedure/policy snippets
-        context_docs = query_knowledge_base(vector_store, query, k=2)
-        context = "\n---\nContext from Knowledge Base:\n" + "\n\n".join([doc.page_content for doc in context_docs]) + "\n---"
+# The student's email and application ID go into the prompt as placeholders that are
+# filled in after generation, so applications with the same status and details share
+# one prompt (and one cached LLM reply). The retrieval query leaves the name out for the same reason.
+EMAIL_PLACEHOLDER = "[STUDENT_EMAIL]"
+APP_ID_PLACEHOLDER = "[APPLICATION_ID]"
+
+def _communication_query(application, comm_type):
+    return f"Draft an email for {comm_type}. Details: {application['status_details']}."
+
+def _fill_placeholders(message_body, application):
+    return message_body.replace(EMAIL_PLACEHOLDER, str(application['email'])).replace(APP_ID_PLACEHOLDER, str(application['id']))
 
+def _format_context(context_docs):
+    return "\n---\nContext from Knowledge Base:\n" + "\n\n".join([doc.page_content for doc in context_docs]) + "\n---"
+
+def _fee_query(application):
+    return f"Fee structure for {application.get('course', 'general')}"
+
+def _draft_request(application, message_type_override=None, context=None):
+    """Returns (comm_type, prompt, context) for the counsellor's message, retrieving context if not given."""
+    status = application['status']
+    details = application['status_details']
+
+    # Determine the type of communication needed
+    comm_type = _communication_type(application, message_type_override)
+
+    # Use RAG to get context for the message
+    if context is None:
+        context = ""
+        retriever = get_retriever()
+        if retriever:
+            # Get relevant procedure/policy snippets
+            context_docs = query_knowledge_base(retriever, _communication_query(application, comm_type), k=2)
+            context = _format_context(context_docs)
+
+    prompt = f"Generate a polite and professional email to the student ({EMAIL_PLACEHOLDER}) regarding their application (ID: {APP_ID_PLACEHOLDER}). The communication type is '{comm_type}'. Current status is '{status}' with details: '{details}'. Make sure to include next steps if applicable based on the context provided. Write {EMAIL_PLACEHOLDER} and {APP_ID_PLACEHOLDER} verbatim wherever the email address or application ID belongs."
+    return comm_type, prompt, context
+
+def draft_communication(application, message_type_override=None, context=None):
+    """
+    Drafts the counsellor's message for the application (RAG + LLM) without sending it.
+    Has no UI or session state side effects, so it is safe to run on worker threads.
+    Returns (comm_type, message_body).
+    """
+    comm_type, prompt, context = _draft_request(application, message_type_override, context)
     # Generate message using LLM
-    prompt = f"Generate a polite and professional email to the student ({student_email}) regarding their application (ID: {app_id}). The communication type is '{comm_type}'. Current status is '{status}' with details: '{details}'. Make sure to include next steps if applicable based on the context provided."
-    message_body = get_llm_response(prompt, context=context)
+    return comm_type, _fill_placeholders(get_llm_response(prompt, context=context), application)
+
+def draft_communications(applications, message_type_override=None, contexts=None, max_concurrency=None):
+    """
+    Drafts messages for many applications with all LLM calls in flight concurrently
+    (bounded by the LLM client's concurrency limit, or max_concurrency).
+    Returns [(comm_type, message_body)] in the same order.
+    """
+    contexts = contexts or [None] * len(applications)
+    requests = [_draft_request(app, message_type_override, context) for app, context in zip(applications, contexts)]
+    bodies = get_llm_responses(
+        [prompt for _, prompt, _ in requests],
+        [context for _, _, context in requests],
+        max_concurrency=max_concurrency
+    )
+    return [
+        (comm_type, _fill_placeholders(body, app))
+        for app, (comm_type, _, _), body in zip(applications, requests, bodies)
+    ]
+
+def deliver_communication(application, comm_type, message_body, fee_info=None):
+    """
+    "Sends" a drafted message, plus the fee slip for confirmed admissions, and records
+    it in the application's history. Returns the list of message types sent.
+    """
+    status = application['status']
+    student_email = application['email']
+    app_id = application['id']
 
     # Simulate sending
     simulate_communication(app_id, student_email, comm_type, message_body)
-    st.info(f"App {app_id}: Communication '{comm_type}' simulated.")
     # Add message to application log?
     application.setdefault('communication_history', []).append(f"[{pd.Timestamp.now()}] {comm_type}: Message sent (simulated).")
+    sent = [comm_type]
 
     # If Admission Confirmed, also generate and "send" fee slip
     if status == "Admission Confirmed":
-        fee_info = ""
-        loan_details = st.session_state.loan_requests.get(app_id)
-        if vector_store:
-             fee_docs = query_knowledge_base(vector_store, f"Fee structure for {application.get('course', 'general')}", k=1)
-             if fee_docs: fee_info = fee_docs[0].page_content
-        elif raw_docs_content:
-            fee_info = raw_docs_content.get('fee_structure', 'Fee details unavailable.')
-
-        fee_slip_content = generate_fee_slip_content(application, fee_info, loan_details)
+        loan_details = get_repository().get_loan_request(app_id)
+        if fee_info is None:
+            fee_info = ""
+            retriever, raw_docs_content = get_retriever(), get_raw_docs()
+            if retriever:
+                 fee_docs = query_knowledge_base(retriever, _fee_query(application), k=1,
+                                                 source='fee_structure', course=application.get('course'))
+                 if fee_docs: fee_info = fee_docs[0].page_content
+            elif raw_docs_content:
+                fee_info = raw_docs_content.get('fee_structure', 'Fee details unavailable.')
+
+        course_policy = get_policy_table().for_course(application.get('course'))
+        total_fee = course_policy.total_fee if course_policy else None
+        fee_slip_content = generate_fee_slip_content(application, fee_info, loan_details, total_fee=total_fee)
         simulate_communication(app_id, student_email, "Fee Slip", fee_slip_content)
-        st.info(f"App {app_id}: Fee Slip generated and simulated sending.")
         application['communication_history'].append(f"[{pd.Timestamp.now()}] Fee Slip: Sent (simulated).")
+        sent.append("Fee Slip")
+    return sent
+
+def student_counsellor_agent(application, message_type_override=None, context=None, fee_info=None):
+    """
+    Simulates drafting and sending communication based on application status.
+    Uses LLM with RAG for generating message content.
+    Batch callers can pass the RAG context / fee info they already retrieved (see notify_applicants).
+    """
+    st.write(f"🗣️ Student Counsellor Agent preparing communication for application {application['id']}...")
+    # The draft is streamed onto the page as it is written, instead of behind a spinner
+    comm_type, prompt, context = _draft_request(application, message_type_override, context)
+    with st.expander(f"Draft: {comm_type}", expanded=True):
+        draft = render_stream(get_llm_response(prompt, context=context, stream=True),
+                              transform=lambda text: _fill_placeholders(text, application))
+    message_body = _fill_placeholders(draft, application)
+    for sent_type in deliver_communication(application, comm_type, message_body, fee_info):
+        if sent_type == "Fee Slip":
+            st.info(f"App {application['id']}: Fee Slip generated and simulated sending.")
+        else:
+            st.info(f"App {application['id']}: Communication '{sent_type}' simulated.")
+    get_repository().update(application) # Persist the communication history
+
+def prefetch_communication_context(applications, message_type_override=None):
+    """
+    Retrieves the email context (and fee structure, for confirmed admissions) for
+    many applications with one batched knowledge base query for each.
+    Returns (contexts, fee_infos), aligned with applications; None means "retrieve on demand".
+    """
+    retriever = get_retriever()
+    if not retriever:
+        return [None] * len(applications), [None] * len(applications)
+
+    queries = [_communication_query(app, _communication_type(app, message_type_override)) for app in applications]
+    fee_apps = [i for i, app in enumerate(applications) if app['status'] == "Admission Confirmed"]
+    contexts = [_format_context(docs) for docs in query_knowledge_base_batch(retriever, queries, k=2)]
+    fee_results = query_knowledge_base_batch(retriever, [_fee_query(applications[i]) for i in fee_apps], k=1,
+                                             source='fee_structure', course=[applications[i].get('course') for i in fee_apps])
+    fee_infos = [None] * len(applications)
+    for i, docs in zip(fee_apps, fee_results):
+        fee_infos[i] = docs[0].page_content if docs else ""
+    return contexts, fee_infos
+
+def notify_applicants(applications, message_type_override=None):
+    """
+    Runs the counsellor agent for many applications. The email context (and fee
+    structure, for confirmed admissions) for all of them is fetched with batched
+    knowledge base queries instead of one or two queries per application.
+    """
+    contexts, fee_infos = prefetch_communication_context(applications, message_type_override)
+    for app, context, fee_info in zip(applications, contexts, fee_infos):
+        student_counsellor_agent(app, message_type_override, context=context, fee_info=fee_info)
+
+
+DEFAULT_LOAN_BUDGET = 100000 # Used if the loan policy doesn't state a budget
 
+def get_loan_ledger():
+    """The loan budget ledger, with its budget kept in line with the loan policy."""
+    ledger = get_ledger()
+    ledger.set_budget(get_policy_table().loan.budget or DEFAULT_LOAN_BUDGET) # No-op unless the policy changed
+    return ledger
+
+def remaining_loan_budget():
+    """University loan budget not reserved or committed to any loan (one row read from the ledger)."""
+    return get_loan_ledger().available()
 
 def student_loan_agent(application):
     """
@@ -163,42 +438,50 @@ def student_loan_agent(application):
          return "Deferred", "Admission not confirmed"
 
 
-    loan_policy_info = ""
-    if vector_store: # Use RAG
-        context_docs = query_knowledge_base(vector_store, f"Student loan eligibility and policy", k=1)
-        if context_docs:
-            loan_policy_info = context_docs[0].page_content
-    elif raw_docs_content: # Fallback
-        loan_policy_info = raw_docs_content.get('loan_policy', '')
-
-    if not loan_policy_info:
-        st.error("Could not retrieve loan policy from Knowledge Base.")
-        st.session_state.loan_requests[app_id] = {"status": "Error - Policy Missing", "details": "Loan policy not found."}
-        return "Error", "Loan policy missing"
+    policies = get_policy_table()
+    if policies.loan.max_loan_fraction is None:
+        # The policy table couldn't parse the loan rules; make sure the policy text exists at all
+        loan_policy_info = ""
+        retriever, raw_docs_content = get_retriever(), get_raw_docs()
+        if retriever: # Use RAG
+            context_docs = query_knowledge_base(retriever, f"Student loan eligibility and policy", k=1, source='loan_policy')
+            if context_docs:
+                loan_policy_info = context_docs[0].page_content
+        elif raw_docs_content: # Fallback
+            loan_policy_info = raw_docs_content.get('loan_policy', '')
+
+        if not loan_policy_info:
+            st.error("Could not retrieve loan policy from Knowledge Base.")
+            get_repository().record_loan_decision(app_id, "Error - Policy Missing", "Loan policy not found.")
+            get_ledger().release(app_id)
+            return "Error", "Loan policy missing"
 
     # Simplified check (In reality, parse policy using LLM or rules)
     # Assume student meets basic criteria for demo
     eligible = True
     reason = "Eligible based on simplified check."
-    max_loan_percentage = 0.80 # Default, ideally parse from policy_info
+    max_loan_percentage = policies.loan.max_loan_fraction or 0.80 # Default if the policy couldn't be parsed
     requested_amount = application.get('loan_amount_requested', 5000) # Assume a requested amount
 
-    # Placeholder for fee - fetch dynamically or use placeholder
-    course_fee = 10000 # Example fee
+    # Loans are capped as a share of the course's tuition fee
+    course_policy = policies.for_course(application.get('course'))
+    course_fee = course_policy.tuition_fee if course_policy and course_policy.tuition_fee else 10000 # Example fee
     max_possible_loan = course_fee * max_loan_percentage
 
     approved_amount = 0
+    ledger = get_loan_ledger()
     if eligible:
         if requested_amount <= max_possible_loan:
-            if st.session_state.available_loan_budget >= requested_amount:
+            # Reserving is atomic across sessions and processes: a concurrent decision can't spend the same budget
+            reserved, available_budget = ledger.reserve(app_id, requested_amount)
+            if reserved:
                  status = "Loan Approved"
-                 approved_amount = requested_amount
-                 st.session_state.available_loan_budget -= approved_amount
-                 details = f"Approved ${approved_amount}. Budget remaining: ${st.session_state.available_loan_budget}"
+                 approved_amount = ledger.hold(app_id)["amount"] # An earlier approval keeps its amount
+                 details = f"Approved ${approved_amount}. Budget remaining: ${available_budget}"
                  st.success(f"App {app_id}: {status} - {details}")
             else:
                 status = "Loan Rejected"
-                details = f"Insufficient university budget. Budget remaining: ${st.session_state.available_loan_budget}"
+                details = f"Insufficient university budget. Budget remaining: ${available_budget}"
                 st.error(f"App {app_id}: {status} - {details}")
         else:
             status = "Loan Rejected"
@@ -210,63 +493,125 @@ def student_loan_agent(application):
         details = reason # Use the reason from eligibility check
         st.error(f"App {app_id}: {status} - {details}")
 
-    st.session_state.loan_requests[app_id] = {"status": status, "details": details, "amount": approved_amount}
+    try:
+        get_repository().record_loan_decision(app_id, status, details, approved_amount)
+    except Exception:
+        if approved_amount:
+            ledger.release(app_id) # The decision wasn't recorded, so the reservation goes back to the budget
+        raise
+    if approved_amount:
+        ledger.commit(app_id)
+    else:
+        ledger.release(app_id) # A rejection gives back anything this application held
     application['loan_status'] = status # Update application too if needed
+    get_repository().update(application)
     # Trigger communication agent
     student_counsellor_agent(application, message_type_override=status)
 
     return status, details
 
 
-def director_bot_agent(query):
-    """Handles queries from the director."""
+@st.cache_resource
+def get_intent_router():
+    """The director bot's intent router, built on the knowledge base's embedding model (None if that failed to load)."""
+    embeddings = get_indexer().embeddings
+    if embeddings is None:
+        return None
+    try:
+        return IntentRouter(embeddings)
+    except Exception as e:
+        st.warning(f"Intent router unavailable, using keyword matching only: {e}")
+        return None
+
+@st.cache_resource
+def get_analytics_engine():
+    """The director bot's structured query engine over the application repository."""
+    return AnalyticsEngine(get_repository())
+
+def answer_intent(intent):
+    """Answers a known director question from the repository's maintained aggregates."""
+    repository = get_repository()
+    if intent == "total_applications":
+        return f"There are currently {repository.count()} applications in the system."
+    if intent == "status_overview":
+        status_counts = repository.status_counts()
+        if status_counts:
+            return "Current application status overview:\n" + "\n".join([f"- {status}: {count}" for status, count in status_counts.items()])
+        return "No applications submitted yet."
+    if intent == "shortlisted_count":
+        return f"There are {repository.count(status='Shortlisted')} shortlisted applications."
+    if intent == "confirmed_count":
+        return f"{repository.count(status='Admission Confirmed')} admissions have been confirmed."
+    if intent == "loan_budget":
+        return f"The remaining student loan budget is ${remaining_loan_budget()}."
+    if intent == "approved_loans":
+        loan_totals = repository.loan_totals()
+        return f"{loan_totals['approved_count']} loans have been approved so far, totaling ${loan_totals['approved_amount']}."
+    if intent == "course_breakdown":
+        course_counts = repository.course_counts()
+        if course_counts:
+            return "Applications by course:\n" + "\n".join([f"- {course or 'Not specified'}: {count}" for course, count in course_counts.items()])
+        return "No applications submitted yet."
+    return None
+
+def _data_snapshot():
+    # A few aggregate figures so open questions can still refer to the actual numbers
+    repository = get_repository()
+    status_counts = ", ".join(f"{status}: {count}" for status, count in repository.status_counts().items()) or "none"
+    return (f"{repository.count()} applications ({status_counts}); "
+            f"{repository.loan_totals()['approved_count']} loans approved; remaining loan budget ${remaining_loan_budget()}.")
+
+def director_bot_agent(query, use_cache=True, stream=False):
+    """
+    Handles queries from the director. Analytics questions are computed by the local
+    query engine, other questions about the application data are recognised by keyword
+    or by the embedding-based intent router, and only open-ended questions go to Gemini.
+    use_cache=False asks Gemini afresh instead of reusing a cached answer.
+    stream=True returns Gemini answers as an LLMStream for the caller to render progressively
+    (answers computed locally are always returned as text).
+    """
     st.write(f"🤖 Director Bot processing query: '{query}'...")
 
-    # Try to answer based on aggregated data first
-    num_apps = len(st.session_state.get('applications', []))
-    apps_df = pd.DataFrame(st.session_state.get('applications', []))
-    response = None
-
-    query_lower = query.lower()
-    if "how many applications" in query_lower or "total applications" in query_lower:
-        response = f"There are currently {num_apps} applications in the system."
-    elif "status overview" in query_lower or "summary" in query_lower:
-        if not apps_df.empty:
-            status_counts = apps_df['status'].value_counts().to_dict()
-            response = "Current application status overview:\n" + "\n".join([f"- {status}: {count}" for status, count in status_counts.items()])
-        else:
-            response = "No applications submitted yet."
-    elif "shortlisted" in query_lower:
-        count = 0
-        if not apps_df.empty and 'status' in apps_df.columns:
-            count = apps_df[apps_df['status'] == 'Shortlisted'].shape[0]
-        response = f"There are {count} shortlisted applications."
-    elif "loan budget" in query_lower:
-        response = f"The remaining student loan budget is ${st.session_state.get('available_loan_budget', 'N/A')}."
-    elif "approved loans" in query_lower:
-        approved_count = sum(1 for details in st.session_state.get('loan_requests', {}).values() if details['status'] == 'Loan Approved')
-        total_approved_amount = sum(details.get('amount',0) for details in st.session_state.get('loan_requests', {}).values() if details['status'] == 'Loan Approved')
-        response = f"{approved_count} loans have been approved so far, totaling ${total_approved_amount}."
+    # Filtered / grouped / aggregate questions ("average grade 12 of shortlisted MBA applicants by status")
+    # are parsed and computed locally
+    analytics_query = get_analytics_engine().parse(query)
+    if analytics_query:
+        st.caption(f"Computed locally: {analytics_query.describe()}.")
+        return get_analytics_engine().run_and_format(analytics_query)
+
+    intent = keyword_intent(query)
+    if intent is None:
+        router = get_intent_router()
+        if router:
+            intent, score = router.route(query)
+            if intent:
+                st.caption(f"Recognised as '{intent}' (similarity {score:.2f}).")
+    response = answer_intent(intent)
 
     # Fallback to Gemini LLM
     if response is None:
         st.write("Query not matched with predefined logic, using Gemini for LLM response...")
 
-        # Set up Gemini
-        load_dotenv()
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        # Set up Gemini (the SDK is imported here, on first use, because it is slow to import)
+        model = fake_model_from_env(model_name="fake-director")
+        if model is None:
+            import google.generativeai as genai
+            load_dotenv()
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
         try:
-            model = genai.GenerativeModel(model_name="models/gemini-1.5-pro")
+            model = model or genai.GenerativeModel(model_name="models/gemini-1.5-pro")
             prompt = f"""
             You are an assistant helping the director of a university understand the admission and loan process.
+            Current admission data: {_data_snapshot()}
             Here's a user query: "{query}"
 
             If relevant, include information about application steps, shortlisting, loan eligibility, etc.
             Be clear and concise in your response.
             """
-            gemini_response = model.generate_content(prompt)
-            response = gemini_response.text
+            if stream:
+                return stream_llm_response(prompt, use_cache=use_cache, model=model)
+            response = cached_generate(model, prompt, use_cache=use_cache)
         except Exception as e:
             response = f"An error occurred while querying Gemini API: {e}"
 
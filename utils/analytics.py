@@ -0,0 +1,353 @@
+# Local analytics for director questions such as "how many B.Tech Data Science applicants
+# above 85% were shortlisted" or "average grade 12 by course". A constrained question grammar
+# is parsed into a Query, which is evaluated with vectorized NumPy over a columnar snapshot
+# of the application store (kept current from the store's change log).
+import re
+import operator
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ("course", "status", "loan_status")
+NUMERIC_COLUMNS = ("grade_12_percentage", "grade_10_percentage", "entrance_exam_rank",
+                   "loan_amount_requested", "loan_amount_approved")
+
+COLUMN_LABELS = {
+    "course": "course",
+    "status": "status",
+    "loan_status": "loan status",
+    "grade_12_percentage": "Grade 12 %",
+    "grade_10_percentage": "Grade 10 %",
+    "entrance_exam_rank": "entrance rank",
+    "loan_amount_requested": "requested loan amount",
+    "loan_amount_approved": "approved loan amount",
+}
+
+# Phrases naming each numeric field; longer phrases are tried first
+FIELD_PHRASES = {
+    "grade 12": "grade_12_percentage", "class 12": "grade_12_percentage", "class xii": "grade_12_percentage",
+    "12th": "grade_12_percentage", "percentage": "grade_12_percentage", "marks": "grade_12_percentage",
+    "grade": "grade_12_percentage",
+    "grade 10": "grade_10_percentage", "class 10": "grade_10_percentage", "class x": "grade_10_percentage",
+    "10th": "grade_10_percentage",
+    "entrance rank": "entrance_exam_rank", "exam rank": "entrance_exam_rank", "rank": "entrance_exam_rank",
+    "requested loan amount": "loan_amount_requested", "loan amount requested": "loan_amount_requested",
+    "amount requested": "loan_amount_requested",
+    "approved loan amount": "loan_amount_approved", "loan amount approved": "loan_amount_approved",
+    "loan amount": "loan_amount_approved", "amount lent": "loan_amount_approved", "loans": "loan_amount_approved",
+}
+_FIELD_RE = re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(FIELD_PHRASES, key=len, reverse=True)) + r")\b")
+
+METRIC_WORDS = {"average": "avg", "avg": "avg", "mean": "avg", "sum": "sum", "total": "sum",
+                "highest": "max", "maximum": "max", "max": "max",
+                "lowest": "min", "minimum": "min", "min": "min"}
+_METRIC_RE = re.compile(r"\b(" + "|".join(METRIC_WORDS) + r")\b")
+
+_GROUP_RE = re.compile(r"\b(?:by|per|for each|for every|across|in each|grouped by)\s+(loan status|course|program(?:me)?|status|stage)(?:es|s)?\b")
+_GROUP_COLUMNS = {"loan status": "loan_status", "course": "course", "program": "course", "programme": "course",
+                  "status": "status", "stage": "status"}
+
+# Matched (and removed) before application statuses, so "loan rejected" isn't read as "rejected"
+_LOAN_STATUS_RES = [
+    (re.compile(r"\b(?:loans? (?:was |were |been )?approved|approved (?:for )?(?:a |their )?loans?|approved loan)\b"), "Loan Approved"),
+    (re.compile(r"\b(?:loans? (?:was |were |been )?(?:rejected|denied)|(?:rejected|denied) (?:for )?(?:a |their )?loans?)\b"), "Loan Rejected"),
+    (re.compile(r"\b(?:pending loans?|loans? pending|requested (?:a )?loans?|want(?:ed|ing)? (?:a )?loans?|interested in (?:a )?loans?)\b"), "Pending Request"),
+    (re.compile(r"\b(?:no loans?|without (?:a )?loans?|not (?:requested|wanting) (?:a )?loans?)\b"), "Not Requested"),
+]
+# Application statuses: a phrase maps to every known status starting with the given prefix
+_STATUS_RES = [
+    (re.compile(r"\bshort-?listed\b"), "Shortlisted"),
+    (re.compile(r"\b(?:confirmed|admitted|enrolled)\b"), "Admission Confirmed"),
+    (re.compile(r"\brejected\b"), "Rejected"),
+    (re.compile(r"\b(?:incomplete|missing documents)\b"), "Documents Incomplete"),
+    (re.compile(r"\b(?:documents?|docs?) complete\b"), "Documents Complete"),
+    (re.compile(r"\b(?:pending review|awaiting review|not yet reviewed)\b"), "Application Submitted"),
+]
+
+_NUMBER = r"(\d+(?:\.\d+)?)\s*(?:%|percent)?"
+_BETWEEN_RE = re.compile(r"\bbetween\s+" + _NUMBER + r"\s+and\s+" + _NUMBER)
+_COMPARISON_RE = re.compile(
+    r"(>=|<=|>|<|\bat least\b|\bat most\b|\bno less than\b|\bno more than\b|\babove\b|\bover\b|\bmore than\b"
+    r"|\bgreater than\b|\bhigher than\b|\bbelow\b|\bunder\b|\bless than\b|\blower than\b)\s*" + _NUMBER
+)
+_COMPARATORS = {">=": ">=", "at least": ">=", "no less than": ">=", "<=": "<=", "at most": "<=", "no more than": "<=",
+                ">": ">", "above": ">", "over": ">", "more than": ">", "greater than": ">", "higher than": ">",
+                "<": "<", "below": "<", "under": "<", "less than": "<", "lower than": "<"}
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+_COUNT_CUES = re.compile(r"\b(how many|number of|count)\b")  # "total number of ..." is a count, not a sum
+_QUESTION_CUES = re.compile(r"\b(how many|number of|count|average|avg|mean|total|sum|breakdown|highest|lowest|maximum|minimum|max|min)\b")
+
+@dataclass(frozen=True)
+class Query:
+    metric: str = "count"                 # count | avg | sum | min | max
+    field: Optional[str] = None           # numeric column aggregated (not used by count)
+    filters: Tuple[tuple, ...] = ()       # (column, op, value); op "in" takes a tuple of values
+    group_by: Optional[str] = None
+
+    def describe(self):
+        what = "Number of applications" if self.metric == "count" else f"{self.metric.capitalize()} {COLUMN_LABELS[self.field]}"
+        conditions = []
+        for column, op, value in self.filters:
+            if op == "in":
+                conditions.append(f"{COLUMN_LABELS[column]} is {' or '.join(value)}")
+            else:
+                conditions.append(f"{COLUMN_LABELS[column]} {op} {value:g}")
+        text = what + (f" where {', '.join(conditions)}" if conditions else "")
+        return text + (f", by {COLUMN_LABELS[self.group_by]}" if self.group_by else "")
+
+def _course_phrases(courses):
+    # Full names, plus the specialisation alone ("data science") and the family ("b.tech" -> every B.Tech course)
+    phrases = {}
+    for course in courses:
+        if not course or course.lower() == "other":
+            continue
+        name = course.lower()
+        phrases.setdefault(name, set()).add(course)
+        family, _, specialisation = name.partition(" ")
+        if specialisation:
+            phrases.setdefault(specialisation, set()).add(course)
+            phrases.setdefault(family, set()).add(course)
+    return phrases
+
+def parse_question(question, courses=(), statuses=()):
+    """
+    Parses a director question into a Query, or returns None if it isn't an analytics
+    question (no filters, grouping or aggregate beyond a plain count). courses/statuses
+    are the values present in the data, used to resolve names and status phrases.
+    """
+    text = " ".join(question.lower().replace("btech", "b.tech").replace("bsc", "b.sc").split())
+    if not _QUESTION_CUES.search(text):
+        return None
+    filters = []
+
+    # Numeric ranges, each applying to the field named just before it (Grade 12 % by default)
+    def _field_before(source, start):
+        named = _FIELD_RE.findall(source[max(0, start - 30):start])
+        return FIELD_PHRASES[named[-1]] if named else "grade_12_percentage"
+    for match in _BETWEEN_RE.finditer(text):
+        column = _field_before(text, match.start())
+        filters += [(column, ">=", float(match.group(1))), (column, "<=", float(match.group(2)))]
+    remaining = _BETWEEN_RE.sub(" ", text)
+    for match in _COMPARISON_RE.finditer(remaining):
+        filters.append((_field_before(remaining, match.start()), _COMPARATORS[match.group(1)], float(match.group(2))))
+    remaining = _COMPARISON_RE.sub(" ", remaining)
+
+    # Grouping
+    group_by = None
+    group_match = _GROUP_RE.search(remaining)
+    if group_match:
+        group_by = _GROUP_COLUMNS[group_match.group(1)]
+        remaining = remaining[:group_match.start()] + " " + remaining[group_match.end():]
+
+    # Aggregate: the metric word, applied to the first field named after it. Read before the
+    # status phrases are removed, so "total approved loan amount" keeps its field.
+    metric, field = "count", None
+    metric_match = _METRIC_RE.search(remaining)
+    if metric_match and not _COUNT_CUES.search(remaining):
+        named = _FIELD_RE.findall(remaining[metric_match.end():])
+        if named or METRIC_WORDS[metric_match.group(1)] == "avg":
+            metric = METRIC_WORDS[metric_match.group(1)]
+            field = FIELD_PHRASES[named[0]] if named else "grade_12_percentage"
+
+    # Loan status, then application status
+    for pattern, loan_status in _LOAN_STATUS_RES:
+        if pattern.search(remaining):
+            filters.append(("loan_status", "in", (loan_status,)))
+            remaining = pattern.sub(" ", remaining)
+            break
+    wanted_statuses = []
+    for pattern, prefix in _STATUS_RES:
+        if pattern.search(remaining):
+            wanted_statuses += [status for status in statuses if status.startswith(prefix)] or [prefix]
+    if wanted_statuses:
+        filters.append(("status", "in", tuple(dict.fromkeys(wanted_statuses))))
+
+    # Courses: longest phrase first, so "b.tech data science" wins over "b.tech"
+    wanted_courses = set()
+    for phrase, matching in sorted(_course_phrases(courses).items(), key=lambda item: len(item[0]), reverse=True):
+        pattern = re.compile(r"(?<![\w.])" + re.escape(phrase) + r"(?![\w])")
+        if pattern.search(remaining):
+            wanted_courses |= matching
+            remaining = pattern.sub(" ", remaining)
+    if wanted_courses:
+        filters.append(("course", "in", tuple(sorted(wanted_courses))))
+
+    if metric == "count" and not filters and not group_by:
+        return None  # a plain count is left to the bot's canned answers
+    return Query(metric=metric, field=field, filters=tuple(filters), group_by=group_by)
+
+class AnalyticsEngine:
+    """
+    Runs Queries over a columnar snapshot of the application repository. The snapshot
+    is loaded once and then patched with just the rows the change log says were written;
+    each query is a few vectorized passes over NumPy arrays (categorical columns as
+    integer codes), so it stays interactive at a million applications.
+    """
+
+    def __init__(self, repository, max_delta_fraction=0.2):
+        self.repository = repository
+        self.max_delta_fraction = max_delta_fraction  # above this share of changed rows, reload everything
+        self._lock = threading.Lock()
+        self._revision = None
+        self._ids = None
+        self._columns = None
+        self._categories = None
+        self._codes = None
+        self._size = 0
+
+    def _load_full(self):
+        revision, frame = self.repository.analytics_frame()
+        self._ids = frame["id"].to_numpy(dtype=np.int64)
+        self._columns, self._categories, self._codes = {}, {}, {}
+        for column in CATEGORICAL_COLUMNS:
+            values = pd.Categorical(frame[column].fillna(""))
+            self._columns[column] = values.codes.astype(np.int32)
+            self._categories[column] = list(values.categories)
+            self._codes[column] = {category: code for code, category in enumerate(values.categories)}
+        for column in NUMERIC_COLUMNS:
+            self._columns[column] = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+        self._size = len(frame)
+        self._revision = revision
+
+    def _apply_delta(self, revision, ids):
+        """Patches the snapshot with the rows written since it was taken. Returns False if it can't."""
+        _, frame = self.repository.analytics_frame(ids)
+        delta_ids = frame["id"].to_numpy(dtype=np.int64)
+        if len(delta_ids) != len(ids):
+            return False  # rows were deleted
+        positions = np.searchsorted(self._ids, delta_ids)
+        known = (positions < self._size) & (self._ids[np.minimum(positions, max(self._size - 1, 0))] == delta_ids) \
+            if self._size else np.zeros(len(delta_ids), dtype=bool)
+        if len(delta_ids[~known]) and self._size and delta_ids[~known].min() <= self._ids[-1]:
+            return False  # new rows must come after the ones we have, to keep ids sorted
+        appended = int((~known).sum())
+
+        def _patch(column, values):
+            current = self._columns[column]
+            if appended:
+                current = np.concatenate([current, np.empty(appended, dtype=current.dtype)])
+            current[positions[known]] = values[known]
+            current[self._size:] = values[~known]
+            self._columns[column] = current
+
+        for column in CATEGORICAL_COLUMNS:
+            codes = self._codes[column]
+            for category in frame[column].fillna("").unique():
+                if category not in codes:
+                    codes[category] = len(self._categories[column])
+                    self._categories[column].append(category)
+            _patch(column, frame[column].fillna("").map(codes).to_numpy(dtype=np.int32))
+        for column in NUMERIC_COLUMNS:
+            _patch(column, pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64))
+        if appended:
+            self._ids = np.concatenate([self._ids, delta_ids[~known]])
+        self._size += appended
+        self._revision = revision
+        return True
+
+    def _refresh(self):
+        # Cheap when nothing changed (one indexed read); otherwise only the changed rows are re-read
+        if self._revision is not None and self.repository.revision() == self._revision:
+            return
+        with self._lock:
+            if self._revision is not None:
+                changes = self.repository.changes_since(self._revision)
+                if changes is not None:
+                    revision, ids = changes
+                    if not ids:
+                        self._revision = revision
+                        return
+                    if len(ids) <= self.max_delta_fraction * max(self._size, 1) and self._apply_delta(revision, ids):
+                        return
+            self._load_full()
+
+    def categories(self, column):
+        self._refresh()
+        return self._categories[column]
+
+    def parse(self, question):
+        return parse_question(question, self.categories("course"), self.categories("status"))
+
+    def _mask(self, filters):
+        mask = np.ones(self._size, dtype=bool)
+        for column, op, value in filters:
+            if op == "in":
+                # Lookup table over category codes: one gather instead of a string comparison per row
+                lookup = np.zeros(len(self._categories[column]), dtype=bool)
+                for category in value:
+                    if category in self._categories[column]:
+                        lookup[self._categories[column].index(category)] = True
+                mask &= lookup[self._columns[column]]
+            else:
+                mask &= _OPS[op](self._columns[column], value)  # NaN compares False, i.e. excluded
+        return mask
+
+    def run(self, query):
+        """Returns a number, or a pandas Series indexed by group for grouped queries."""
+        fast = self._run_from_aggregates(query)
+        if fast is not None:
+            return fast
+        self._refresh()
+        mask = self._mask(query.filters)
+        if query.metric != "count":
+            values = self._columns[query.field]
+            mask &= ~np.isnan(values)
+
+        if query.group_by is None:
+            if query.metric == "count":
+                return int(mask.sum())
+            selected = values[mask]
+            if not len(selected):
+                return None
+            return float({"avg": np.mean, "sum": np.sum, "min": np.min, "max": np.max}[query.metric](selected))
+
+        codes = self._columns[query.group_by][mask]
+        groups = self._categories[query.group_by]
+        counts = np.bincount(codes, minlength=len(groups))
+        if query.metric == "count":
+            result = counts
+        elif query.metric in ("sum", "avg"):
+            sums = np.bincount(codes, weights=values[mask], minlength=len(groups))
+            result = sums if query.metric == "sum" else np.divide(sums, counts, out=np.full(len(groups), np.nan), where=counts > 0)
+        else:
+            extreme = pd.Series(values[mask]).groupby(codes).agg(query.metric)
+            result = np.full(len(groups), np.nan)
+            result[extreme.index.to_numpy()] = extreme.to_numpy()
+        series = pd.Series(result, index=[group or "Not specified" for group in groups])[counts > 0]
+        return series.sort_values(ascending=False)
+
+    def _run_from_aggregates(self, query):
+        # Counts filtered only by status/course are answered by the repository's maintained counters
+        if query.metric != "count" or any(op != "in" or column not in ("status", "course") for column, op, _ in query.filters):
+            return None
+        filters = {column: list(value) for column, _, value in query.filters}
+        if query.group_by is None:
+            return self.repository.count(status=filters.get("status"), course=filters.get("course"))
+        if not filters and query.group_by in ("status", "course"):
+            counts = self.repository.status_counts() if query.group_by == "status" else self.repository.course_counts()
+            return pd.Series({group or "Not specified": count for group, count in counts.items()}, dtype="int64")
+        return None
+
+    def run_and_format(self, query):
+        return format_result(query, self.run(query))
+
+    def answer(self, question):
+        """Answers an analytics question as text, or returns None if it isn't one."""
+        query = self.parse(question)
+        return self.run_and_format(query) if query else None
+
+def _format_value(value, metric):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "n/a"
+    return f"{int(value)}" if metric == "count" else f"{value:,.2f}"
+
+def format_result(query, result):
+    if not isinstance(result, pd.Series):
+        return f"{query.describe()}: {_format_value(result, query.metric)}"
+    if result.empty:
+        return f"{query.describe()}: no matching applications."
+    lines = [f"- {group}: {_format_value(value, query.metric)}" for group, value in result.items()]
+    return f"{query.describe()}:\n" + "\n".join(lines)
@@ -0,0 +1,83 @@
+# Okapi BM25 lexical index over the knowledge base chunks, in pure Python + NumPy.
+# Works without the embedding model (CPU-only / offline hosts) and is fused with the
+# FAISS ranking in hybrid retrieval (see utils/knowledge_base.py).
+import re
+import math
+import numpy as np
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which who will with "
+    "how do does i my me we our you your can should".split()
+)
+
+def tokenize(text):
+    """Lowercased alphanumeric terms, without common English stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+class BM25Index:
+    """
+    BM25 over a fixed set of documents. Each term's postings are stored as an array of
+    document positions with their BM25 weight precomputed, so scoring a query is one
+    vectorized add per query term and a partial sort.
+    """
+
+    def __init__(self, ids, texts, k1=DEFAULT_K1, b=DEFAULT_B):
+        self.ids = list(ids)
+        self.k1 = k1
+        self.b = b
+        tokenized = [tokenize(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        term_counts = {}  # term -> {doc position: term frequency}
+        for position, tokens in enumerate(tokenized):
+            for token in tokens:
+                counts = term_counts.setdefault(token, {})
+                counts[position] = counts.get(position, 0) + 1
+
+        n_docs = len(self.ids)
+        length_norm = k1 * (1 - b + b * lengths / average_length)
+        self._postings = {}
+        for term, counts in term_counts.items():
+            positions = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            frequencies = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            idf = math.log(1 + (n_docs - len(counts) + 0.5) / (len(counts) + 0.5))
+            weights = idf * frequencies * (k1 + 1) / (frequencies + length_norm[positions])
+            self._postings[term] = (positions, weights.astype(np.float32))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query):
+        """BM25 score of every document for the query (array aligned with ids)."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                positions, weights = postings
+                scores[positions] += weights # positions are unique within a term's postings
+        return scores
+
+    def search(self, query, k=4):
+        """The top k (id, score) pairs, best first; documents sharing no term with the query are left out."""
+        scores = self.scores(query)
+        matching = np.flatnonzero(scores > 0)
+        if len(matching) > k:
+            matching = matching[np.argpartition(-scores[matching], k - 1)[:k]]
+        ranked = matching[np.argsort(-scores[matching], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in ranked]
+
+def reciprocal_rank_fusion(rankings, k=4, rrf_k=60):
+    """
+    Fuses ranked id lists (best first) with reciprocal rank fusion: each id scores
+    sum(1 / (rrf_k + rank)) over the lists it appears in. Returns the top k ids.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused, key=lambda doc_id: -fused[doc_id])[:k]
@@ -0,0 +1,87 @@
+# Section-aware splitting of the knowledge base files. Chunks never straddle two
+# sections or two courses, and carry both as metadata, so an agent lookup can be
+# restricted to the file (and course) it is about instead of taking whatever the
+# top hit of the whole knowledge base happens to be.
+import re
+
+CHUNKING = "sections-v1"  # stored in the index settings: changing the scheme rebuilds saved indexes
+
+_HEADING_RE = re.compile(r"^(?![-*\d])(?P<title>[^:]{1,80}):\s*$")  # "Fee Structure:"
+_COURSE_RE = re.compile(r"^-?\s*Course:\s*(?P<course>.+?)\s*$")  # "- Course: MBA" opens a course block
+_FEE_LINE_RE = re.compile(r"^-\s*(?P<course>[^:(]+?)\s*\([^)]+\)\s*:")  # "- MBA (Annual): ..." is about one course
+_GENERAL_RE = re.compile(r"^-?\s*General\s*:", re.IGNORECASE)  # closes a course block
+
+def source_key(filename):
+    """"fee_structure.txt" -> "fee_structure" (the name agents filter on, as in raw_docs)."""
+    return filename.rsplit(".", 1)[0]
+
+def course_family(course):
+    # Same rule as the policy table: "B.Tech Data Science" -> "B.Tech"
+    return course.split()[0] if course else ""
+
+def _sections(text):
+    """Yields (section title, course or None, line) for the non-empty lines of a file."""
+    title, course = None, None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            title, course = heading.group("title").strip(), None
+            continue
+        course_match = _COURSE_RE.match(stripped)
+        if course_match:
+            course = course_match.group("course")
+            yield title, course, stripped
+        elif _GENERAL_RE.match(stripped):
+            course = None
+            yield title, None, stripped
+        else:
+            fee_line = _FEE_LINE_RE.match(stripped)
+            yield title, fee_line.group("course") if fee_line and not course else course, stripped
+
+def _pack(lines, chunk_size, chunk_overlap):
+    """Packs whole lines into pieces of at most chunk_size characters; only a line longer than that is cut."""
+    pieces, current = [], []
+    for line in lines:
+        while len(line) > chunk_size:
+            cut = line.rfind(" ", 0, chunk_size)
+            cut = cut if cut > chunk_size // 2 else chunk_size
+            if current:
+                pieces.append(current)
+            pieces.append([line[:cut]])
+            current, line = [], line[cut - min(chunk_overlap, cut // 2):].lstrip()
+        if current and len("\n".join(current + [line])) > chunk_size:
+            pieces.append(current)
+            # Carry the previous line over if it fits in the overlap, like the old splitter did
+            current = [current[-1]] if len(current[-1]) <= chunk_overlap else []
+        current.append(line)
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_sections(text, filename, chunk_size, chunk_overlap):
+    """
+    Splits one knowledge base file into Documents, one or more per (section, course).
+    Metadata: "source" (the file name), "section" (its heading, e.g. "Fee Structure")
+    and "course" (None for lines that apply to every course). The heading is repeated
+    at the top of each chunk so a chunk still reads (and embeds) as part of its section.
+    """
+    from langchain.docstore.document import Document
+    groups = []  # [(section, course, [lines])] in file order
+    for section, course, line in _sections(text):
+        if groups and groups[-1][:2] == (section, course):
+            groups[-1][2].append(line)
+        else:
+            groups.append((section, course, [line]))
+
+    chunks = []
+    for section, course, lines in groups:
+        header = f"{section}:\n" if section else ""
+        for piece in _pack(lines, max(chunk_size - len(header), 1), chunk_overlap):
+            chunks.append(Document(
+                page_content=header + "\n".join(piece),
+                metadata={"source": filename, "section": section, "course": course},
+            ))
+    return chunks
@@ -0,0 +1,350 @@
+import os
+import json
+import sqlite3
+import threading
+import pandas as pd
+import streamlit as st
+
+STORAGE_DIR = "storage"
+DB_PATH = os.path.join(STORAGE_DIR, "admissions.sqlite3")
+
+CHANGE_LOG_SIZE = 200000  # change log entries kept; readers further behind reload everything
+
+# Columns kept outside the JSON blob so they can be indexed, filtered and listed cheaply.
+# Everything else in the application dict lives in `data`.
+INDEXED_COLUMNS = ("name", "email", "course", "status", "status_details", "loan_status", "grade_12_percentage", "timestamp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT,
+    course TEXT,
+    status TEXT NOT NULL,
+    status_details TEXT,
+    loan_status TEXT,
+    grade_12_percentage REAL,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_applications_status ON applications(status);
+CREATE INDEX IF NOT EXISTS idx_applications_course ON applications(course);
+CREATE INDEX IF NOT EXISTS idx_applications_email ON applications(email);
+
+CREATE TABLE IF NOT EXISTS loan_requests (
+    app_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    details TEXT,
+    amount NUMERIC NOT NULL DEFAULT 0
+);
+"""
+
+# Materialized aggregates, kept current by triggers in the same transaction as each write,
+# so dashboard numbers are a handful of row reads however many applications there are.
+_AGGREGATES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS status_counts (status TEXT PRIMARY KEY, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS course_counts (course TEXT PRIMARY KEY, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS loan_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    approved_count INTEGER NOT NULL,
+    approved_amount NUMERIC NOT NULL
+);
+INSERT OR IGNORE INTO loan_totals (id, approved_count, approved_amount) VALUES (1, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_applications_insert AFTER INSERT ON applications BEGIN
+    INSERT INTO status_counts (status, n) VALUES (NEW.status, 1) ON CONFLICT(status) DO UPDATE SET n = n + 1;
+    INSERT INTO course_counts (course, n) VALUES (IFNULL(NEW.course, ''), 1) ON CONFLICT(course) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_applications_delete AFTER DELETE ON applications BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+    UPDATE course_counts SET n = n - 1 WHERE course = IFNULL(OLD.course, '');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_applications_status AFTER UPDATE OF status ON applications
+WHEN OLD.status IS NOT NEW.status BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+    INSERT INTO status_counts (status, n) VALUES (NEW.status, 1) ON CONFLICT(status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_applications_course AFTER UPDATE OF course ON applications
+WHEN OLD.course IS NOT NEW.course BEGIN
+    UPDATE course_counts SET n = n - 1 WHERE course = IFNULL(OLD.course, '');
+    INSERT INTO course_counts (course, n) VALUES (IFNULL(NEW.course, ''), 1) ON CONFLICT(course) DO UPDATE SET n = n + 1;
+END;
+
+-- Change log: one row per written application (or loan decision), so readers that keep
+-- derived data (e.g. the analytics snapshot) can catch up on just the rows that changed.
+-- Its latest seq is the store's revision.
+CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, app_id INTEGER NOT NULL);
+CREATE TRIGGER IF NOT EXISTS trg_changes_app_insert AFTER INSERT ON applications BEGIN INSERT INTO changes (app_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_changes_app_update AFTER UPDATE ON applications BEGIN INSERT INTO changes (app_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_changes_app_delete AFTER DELETE ON applications BEGIN INSERT INTO changes (app_id) VALUES (OLD.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_changes_loan_insert AFTER INSERT ON loan_requests BEGIN INSERT INTO changes (app_id) VALUES (NEW.app_id); END;
+CREATE TRIGGER IF NOT EXISTS trg_changes_loan_update AFTER UPDATE ON loan_requests BEGIN INSERT INTO changes (app_id) VALUES (NEW.app_id); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_loans_insert AFTER INSERT ON loan_requests
+WHEN NEW.status = 'Loan Approved' BEGIN
+    UPDATE loan_totals SET approved_count = approved_count + 1, approved_amount = approved_amount + NEW.amount WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_loans_update AFTER UPDATE ON loan_requests BEGIN
+    UPDATE loan_totals SET
+        approved_count = approved_count - (OLD.status = 'Loan Approved') + (NEW.status = 'Loan Approved'),
+        approved_amount = approved_amount
+            - CASE WHEN OLD.status = 'Loan Approved' THEN OLD.amount ELSE 0 END
+            + CASE WHEN NEW.status = 'Loan Approved' THEN NEW.amount ELSE 0 END
+    WHERE id = 1;
+END;
+"""
+
+def _to_row(application):
+    data = json.dumps(application, default=str)
+    return tuple(
+        str(application[column]) if column == "timestamp" and application.get(column) is not None else application.get(column)
+        for column in INDEXED_COLUMNS
+    ) + (data,)
+
+def _from_row(row):
+    application = json.loads(row["data"])
+    application["id"] = row["id"]
+    # The indexed columns are authoritative (atomic transitions only update those)
+    for column in INDEXED_COLUMNS:
+        application[column] = row[column]
+    return application
+
+class ApplicationRepository:
+    """
+    SQLite store for applications, shared by every session and process.
+    Runs in WAL mode with one reused connection per thread; lookups by id,
+    status, course and email go through indexes, and counts per status/course
+    and loan totals are maintained incrementally by triggers.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.executescript(_AGGREGATES_SCHEMA)
+        self._check_aggregates()
+        self.trim_change_log()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _where(status=None, course=None, email=None):
+        clauses, params = [], []
+        for column, value in (("status", status), ("course", course), ("email", email)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                values = list(value)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    # --- Reads ---
+    def get(self, app_id):
+        """Returns the application dict, or None."""
+        row = self._conn().execute("SELECT * FROM applications WHERE id = ?", (int(app_id),)).fetchone()
+        return _from_row(row) if row else None
+
+    def list(self, status=None, course=None, email=None, limit=None, offset=0, newest_first=False):
+        """Applications matching the filters (each may be a value or a list of values), paged by limit/offset."""
+        where, params = self._where(status, course, email)
+        sql = f"SELECT * FROM applications{where} ORDER BY id {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [_from_row(row) for row in self._conn().execute(sql, params)]
+
+    def count(self, status=None, course=None, email=None):
+        if email is None and (status is None or course is None):
+            # Answered from the maintained aggregates instead of scanning
+            if course is None:
+                counts = self.status_counts()
+                keys = counts if status is None else ([status] if isinstance(status, str) else status)
+            else:
+                counts = self.course_counts()
+                keys = [course] if isinstance(course, str) else course
+            return sum(counts.get(key, 0) for key in keys)
+        where, params = self._where(status, course, email)
+        return self._conn().execute(f"SELECT COUNT(*) FROM applications{where}", params).fetchone()[0]
+
+    def status_counts(self):
+        """{status: count}, most common first."""
+        rows = self._conn().execute("SELECT status, n FROM status_counts WHERE n > 0 ORDER BY n DESC")
+        return {row[0]: row[1] for row in rows}
+
+    def course_counts(self):
+        """{course: count}, most common first."""
+        rows = self._conn().execute("SELECT course, n FROM course_counts WHERE n > 0 ORDER BY n DESC")
+        return {row[0]: row[1] for row in rows}
+
+    def loan_totals(self):
+        """{"approved_count", "approved_amount"} over all loan decisions."""
+        row = self._conn().execute("SELECT approved_count, approved_amount FROM loan_totals WHERE id = 1").fetchone()
+        return {"approved_count": row[0], "approved_amount": row[1]}
+
+    def revision(self):
+        """Counter that changes whenever applications or loan decisions are written (by any process)."""
+        row = self._conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, revision):
+        """
+        (latest revision, ids of applications written after `revision`), or None if the
+        change log has been trimmed past that point and the caller has to reload everything.
+        """
+        conn = self._conn()
+        (oldest,) = conn.execute("SELECT MIN(seq) FROM changes").fetchone()
+        latest = self.revision()
+        if latest > revision and (oldest is None or oldest > revision + 1):
+            return None
+        ids = [row[0] for row in conn.execute("SELECT DISTINCT app_id FROM changes WHERE seq > ? AND seq <= ?", (revision, latest))]
+        return latest, ids
+
+    def get_loan_request(self, app_id):
+        """The loan decision recorded for an application ({"status", "details", "amount"}), or None."""
+        row = self._conn().execute("SELECT status, details, amount FROM loan_requests WHERE app_id = ?", (int(app_id),)).fetchone()
+        return dict(row) if row else None
+
+    def ids(self, newest_first=False):
+        return [row[0] for row in self._conn().execute(f"SELECT id FROM applications ORDER BY id {'DESC' if newest_first else 'ASC'}")]
+
+    def as_dataframe(self, status=None, course=None, limit=None, offset=0):
+        """The indexed columns as a DataFrame, for display without decoding every JSON blob."""
+        where, params = self._where(status, course)
+        sql = f"SELECT id, {', '.join(INDEXED_COLUMNS)} FROM applications{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return pd.read_sql_query(sql, self._conn(), params=params)
+
+    def analytics_frame(self, ids=None):
+        """
+        (revision, DataFrame) with one row per application (or just the given ids) and the
+        fields analytics filters and aggregates on, read as one consistent snapshot.
+        """
+        sql = ("SELECT a.id, a.course, a.status, a.loan_status, a.grade_12_percentage,"
+               " json_extract(a.data, '$.grade_10_percentage') AS grade_10_percentage,"
+               " json_extract(a.data, '$.entrance_exam_rank') AS entrance_exam_rank,"
+               " json_extract(a.data, '$.loan_amount_requested') AS loan_amount_requested,"
+               " CASE WHEN l.status = 'Loan Approved' THEN l.amount ELSE 0 END AS loan_amount_approved"
+               " FROM applications a LEFT JOIN loan_requests l ON l.app_id = a.id")
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            revision = self.revision()
+            if ids is None:
+                frame = pd.read_sql_query(sql + " ORDER BY a.id", conn)
+            else:
+                ids = sorted(ids)
+                # Chunked to stay under SQLite's bound-parameter limit
+                frame = pd.concat([
+                    pd.read_sql_query(f"{sql} WHERE a.id IN ({','.join('?' * len(chunk))})", conn, params=chunk)
+                    for chunk in (ids[start:start + 500] for start in range(0, len(ids), 500))
+                ] or [pd.read_sql_query(sql + " WHERE 0", conn)], ignore_index=True).sort_values("id", ignore_index=True)
+        finally:
+            conn.execute("COMMIT")
+        return revision, frame
+
+    # --- Writes ---
+    def add(self, application):
+        """Inserts a new application, sets its 'id' and returns it."""
+        application.pop("id", None)
+        cursor = self._conn().execute(
+            f"INSERT INTO applications ({', '.join(INDEXED_COLUMNS)}, data) VALUES ({', '.join('?' * (len(INDEXED_COLUMNS) + 1))})",
+            _to_row(application)
+        )
+        application["id"] = cursor.lastrowid
+        return application["id"]
+
+    def update(self, application):
+        """Writes back every field of an application dict."""
+        self.update_many([application])
+
+    def update_many(self, applications):
+        """Writes back many applications in one transaction."""
+        conn = self._conn()
+        assignments = ", ".join(f"{column} = ?" for column in INDEXED_COLUMNS)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"UPDATE applications SET {assignments}, data = ? WHERE id = ?",
+                [_to_row(app) + (app["id"],) for app in applications]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record_loan_decision(self, app_id, status, details, amount=0):
+        """Records (or replaces) the loan decision for an application."""
+        # An upsert, not INSERT OR REPLACE: REPLACE deletes silently and would skip the totals trigger
+        self._conn().execute(
+            "INSERT INTO loan_requests (app_id, status, details, amount) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(app_id) DO UPDATE SET status = excluded.status, details = excluded.details, amount = excluded.amount",
+            (int(app_id), status, details, amount)
+        )
+
+    def transition_status(self, app_id, from_status, to_status, details):
+        """
+        Atomically moves an application from from_status (a value or a tuple of values)
+        to to_status. Returns False, changing nothing, if it was no longer in from_status
+        (e.g. another officer or process got there first).
+        """
+        from_statuses = list(from_status) if isinstance(from_status, (list, tuple, set)) else [from_status]
+        cursor = self._conn().execute(
+            f"UPDATE applications SET status = ?, status_details = ? WHERE id = ? AND status IN ({','.join('?' * len(from_statuses))})",
+            [to_status, details, int(app_id)] + from_statuses
+        )
+        return cursor.rowcount == 1
+
+    def trim_change_log(self, keep=CHANGE_LOG_SIZE):
+        """Drops all but the latest `keep` change log entries."""
+        self._conn().execute("DELETE FROM changes WHERE seq <= ?", (self.revision() - keep,))
+
+    # --- Aggregates ---
+    def _check_aggregates(self):
+        # Databases created before the aggregate tables existed (or edited by hand) are rebuilt once
+        conn = self._conn()
+        (stored,) = conn.execute("SELECT IFNULL(SUM(n), 0) FROM status_counts").fetchone()
+        (actual,) = conn.execute("SELECT COUNT(*) FROM applications").fetchone()
+        if stored != actual:
+            self.rebuild_aggregates()
+
+    def rebuild_aggregates(self):
+        """Recomputes every aggregate from scratch."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM status_counts")
+            conn.execute("INSERT INTO status_counts (status, n) SELECT status, COUNT(*) FROM applications GROUP BY status")
+            conn.execute("DELETE FROM course_counts")
+            conn.execute("INSERT INTO course_counts (course, n) SELECT IFNULL(course, ''), COUNT(*) FROM applications GROUP BY IFNULL(course, '')")
+            conn.execute(
+                "UPDATE loan_totals SET"
+                " approved_count = (SELECT COUNT(*) FROM loan_requests WHERE status = 'Loan Approved'),"
+                " approved_amount = (SELECT IFNULL(SUM(amount), 0) FROM loan_requests WHERE status = 'Loan Approved')"
+                " WHERE id = 1"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+@st.cache_resource
+def get_repository():
+    """The process-wide application repository."""
+    return ApplicationRepository()
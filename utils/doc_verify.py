@@ -0,0 +1,200 @@
+# Verification of stored application documents (see utils/uploads.py): each file is
+# memory-mapped and checked for a type matching its extension, truncation/corruption,
+# PDF page count and image dimensions. Batches are spread over a process pool.
+# Kept free of Streamlit imports so pool workers start quickly.
+import os
+import re
+import time
+import mmap
+import zlib
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .retrieval_cache import LRUCache
+
+MIN_IMAGE_SIDE = 300  # px; smaller scans aren't legible
+INLINE_BELOW = 8  # batches with fewer distinct files are checked in-process (pool start-up isn't worth it)
+
+# Required documents on an application: (field on the application, label shown to officers)
+REQUIRED_DOCUMENTS = (
+    ("grade10_marksheet_details", "Class X Marksheet"),
+    ("grade12_marksheet_details", "Class XII Marksheet"),
+    ("id_proof_details", "ID Proof"),
+)
+
+# Declared extension -> detected type
+EXTENSION_TYPES = {"pdf": "pdf", "png": "png", "jpg": "jpeg", "jpeg": "jpeg"}
+
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_PDF_MAGIC = b"%PDF-"
+_PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_PDF_COUNT_RE = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b", re.S)
+# Start-of-frame markers carry the dimensions; C4 (DHT), C8 (JPG) and CC (DAC) share the range but don't
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_STANDALONE = set(range(0xD0, 0xD8)) | {0x01}
+
+def detect_type(data):
+    """'pdf', 'png', 'jpeg' or None from the leading bytes."""
+    if data[:8] == _PNG_MAGIC:
+        return "png"
+    if data[:3] == _JPEG_MAGIC:
+        return "jpeg"
+    if data.find(_PDF_MAGIC, 0, 1024) != -1: # The header may follow a little junk
+        return "pdf"
+    return None
+
+def _check_pdf(data, verdict):
+    size = len(data)
+    if data.rfind(b"%%EOF", max(0, size - 2048)) == -1:
+        verdict["problems"].append("PDF is truncated (no end-of-file marker)")
+    if data.find(b"/Encrypt") != -1:
+        verdict["problems"].append("PDF is encrypted")
+    pages = len(_PDF_PAGE_RE.findall(data))
+    if not pages:
+        # Page objects can be hidden in compressed object streams; fall back to the page tree's count
+        counts = [int(a or b) for a, b in _PDF_COUNT_RE.findall(data)]
+        pages = max(counts, default=0)
+    verdict["pages"] = pages
+    if not pages:
+        verdict["problems"].append("PDF has no pages")
+
+def _check_png(data, verdict):
+    if len(data) < 33 or data[12:16] != b"IHDR":
+        verdict["problems"].append("PNG header is corrupt")
+        return
+    (crc,) = struct.unpack(">I", data[29:33])
+    if zlib.crc32(data[12:29]) != crc:
+        verdict["problems"].append("PNG header is corrupt (bad checksum)")
+    verdict["width"], verdict["height"] = struct.unpack(">II", data[16:24])
+    if data.rfind(b"IEND", max(0, len(data) - 12)) == -1:
+        verdict["problems"].append("PNG is truncated (no end chunk)")
+
+def _check_jpeg(data, verdict):
+    size = len(data)
+    i = 2
+    while i + 4 <= size:
+        if data[i] != 0xFF:
+            verdict["problems"].append("JPEG is corrupt (bad segment marker)")
+            return
+        marker = data[i + 1]
+        if marker == 0xFF: # Fill byte
+            i += 1
+            continue
+        if marker in _JPEG_STANDALONE:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA): # End of image / start of scan before any frame header
+            break
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        if marker in _JPEG_SOF and i + 9 <= size:
+            verdict["height"], verdict["width"] = struct.unpack(">HH", data[i + 5:i + 9])
+            break
+        i += 2 + length
+    if "width" not in verdict:
+        verdict["problems"].append("JPEG has no frame header")
+    if data.rfind(b"\xff\xd9", max(0, size - 1024)) == -1:
+        verdict["problems"].append("JPEG is truncated (no end-of-image marker)")
+
+_CHECKS = {"pdf": _check_pdf, "png": _check_png, "jpeg": _check_jpeg}
+
+def verify_document(reference):
+    """
+    Inspects one stored upload (a reference from UploadStore.store).
+    Returns {"filename", "sha256", "declared", "detected", "pages", "width", "height",
+    "problems", "ok", "seconds"}; ok is True when no problems were found.
+    """
+    started = time.perf_counter()
+    filename = reference.get("filename", "")
+    declared = EXTENSION_TYPES.get(os.path.splitext(filename)[1].lower().lstrip("."))
+    verdict = {"filename": filename, "sha256": reference.get("sha256"), "declared": declared, "problems": []}
+    path = reference.get("path")
+    if not path or not os.path.exists(path):
+        verdict["problems"].append("File was not stored")
+    elif declared is None:
+        verdict["problems"].append(f"Unsupported file type '{os.path.splitext(filename)[1]}'")
+    else:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                verdict["problems"].append("File is empty")
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    verdict["detected"] = detect_type(data)
+                    if verdict["detected"] is None:
+                        verdict["problems"].append("Content is not a PDF, PNG or JPEG")
+                    elif verdict["detected"] != declared:
+                        verdict["problems"].append(f"Declared as {declared.upper()} but content is {verdict['detected'].upper()}")
+                    else:
+                        _CHECKS[declared](data, verdict)
+                        if min(verdict.get("width", MIN_IMAGE_SIDE), verdict.get("height", MIN_IMAGE_SIDE)) < MIN_IMAGE_SIDE:
+                            verdict["problems"].append(f"Image is too small ({verdict['width']}x{verdict['height']} px)")
+    verdict["ok"] = not verdict["problems"]
+    verdict["seconds"] = time.perf_counter() - started
+    return verdict
+
+def application_documents(application):
+    """[(label, reference or None)] for the application's required and optional documents."""
+    documents = [(label, application.get(field)) for field, label in REQUIRED_DOCUMENTS]
+    documents += [(f"Other document '{ref.get('filename')}'", ref) for ref in application.get("other_docs_details") or []]
+    return documents
+
+class DocumentVerifier:
+    """
+    Verifies documents in bulk. Distinct files (by content hash and declared type) are
+    checked once, across a process pool for large batches, and verdicts are kept in an
+    LRU cache: stored content never changes, so neither does its verdict.
+    """
+
+    def __init__(self, max_workers=None, inline_below=INLINE_BELOW, cache_size=10000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.inline_below = inline_below
+        self._cache = LRUCache(cache_size)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _key(self, reference):
+        return (reference.get("sha256") or reference.get("path"), os.path.splitext(reference.get("filename", ""))[1].lower())
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the Streamlit server process is multi-threaded
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def verify_many(self, references):
+        """Verdicts (see verify_document) for a list of references, in order."""
+        verdicts, pending = {}, {}
+        for reference in references:
+            key = self._key(reference)
+            if key in verdicts or key in pending:
+                continue
+            cached = self._cache.get(key)
+            if cached is not None:
+                verdicts[key] = cached
+            else:
+                pending[key] = reference
+        todo = list(pending.items())
+        if len(todo) < self.inline_below or self.max_workers == 1:
+            results = [verify_document(reference) for _, reference in todo]
+        else:
+            chunksize = max(1, len(todo) // (self.max_workers * 4))
+            try:
+                results = list(self._get_pool().map(verify_document, [reference for _, reference in todo], chunksize=chunksize))
+            except BrokenProcessPool:
+                with self._lock:
+                    self._pool = None # A worker died; start a fresh pool next time and finish this batch here
+                results = [verify_document(reference) for _, reference in todo]
+        for (key, _), verdict in zip(todo, results):
+            verdicts[key] = verdict
+            self._cache.set(key, verdict)
+        # A verdict may come from an identical file uploaded under another name
+        return [{**verdicts[self._key(reference)], "filename": reference.get("filename", "")} for reference in references]
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -1,49 +1,200 @@
+import os
 import streamlit as st
-import pandas as pd
-import time
-import google.generativeai as genai
+from .llm import (
+    AsyncLLMClient, LLMStream, run_sync, stream_chunks, fake_model_from_env,
+    DEFAULT_MAX_CONCURRENCY, DEFAULT_TIMEOUT_SECONDS, DEFAULT_MAX_RETRIES
+)
+from .llm_cache import LLMResponseCache
+from .outbox import Outbox, transport_from_env, QUEUED, SENT, FAILED
 
 # -------------------------
 # Gemini Model Initialization
 # -------------------------
+# Created on first use, not at import: importing the Gemini SDK alone takes about a
+# second, and pages that never call the LLM (e.g. the landing page) shouldn't pay for it.
+@st.cache_resource
+def get_gemini_model():
+    """The shared Gemini model, or None if it couldn't be configured. LLM_BACKEND=fake uses a local FakeModel."""
+    fake_model = fake_model_from_env()
+    if fake_model:
+        return fake_model
+    import google.generativeai as genai
+    try:
+        genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+        return genai.GenerativeModel("gemini-pro")
+    except Exception as e:
+        st.error(f"Failed to initialize Gemini client. Check API key in secrets.toml: {e}")
+        return None
+
+@st.cache_resource
+def get_llm_client():
+    """The shared async client for the Gemini model, or None if the model isn't available."""
+    model = get_gemini_model()
+    if not model:
+        return None
+    # Concurrency limit, per-call timeout and retries can be tuned via environment variables
+    return AsyncLLMClient(
+        model,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    )
+
+# Replies are cached on disk so repeated prompts (resubmitted justifications, repeated
+# director questions, identical status emails) don't go back to the API.
 try:
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    model = genai.GenerativeModel("gemini-pro")
+    response_cache = LLMResponseCache()
 except Exception as e:
-    st.error(f"Failed to initialize Gemini client. Check API key in secrets.toml: {e}")
-    model = None
+    print(f"LLM response cache disabled: {e}")
+    response_cache = None
 
 # -------------------------
 # Session State Initialization
 # -------------------------
 def initialize_session_state():
-    """Initializes session state variables if they don't exist."""
-    if 'applications' not in st.session_state:
-        st.session_state.applications = []
-    if 'next_app_id' not in st.session_state:
-        st.session_state.next_app_id = 1
+    """
+    Initializes session state variables if they don't exist.
+    Applications and loan decisions live in the shared repository (utils/db.py), not in the session.
+    """
     if 'communication_log' not in st.session_state:
         st.session_state.communication_log = []
-    if 'loan_requests' not in st.session_state:
-        st.session_state.loan_requests = {}
-    if 'available_loan_budget' not in st.session_state:
-        st.session_state.available_loan_budget = 100000
 
 # -------------------------
 # Gemini Response Utilities
 # -------------------------
-def get_llm_response(prompt, context=""):
-    """Gets a response from Gemini, optionally with context."""
-    if not model:
+def _full_prompt(prompt, context):
+    return f"{context}\n\nUser Query/Task: {prompt}\n\nAssistant Response:"
+
+def model_name_of(model):
+    """The model's name as used in response cache keys."""
+    return getattr(model, "model_name", type(model).__name__)
+
+def cached_generate(model, prompt, context="", use_cache=True):
+    """
+    Calls model.generate_content through the response cache. For callers that use
+    their own model (e.g. the director bot); agents should use get_llm_response.
+    """
+    key = LLMResponseCache.key(model_name_of(model), prompt, context) if use_cache and response_cache else None
+    if key:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    response = model.generate_content(prompt).text
+    if key:
+        response_cache.set(key, response, model_name_of(model))
+    return response
+
+def get_llm_response(prompt, context="", use_cache=True, stream=False):
+    """
+    Gets a response from Gemini, optionally with context. use_cache=False forces a fresh reply.
+    stream=True returns an LLMStream of the reply as it is generated (see stream_llm_response).
+    """
+    if stream:
+        return stream_llm_response(prompt, context, use_cache)
+    if not get_llm_client():
         return "Error: Gemini model not initialized."
 
-    full_prompt = f"{context}\n\nUser Query/Task: {prompt}\n\nAssistant Response:"
-    try:
-        response = model.generate_content(full_prompt)
-        return response.text.strip()
-    except Exception as e:
-        st.error(f"Error communicating with Gemini: {e}")
-        return f"Error: Could not get response from Gemini. {e}"
+    return get_llm_responses([prompt], [context], use_cache=use_cache)[0]
+
+async def aget_llm_responses(prompts, contexts=None, max_concurrency=None, use_cache=True):
+    """
+    Async batch version of get_llm_response: cached replies are returned straight away
+    and the rest run concurrently, bounded by the client's concurrency limit (or
+    max_concurrency). Replies come back in order, with "Error: ..." text for prompts
+    that failed (errors are never cached).
+    """
+    llm_client = get_llm_client()
+    if not llm_client:
+        return ["Error: Gemini model not initialized."] * len(prompts)
+
+    contexts = contexts or [""] * len(prompts)
+    replies = [None] * len(prompts)
+    keys = [None] * len(prompts)
+    if use_cache and response_cache:
+        model_name = model_name_of(llm_client.model)
+        for i, (prompt, context) in enumerate(zip(prompts, contexts)):
+            keys[i] = LLMResponseCache.key(model_name, prompt, context)
+            replies[i] = response_cache.get(keys[i])
+
+    # Identical prompts within the batch are only sent once when caching is on
+    pending = {}
+    for i, reply in enumerate(replies):
+        if reply is None:
+            pending.setdefault(keys[i] or i, []).append(i)
+    fresh = await llm_client.gather(
+        [_full_prompt(prompts[indices[0]], contexts[indices[0]]) for indices in pending.values()],
+        max_concurrency=max_concurrency
+    )
+    for (key, indices), reply in zip(pending.items(), fresh):
+        if isinstance(reply, Exception):
+            st.error(f"Error communicating with Gemini: {reply}")
+            reply = f"Error: Could not get response from Gemini. {reply}"
+        elif keys[indices[0]]:
+            response_cache.set(key, reply, model_name_of(llm_client.model))
+        for i in indices:
+            replies[i] = reply
+    return replies
+
+def get_llm_responses(prompts, contexts=None, max_concurrency=None, use_cache=True):
+    """Drafts many responses in parallel from synchronous code (see aget_llm_responses)."""
+    return run_sync(aget_llm_responses(prompts, contexts, max_concurrency, use_cache))
+
+def stream_llm_response(prompt, context="", use_cache=True, model=None):
+    """
+    Streaming version of get_llm_response: returns an LLMStream that yields the reply as
+    it is generated (render it with render_stream). A cached reply comes back as a
+    single chunk; a completed reply is cached like any other.
+    model: a specific model, called with the bare prompt as cached_generate does
+    (e.g. the director bot's); by default the shared agent model with the RAG context.
+    """
+    if model is None:
+        llm_client = get_llm_client()
+        if not llm_client:
+            return LLMStream(["Error: Gemini model not initialized."])
+        model, full_prompt = llm_client.model, _full_prompt(prompt, context)
+    else:
+        full_prompt = prompt
+    key = LLMResponseCache.key(model_name_of(model), prompt, context) if use_cache and response_cache else None
+    if key:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return LLMStream([cached], from_cache=True)
+
+    failed = []
+    def _chunks():
+        try:
+            yield from stream_chunks(model, full_prompt)
+        except Exception as e:
+            failed.append(e)
+            st.error(f"Error communicating with Gemini: {e}")
+            yield f"Error: Could not get response from Gemini. {e}"
+
+    def _on_complete(text):
+        if key and not failed and text.strip():
+            response_cache.set(key, text.strip(), model_name_of(model))
+    return LLMStream(_chunks(), on_complete=_on_complete)
+
+def render_stream(stream, transform=None):
+    """
+    Renders an LLMStream progressively as Markdown, then a caption with the time to first
+    token. transform(text) is applied to the text shown so far (e.g. to fill placeholders).
+    Returns the full reply text.
+    """
+    placeholder = st.empty()
+    shown = ""
+    for chunk in stream:
+        shown += chunk
+        placeholder.markdown((transform(shown) if transform else shown) + " ▌")
+    placeholder.markdown(transform(stream.text) if transform else stream.text)
+    if stream.from_cache:
+        st.caption("Served from the response cache.")
+    elif stream.time_to_first_token is not None:
+        st.caption(f"First token after {stream.time_to_first_token:.2f}s, complete after {stream.total_seconds:.2f}s.")
+    return stream.text
+
+def get_llm_cache_stats():
+    """Hit/miss counters and size of the LLM response cache."""
+    return response_cache.stats() if response_cache else {"enabled": False}
 
 def get_gemini_justification(application):
     """
@@ -63,30 +214,63 @@ def get_gemini_justification(application):
 # -------------------------
 # Communication Simulation
 # -------------------------
+@st.cache_resource
+def get_outbox():
+    """The process-wide outbox, with its background dispatcher running."""
+    outbox = Outbox(transport=transport_from_env())
+    outbox.start()
+    return outbox
+
 def simulate_communication(app_id, student_email, message_type, details):
-    """Simulates sending communication and logs it."""
+    """
+    Queues the message in the outbox and logs it; returns immediately.
+    Delivery happens in the background (see sync_delivery_status).
+    """
+    import pandas as pd # Not at module level: the landing page imports this module and never needs pandas
+    message_id = get_outbox().enqueue(app_id, student_email, message_type, details)
     log_entry = {
         "timestamp": pd.Timestamp.now(),
         "app_id": app_id,
         "recipient": student_email,
         "type": message_type,
-        "details": details
+        "details": details,
+        "message_id": message_id,
+        "delivery_status": QUEUED
     }
     st.session_state.communication_log.append(log_entry)
-    print(f"SIMULATING Email to {student_email}: {message_type} - {details}")
-    time.sleep(0.5)
+    print(f"QUEUED Email to {student_email}: {message_type} (message #{message_id})")
+
+def sync_delivery_status(communication_log=None):
+    """Copies the outbox's delivery status into communication_log entries that aren't final yet."""
+    if communication_log is None:
+        communication_log = st.session_state.communication_log
+    open_entries = [entry for entry in communication_log
+                    if entry.get("message_id") and entry.get("delivery_status") not in (SENT, FAILED)]
+    if not open_entries:
+        return
+    import pandas as pd
+    statuses = get_outbox().statuses([entry["message_id"] for entry in open_entries])
+    for entry in open_entries:
+        status = statuses.get(entry["message_id"])
+        if status:
+            entry["delivery_status"] = status["status"]
+            entry["delivery_error"] = status["error"]
+            if status["sent_at"]:
+                entry["delivered_at"] = pd.Timestamp.fromtimestamp(status["sent_at"])
 
 # -------------------------
 # Fee Slip Generation
 # -------------------------
-def generate_fee_slip_content(application, fee_details, loan_details=None):
+def generate_fee_slip_content(application, fee_details, loan_details=None, total_fee=None):
+    """Builds the fee slip text. total_fee comes from the course's policy; the placeholder is only a fallback."""
     content = f"--- Fee Slip ---\n"
     content += f"Application ID: {application['id']}\n"
     content += f"Student Name: {application['name']}\n"
     content += f"Course: {application.get('course', 'N/A')}\n\n"
     content += "Fee Breakdown:\n" + fee_details + "\n\n"
 
-    total_fee = 10000  # Placeholder
+    if total_fee is None:
+        total_fee = 10000  # Placeholder
     amount_due = total_fee
 
     if loan_details and loan_details.get('status') == "Loan Approved":
@@ -0,0 +1,115 @@
+# Index specifications for the knowledge base's dense search. The exact flat index is
+# always kept (it is what gets saved, memory-mapped and updated chunk by chunk); for
+# larger corpora an approximate index built from its vectors serves the unfiltered
+# queries. Pick one with KB_INDEX_SPEC, using benchmarks/index_eval.py for the numbers.
+import os
+import math
+from dataclasses import dataclass, replace
+from typing import Optional
+
+INDEX_KINDS = ("flat", "hnsw", "ivf", "ivfpq")
+DEFAULT_INDEX_SPEC = os.getenv("KB_INDEX_SPEC", "flat")
+
+# Below this many vectors an approximate index isn't worth having (and IVF/PQ can't be
+# trained well): the flat index answers exactly, in well under a millisecond.
+MIN_APPROXIMATE_VECTORS = 1000
+POINTS_PER_CENTROID = 39  # faiss k-means wants at least this many training points per centroid
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    What to build: kind is "flat", "hnsw", "ivf" or "ivfpq". Written as a string like
+    "hnsw", "hnsw:m=16,ef_search=128", "ivf:nlist=1024,nprobe=32" or "ivfpq:pq_m=48".
+    """
+    kind: str = "flat"
+    m: int = 32                    # HNSW: graph neighbours per node
+    ef_construction: int = 80      # HNSW: build-time search depth
+    ef_search: int = 64            # HNSW: query-time search depth
+    nlist: Optional[int] = None    # IVF: number of lists (default ~4*sqrt(n))
+    nprobe: int = 16               # IVF: lists scanned per query
+    pq_m: int = 48                 # IVF-PQ: sub-quantizers (bytes per vector at 8 bits)
+    pq_bits: int = 8               # IVF-PQ: bits per sub-quantizer code
+
+    @property
+    def name(self):
+        """Canonical form of the build parameters (query-time ones can change without a rebuild)."""
+        if self.kind == "hnsw":
+            return f"hnsw-m{self.m}-efc{self.ef_construction}"
+        if self.kind == "ivf":
+            return f"ivf-{self.nlist or 'auto'}"
+        if self.kind == "ivfpq":
+            return f"ivfpq-{self.nlist or 'auto'}-pq{self.pq_m}x{self.pq_bits}"
+        return "flat"
+
+    def __str__(self):
+        defaults = IndexSpec(kind=self.kind)
+        changed = [f"{field}={getattr(self, field)}" for field in self.__dataclass_fields__
+                   if field != "kind" and getattr(self, field) != getattr(defaults, field)]
+        return self.kind + (":" + ",".join(changed) if changed else "")
+
+def parse_index_spec(spec):
+    """Parses "kind[:param=value,...]" (or passes an IndexSpec through). Raises ValueError if it's invalid."""
+    if isinstance(spec, IndexSpec):
+        return spec
+    kind, _, params = (spec or "flat").strip().lower().partition(":")
+    kind = kind.replace("-", "").replace("_", "")
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {INDEX_KINDS}")
+    parsed = IndexSpec(kind=kind)
+    for param in filter(None, (p.strip() for p in params.split(","))):
+        key, _, value = param.partition("=")
+        key = key.strip()
+        if key == "kind" or key not in IndexSpec.__dataclass_fields__:
+            raise ValueError(f"Unknown index parameter {key!r} in {spec!r}")
+        try:
+            parsed = replace(parsed, **{key: int(value)})
+        except ValueError:
+            raise ValueError(f"Index parameter {key!r} needs an integer, got {value!r}") from None
+    return parsed
+
+def _divisor_at_most(n, limit):
+    return max(d for d in range(1, min(n, limit) + 1) if n % d == 0)
+
+def build_index(spec, vectors, metric=None):
+    """
+    Builds (and for IVF, trains on the vectors themselves) the approximate index for
+    spec, with the vectors added in order so positions match the flat index.
+    Returns None for "flat" or a corpus under MIN_APPROXIMATE_VECTORS: search the flat index.
+    """
+    import faiss
+    spec = parse_index_spec(spec)
+    n, dimensions = vectors.shape
+    if spec.kind == "flat" or n < MIN_APPROXIMATE_VECTORS:
+        return None
+    metric = faiss.METRIC_L2 if metric is None else metric
+    vectors = vectors.astype("float32", copy=False)
+
+    if spec.kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimensions, spec.m, metric)
+        index.hnsw.efConstruction = spec.ef_construction
+    else:
+        # Never more lists than the corpus can train; a bigger corpus gets more lists
+        nlist = max(1, min(spec.nlist or int(4 * math.sqrt(n)), n // POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlatL2(dimensions) if metric == faiss.METRIC_L2 else faiss.IndexFlatIP(dimensions)
+        if spec.kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimensions, nlist, metric)
+        else:
+            # Sub-quantizers must split the dimensions evenly; fewer bits if the corpus is small
+            pq_m = _divisor_at_most(dimensions, spec.pq_m)
+            pq_bits = max(1, min(spec.pq_bits, int(math.log2(n / POINTS_PER_CENTROID))))
+            index = faiss.IndexIVFPQ(quantizer, dimensions, nlist, pq_m, pq_bits, metric)
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index, spec)
+    return index
+
+def configure_search(index, spec):
+    """Applies the spec's query-time parameters (ef_search / nprobe) to a built or loaded index."""
+    import faiss
+    spec = parse_index_spec(spec)
+    index = faiss.downcast_index(index)
+    if spec.kind == "hnsw":
+        index.hnsw.efSearch = spec.ef_search
+    elif spec.kind in ("ivf", "ivfpq"):
+        index.nprobe = spec.nprobe
+    return index
@@ -0,0 +1,169 @@
+import os
+import json
+import pickle
+import hashlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, but each file is still replaced atomically
+    fcntl = None
+
+INDEX_DIR = ".kb_index"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"    # same file names as FAISS.save_local
+DOCSTORE_FILE = "index.pkl"
+LOCK_FILE = ".lock"
+
+# Attach to the saved index with mmap instead of reading it into memory, so several
+# Streamlit server processes on one host share one copy of it in the page cache.
+MMAP_INDEX = os.getenv("KB_MMAP_INDEX", "1") != "0"
+
+# -------------------------
+# Manifest
+# -------------------------
+def content_hash(content):
+    """Returns the SHA-256 hex digest of a text file's content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def index_settings(embedding_model, chunk_size, chunk_overlap, chunking=None):
+    """
+    The settings a saved index was built with.
+    If any of them change, every chunk has to be re-embedded.
+    """
+    return {
+        "embedding_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunking": chunking,
+    }
+
+def build_manifest(settings, files):
+    """
+    Combines the index settings with the per-file entries
+    ({filename: {"sha256", "mtime", "size", "chunk_ids"}}) the index was built from.
+    """
+    return {**settings, "files": files}
+
+def read_manifest(index_dir=INDEX_DIR):
+    """Reads the manifest of the saved index, or None if there isn't a usable one."""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(manifest, index_dir):
+    # Write to a temp file and rename so readers never see a half-written manifest
+    tmp_path = os.path.join(index_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST_FILE))
+
+# -------------------------
+# Index Save / Load
+# -------------------------
+@contextmanager
+def _locked(index_dir, exclusive):
+    """
+    Cross-process lock on the index directory: saves are exclusive, loads shared, so a
+    server process never pairs the index file of one save with the docstore of another.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _replace(path, write):
+    # Write next to the target and rename over it. Processes that have the old index
+    # memory-mapped keep reading the old file; truncating it in place would crash them.
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def load_index(embeddings, settings, index_dir=INDEX_DIR, mmap=MMAP_INDEX):
+    """
+    Loads the saved FAISS index and docstore if the manifest says they were built with
+    these settings. Returns (vector_store, manifest), or (None, None) without a usable index.
+    With mmap the index is attached read-only and its pages are shared with every other
+    process that maps it; call detach_index before modifying it.
+    """
+    import faiss # Slow to import; only needed once an index is loaded
+    from langchain.vectorstores import FAISS
+    with _locked(index_dir, exclusive=False):
+        manifest = read_manifest(index_dir)
+        if not manifest or any(manifest.get(key) != value for key, value in settings.items()):
+            return None, None
+        index_path = os.path.join(index_dir, INDEX_FILE)
+        if mmap:
+            # IO_FLAG_MMAP_IFC maps flat indexes too; older faiss versions only map IVF lists
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            index = faiss.read_index(index_path, flags)
+        else:
+            index = faiss.read_index(index_path)
+        # The docstore is pickled; we only ever load files we wrote ourselves.
+        with open(os.path.join(index_dir, DOCSTORE_FILE), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id), manifest
+
+def detach_index(vector_store):
+    """Swaps a memory-mapped (read-only) index for a private in-memory copy that can be modified."""
+    import faiss
+    vector_store.index = faiss.deserialize_index(faiss.serialize_index(vector_store.index))
+
+def save_index(vector_store, manifest, index_dir=INDEX_DIR):
+    """Saves the FAISS index and docstore, then the manifest that validates them."""
+    import faiss
+    os.makedirs(index_dir, exist_ok=True)
+    with _locked(index_dir, exclusive=True):
+        # Drop the old manifest first: if we crash mid-save, the next load rebuilds
+        # instead of trusting a manifest that no longer matches the index files.
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        _replace(os.path.join(index_dir, INDEX_FILE), lambda path: faiss.write_index(vector_store.index, path))
+        def _write_docstore(path):
+            with open(path, 'wb') as f:
+                pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f)
+        _replace(os.path.join(index_dir, DOCSTORE_FILE), _write_docstore)
+        _write_manifest(manifest, index_dir)
+
+# -------------------------
+# Approximate Indexes
+# -------------------------
+ANN_PREFIX = "ann-"
+
+def ann_key(settings, chunk_ids):
+    """Fingerprint of the vectors an approximate index was built from: the settings and the chunk ids in index order."""
+    return hashlib.sha256(json.dumps([settings, list(chunk_ids)], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _ann_path(index_dir, name, key):
+    return os.path.join(index_dir, f"{ANN_PREFIX}{name}-{key}.faiss")
+
+def load_ann(index_dir, name, key, mmap=MMAP_INDEX):
+    """The saved approximate index `name` (see IndexSpec.name) built for key, or None."""
+    import faiss
+    path = _ann_path(index_dir, name, key)
+    with _locked(index_dir, exclusive=False):
+        if not os.path.exists(path):
+            return None
+        if mmap:
+            return faiss.read_index(path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY)
+        return faiss.read_index(path)
+
+def save_ann(index, index_dir, name, key):
+    """Saves an approximate index and deletes the ones built from older versions of the knowledge base."""
+    import faiss
+    path = _ann_path(index_dir, name, key)
+    with _locked(index_dir, exclusive=True):
+        _replace(path, lambda tmp_path: faiss.write_index(index, tmp_path))
+        for filename in os.listdir(index_dir):
+            stale = os.path.join(index_dir, filename)
+            if filename.startswith(f"{ANN_PREFIX}{name}-") and filename.endswith(".faiss") and stale != path:
+                os.remove(stale)  # processes still mapping it keep reading the unlinked file
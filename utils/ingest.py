@@ -0,0 +1,283 @@
+# Ingestion of the knowledge base files: recursive discovery, text extraction for
+# txt/md/html/pdf (over a process pool for big batches), and embedding in bounded
+# batches, with per-stage throughput. Like utils/doc_verify.py it stays free of
+# Streamlit imports so pool workers start quickly.
+import os
+import re
+import time
+import zlib
+import multiprocessing
+import numpy as np
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .index_store import content_hash
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None  # text PDFs are still read by the built-in extractor below
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".html", ".htm", ".pdf")
+INLINE_BELOW = 8         # fewer files than this are extracted in-process (pool start-up isn't worth it)
+EMBED_BATCH_SIZE = 64    # chunks per embedding call; bounds the text + vectors in flight
+IN_FLIGHT_PER_WORKER = 4  # extracted files allowed to queue up per worker while the embedder catches up
+EXTRACT_WORKERS = int(os.getenv("KB_INGEST_WORKERS", "0")) or None  # extraction processes, default one per CPU
+
+# -------------------------
+# Discovery
+# -------------------------
+def discover(data_dir):
+    """
+    {relative path: os.stat_result} for every supported file under data_dir, recursively.
+    Paths use "/" (they become chunk ids and sources); hidden files and directories are skipped.
+    """
+    if not os.path.isdir(data_dir):
+        raise FileNotFoundError(data_dir)
+    found = {}
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.startswith(".") or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            try:
+                found[os.path.relpath(path, data_dir).replace(os.sep, "/")] = os.stat(path)
+            except FileNotFoundError:
+                continue  # deleted since the listing, or a broken symlink
+    return found
+
+def is_top_level(filename):
+    """Files directly in data/ (the curated policy files) as opposed to archives in subdirectories."""
+    return "/" not in filename
+
+# -------------------------
+# Extraction
+# -------------------------
+_MD_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+(?P<title>.+?)\s*#*\s*$")
+_MD_BULLET_RE = re.compile(r"^(\s*)[*+]\s+")
+
+def _markdown_text(text):
+    # Headings and bullets in the plain form the section splitter understands ("Title:", "- item")
+    lines = []
+    for line in text.splitlines():
+        heading = _MD_HEADING_RE.match(line)
+        if heading:
+            lines.append(heading.group("title").rstrip(":") + ":")
+        else:
+            lines.append(_MD_BULLET_RE.sub(r"\1- ", line))
+    return "\n".join(lines)
+
+class _HTMLText(HTMLParser):
+    _BLOCKS = {"p", "div", "br", "tr", "table", "section", "article", "ul", "ol", "header", "footer", "blockquote", "pre", "hr"}
+    _HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+    _SKIP = {"script", "style", "head", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts, self._skipping = [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCKS or tag in self._HEADINGS:
+            self.parts.append("\n")
+        elif tag == "li":
+            self.parts.append("\n- ")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._HEADINGS:
+            self.parts.append(":\n")
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(re.sub(r"\s+", " ", data))
+
+def _html_text(html):
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    lines = (line.strip() for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line and line != ":")
+
+_PDF_STREAM_RE = re.compile(rb"<<(?P<dict>(?:(?!>>).)*?)>>\s*stream\r?\n(?P<data>.*?)\r?\nendstream", re.S)
+_PDF_TEXT_OP_RE = re.compile(rb"\((?P<string>(?:\\.|[^\\)])*)\)\s*(?:Tj|'|\")|\[(?P<array>[^\]]*)\]\s*TJ|(?P<newline>T\*|\b(?:Td|TD|ET)\b)", re.S)
+_PDF_ARRAY_STRING_RE = re.compile(rb"\((?P<string>(?:\\.|[^\\)])*)\)", re.S)
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"(": b"(", b")": b")", b"\\": b"\\"}
+
+def _pdf_string(raw):
+    raw = re.sub(rb"\\([0-7]{1,3})", lambda m: bytes([int(m.group(1), 8) & 0xFF]), raw)
+    raw = re.sub(rb"\\(.)", lambda m: _PDF_ESCAPES.get(m.group(1), m.group(1)), raw, flags=re.S)
+    return raw.decode("latin-1")
+
+def _pdf_text_builtin(data):
+    """
+    Text of a simple PDF without a PDF library: the Tj/TJ strings of its (Flate or
+    uncompressed) content streams. Fonts with custom encodings (hex/CID strings) come out
+    empty; install pypdf for those.
+    """
+    parts = []
+    for stream in _PDF_STREAM_RE.finditer(data):
+        content = stream.group("data")
+        if b"/FlateDecode" in stream.group("dict"):
+            try:
+                content = zlib.decompress(content)
+            except zlib.error:
+                continue
+        elif b"/Filter" in stream.group("dict"):
+            continue  # images and other encodings carry no text
+        for op in _PDF_TEXT_OP_RE.finditer(content):
+            if op.group("newline"):
+                if parts and parts[-1] != "\n":
+                    parts.append("\n")
+            elif op.group("string") is not None:
+                parts.append(_pdf_string(op.group("string")))
+            else:
+                parts.extend(_pdf_string(s.group("string")) for s in _PDF_ARRAY_STRING_RE.finditer(op.group("array")))
+    return "\n".join(line.strip() for line in "".join(parts).splitlines() if line.strip())
+
+def _pdf_text(path):
+    if PdfReader is None:
+        with open(path, "rb") as f:
+            return _pdf_text_builtin(f.read())
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+def extract_text(path):
+    """Plain text of a txt/md/html/pdf file, with headings as "Title:" lines and list items as "- item"."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return _pdf_text(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if extension == ".md":
+        return _markdown_text(text)
+    if extension in (".html", ".htm"):
+        return _html_text(text)
+    return text
+
+def _extract(data_dir, filename):
+    """Pool task: (filename, text, sha256 of the text, error)."""
+    try:
+        text = extract_text(os.path.join(data_dir, filename))
+        return filename, text, content_hash(text), None
+    except Exception as e:
+        return filename, None, None, f"{type(e).__name__}: {e}"
+
+def _bounded_map(executor, function, items, window):
+    # executor.map submits everything up front and holds every result until it's consumed;
+    # keeping at most `window` tasks in flight keeps memory flat however many files there are
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def extract_files(data_dir, filenames, max_workers=None, inline_below=INLINE_BELOW):
+    """
+    Yields (filename, text, sha256, error) for each file, in order, extracting up to
+    max_workers files at a time in a process pool once there are enough of them.
+    """
+    filenames = list(filenames)
+    max_workers = max_workers or EXTRACT_WORKERS or os.cpu_count() or 1
+    if len(filenames) < inline_below or max_workers == 1:
+        for filename in filenames:
+            yield _extract(data_dir, filename)
+        return
+    done = 0
+    try:
+        # spawn, not fork: the Streamlit server process is multi-threaded
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for result in _bounded_map(pool, _extract, ((data_dir, f) for f in filenames), max_workers * IN_FLIGHT_PER_WORKER):
+                done += 1
+                yield result
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); finish in-process
+        for filename in filenames[done:]:
+            yield _extract(data_dir, filename)
+
+# -------------------------
+# Throughput
+# -------------------------
+@dataclass
+class IngestStats:
+    """Counters for one ingestion run. Stages overlap (the pool extracts while chunks are embedded)."""
+    files: int = 0
+    bytes: int = 0
+    failed: int = 0
+    chunks: int = 0
+    embeddings: int = 0
+    extract_seconds: float = 0.0  # wall time until the last file came back from extraction
+    split_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    def rates(self):
+        """{"files/s", "MB/s", "chunks/s", "embeddings/s"}, each over its own stage's time."""
+        def _rate(count, seconds):
+            return count / seconds if seconds > 0 else 0.0
+        return {
+            "files/s": _rate(self.files, self.extract_seconds),
+            "MB/s": _rate(self.bytes / 2**20, self.extract_seconds),
+            "chunks/s": _rate(self.chunks, self.split_seconds),
+            "embeddings/s": _rate(self.embeddings, self.embed_seconds),
+        }
+
+    def summary(self):
+        rates = self.rates()
+        text = (f"{self.files} files ({rates['files/s']:.0f} files/s, {rates['MB/s']:.1f} MB/s), "
+                f"{self.chunks} chunks ({rates['chunks/s']:.0f} chunks/s), "
+                f"{self.embeddings} embeddings ({rates['embeddings/s']:.0f}/s) in {self.total_seconds:.2f}s")
+        return text + (f", {self.failed} failed" if self.failed else "")
+
+@contextmanager
+def timed(stats, field):
+    """Adds the time spent in the block to stats.<field>."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, field, getattr(stats, field) + time.perf_counter() - started)
+
+# -------------------------
+# Embedding
+# -------------------------
+class BatchEmbedder:
+    """
+    Embeds chunk texts as they arrive, batch_size at a time, so at most one batch of
+    text is waiting on the model. Vectors are kept as float32 arrays (the model's
+    lists of Python floats take several times the memory).
+    """
+
+    def __init__(self, embeddings, stats, batch_size=EMBED_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.stats = stats
+        self.batch_size = batch_size
+        self._pending = []
+        self._vectors = []
+
+    def add(self, texts):
+        self._pending.extend(texts)
+        while len(self._pending) >= self.batch_size:
+            self._embed(self._pending[:self.batch_size])
+            del self._pending[:self.batch_size]
+
+    def _embed(self, texts):
+        with timed(self.stats, "embed_seconds"):
+            self._vectors.append(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+        self.stats.embeddings += len(texts)
+
+    def finish(self):
+        """Embeds what's left; returns all the vectors, in the order the texts were added."""
+        if self._pending:
+            self._embed(self._pending)
+            self._pending = []
+        return [row for batch in self._vectors for row in batch]
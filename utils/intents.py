@@ -0,0 +1,122 @@
+# Local intent routing for the director bot: questions about the application data are
+# matched to a known intent by embedding similarity and answered without calling Gemini.
+import numpy as np
+from .retrieval_cache import LRUCache, normalize_query
+
+# Minimum cosine similarity to the closest example for a question to count as that intent.
+# Below it the question is treated as open-ended and goes to the LLM.
+DEFAULT_THRESHOLD = 0.6
+
+# Labeled example phrasings per intent. Add phrasings here when the benchmark
+# (benchmarks/intent_router_bench.py) shows a rephrasing being missed.
+INTENT_EXAMPLES = {
+    "total_applications": [
+        "How many applications have we received?",
+        "Total applications",
+        "What is the total number of applications?",
+        "How many students have applied?",
+        "Number of applicants so far",
+        "Count of applications in the system",
+        "How many people applied this year?",
+    ],
+    "status_overview": [
+        "Show status overview",
+        "Give me a summary of application statuses",
+        "What is the breakdown of applications by status?",
+        "Where are the applications in the pipeline?",
+        "How many applications are in each stage?",
+        "Summarize the admission progress",
+    ],
+    "shortlisted_count": [
+        "How many applications are shortlisted?",
+        "Number of shortlisted candidates",
+        "How many students made the shortlist?",
+        "Count of shortlisted applicants",
+        "How many have been shortlisted so far?",
+    ],
+    "confirmed_count": [
+        "How many admissions are confirmed?",
+        "Number of confirmed admissions",
+        "How many students have confirmed their seats?",
+        "How many offers were accepted?",
+        "Count of students admitted",
+    ],
+    "loan_budget": [
+        "What is the loan budget remaining?",
+        "How much loan budget is left?",
+        "Remaining student loan funds",
+        "How much money is left for student loans?",
+        "What's the available loan budget?",
+    ],
+    "approved_loans": [
+        "How many loans have been approved?",
+        "Show approved loans",
+        "Total amount of approved loans",
+        "How much have we lent to students so far?",
+        "Number of loan approvals",
+    ],
+    "course_breakdown": [
+        "How many applications per course?",
+        "Which courses are most popular?",
+        "Breakdown of applications by course",
+        "How many students applied to each program?",
+        "Applications by programme",
+    ],
+}
+
+def keyword_intent(query):
+    """The bot's original exact-phrase rules: recognises the canonical phrasings without embedding anything."""
+    query_lower = query.lower()
+    if "how many applications" in query_lower or "total applications" in query_lower:
+        return "total_applications"
+    if "status overview" in query_lower or "summary" in query_lower:
+        return "status_overview"
+    if "shortlisted" in query_lower:
+        return "shortlisted_count"
+    if "loan budget" in query_lower:
+        return "loan_budget"
+    if "approved loans" in query_lower:
+        return "approved_loans"
+    return None
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class IntentRouter:
+    """
+    Nearest-example classifier over sentence embeddings. The examples are embedded
+    once; routing a question costs one query embedding (cached) and a small matrix product.
+    """
+
+    def __init__(self, embeddings, examples=INTENT_EXAMPLES, threshold=DEFAULT_THRESHOLD, cache_size=512):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.labels = [intent for intent, phrasings in examples.items() for _ in phrasings]
+        phrasings = [normalize_query(text) for texts in examples.values() for text in texts]
+        self._example_matrix = _unit_rows(embeddings.embed_documents(phrasings))
+        self._query_cache = LRUCache(cache_size)
+
+    def _embed(self, query):
+        normalized = normalize_query(query)
+        vector = self._query_cache.get(normalized)
+        if vector is None:
+            vector = _unit_rows(self.embeddings.embed_query(normalized))
+            self._query_cache.set(normalized, vector)
+        return vector
+
+    def scores(self, query):
+        """{intent: best cosine similarity between the query and that intent's examples}."""
+        similarities = self._example_matrix @ self._embed(query)
+        best = {}
+        for label, similarity in zip(self.labels, similarities):
+            best[label] = max(best.get(label, -1.0), float(similarity))
+        return best
+
+    def route(self, query):
+        """Returns (intent, score), with intent None if nothing is similar enough."""
+        similarities = self._example_matrix @ self._embed(query)
+        best = int(np.argmax(similarities))
+        score = float(similarities[best])
+        return (self.labels[best] if score >= self.threshold else None), score
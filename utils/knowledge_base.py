@@ -1,62 +1,664 @@
 import os
+import time
+import threading
+import numpy as np
 import streamlit as st
-from langchain.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.docstore.document import Document
-from langchain.embeddings import HuggingFaceEmbeddings
+from .index_store import (
+    INDEX_DIR, MMAP_INDEX, content_hash, index_settings, build_manifest,
+    read_manifest, load_index, detach_index, save_index, ann_key, load_ann, save_ann
+)
+from .index_spec import DEFAULT_INDEX_SPEC, parse_index_spec, build_index, configure_search
+from .retrieval_cache import LRUCache, normalize_query
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .chunking import CHUNKING, split_sections, source_key, course_family
+from .ingest import IngestStats, BatchEmbedder, discover, extract_files, is_top_level, timed
+from .policy import POLICY_SOURCES, compile_policies
 
 DATA_DIR = "data"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+REFRESH_INTERVAL_SECONDS = 5
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL_SECONDS = 600
 
-@st.cache_resource
-def load_knowledge_base():
-    """Loads documents from the data directory and creates a FAISS index."""
-    docs = []
-    doc_metadata = {}
+# How the agents' queries are ranked: "dense" (FAISS over sentence embeddings), "bm25"
+# (lexical, no embedding model needed at all) or "hybrid" (both, fused by reciprocal rank).
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+DEFAULT_RETRIEVAL_MODE = os.getenv("KB_RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = 10  # results taken from each ranking before fusing
 
-    try:
-        for filename in os.listdir(DATA_DIR):
-            if filename.endswith(".txt"):
-                filepath = os.path.join(DATA_DIR, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    docs.append(Document(page_content=content, metadata={"source": filename}))
-                    doc_metadata[filename.replace('.txt', '')] = content
+# langchain, sentence-transformers and FAISS are imported where they're first needed:
+# together they take seconds to import, and nothing is loaded until a page asks the
+# knowledge base something (see get_indexer / utils/warmup.py).
 
-        if not docs:
-            st.error(f"No .txt files found in the '{DATA_DIR}' directory.")
-            return None, None
+# Held while the index is searched or while changed chunks are swapped in,
+# so a query never sees a file half-deleted or half-added.
+_index_lock = threading.RLock()
 
-        text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        split_docs = text_splitter.split_documents(docs)
+# Agents ask the same few questions for every applicant, so cache both the query
+# embedding and the search results. Results are keyed on the index version and
+# dropped whenever the index changes; embeddings only depend on the query text.
+_query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+_result_cache = LRUCache(RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+_index_generation = 0  # bumped by any indexer whose content changes; part of the result cache key
 
-        try:
-            # Use HuggingFace Embeddings instead of OpenAI
-            embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-            vector_store = FAISS.from_documents(split_docs, embeddings)
+class KnowledgeBaseIndexer:
+    """
+    Keeps the FAISS and BM25 indexes in step with the files in the data directory and its
+    subdirectories (txt, md, html and pdf; see utils/ingest.py for extraction and throughput).
+    Chunks are tracked per source file, so an edited file only re-embeds its own
+    chunks. The slow part (embedding) runs while the old index keeps serving
+    queries; only the delete + add of the affected chunks happens under the lock.
+    With mode="bm25" the embedding model is never loaded and only the BM25 index is kept.
+    The saved FAISS index is memory-mapped (see MMAP_INDEX), and server processes sharing
+    the index directory attach to each other's saves instead of re-embedding the same edit.
+    index_spec (see utils/index_spec.py) adds an approximate index (HNSW / IVF / IVF-PQ),
+    trained on the corpus after every change, for the unfiltered dense queries.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, index_dir=INDEX_DIR, mode=DEFAULT_RETRIEVAL_MODE, index_spec=DEFAULT_INDEX_SPEC):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        self.data_dir = data_dir
+        self.index_dir = index_dir
+        self.mode = mode
+        self.index_spec = parse_index_spec(index_spec)
+        self.settings = index_settings(EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING)
+        self.embeddings = None
+        self.vector_store = None
+        self.index_mapped = False  # vector_store.index is a read-only mmap of the saved index
+        self.ann_index = None      # approximate index over the same positions, None = search the flat one
+        self._ann_key = None       # ann_key of the vectors ann_index was built from
+        self.chunks = {}    # chunk id -> Document, for the BM25 index
+        self.bm25 = None
+        self.bm25_by_source = {}  # e.g. {"fee_structure": BM25Index over that file's chunks}, built on first use (see source_bm25)
+        self._positions = (None, {})  # (index identity, {chunk id: FAISS position}), see dense_positions
+        self.raw_docs = {}  # e.g. {"loan_policy": "<file text>"} for the files directly in data/, updated in place
+        self.files = {}     # relative path -> {"sha256", "mtime", "size", "chunk_ids"}
+        self._seen = set()  # files read by this process (their chunks are loaded for BM25)
+        self._failed = {}   # files whose text couldn't be extracted -> (mtime, size), retried once they change
+        self.last_ingest = None  # IngestStats of the last refresh that read anything
+        self.version = 0    # bumped every time the indexed content changes
+        self.policies = compile_policies({})  # structured rules, recompiled when a policy file changes
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+
+    def load(self):
+        """Attaches to the saved index if it was built with our settings, then catches up with data/."""
+        if self.mode != "bm25":
+            try:
+                from langchain.embeddings import HuggingFaceEmbeddings
+                # Use HuggingFace Embeddings instead of OpenAI
+                self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+            except Exception as e:
+                st.error(f"Failed to initialize embeddings or FAISS: {e}")
+
+        if self.embeddings:
+            try:
+                vector_store, manifest = load_index(self.embeddings, self.settings, self.index_dir)
+                if vector_store is not None:
+                    self.vector_store, self.index_mapped = vector_store, MMAP_INDEX
+                    self.files = manifest.get("files", {})
+            except Exception as e:
+                st.warning(f"Saved knowledge base index could not be loaded, rebuilding: {e}")
+                self.vector_store = None
+                self.files = {}
+
+        changes = self.refresh()
+        if self.vector_store is None:
+            if self.bm25 is not None:
+                st.info("Knowledge Base loaded with keyword (BM25) search only.")
+            return
+        if any(changes.values()):
             st.success("Knowledge Base loaded and indexed.")
-            return vector_store, doc_metadata
+        else:
+            st.success("Knowledge Base loaded from saved index.")
+
+    def refresh(self):
+        """
+        Re-indexes files added, modified or deleted since the last refresh.
+        Unchanged files are detected by mtime + size without being read; files whose
+        mtime moved but whose content hash didn't are not re-embedded either.
+        Files are found recursively (txt/md/html/pdf, see utils/ingest.py), extracted over a
+        process pool when there are many, and embedded in bounded batches as they stream in.
+        Returns {"added": [...], "modified": [...], "deleted": [...]}.
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            run = IngestStats()
+            changes = {"added": [], "modified": [], "deleted": []}
+            stats = discover(self.data_dir)
+            self._failed = {filename: stat for filename, stat in self._failed.items()
+                            if filename in stats and (stats[filename].st_mtime, stats[filename].st_size) == stat}
+            to_read = [
+                filename for filename, stat in stats.items()
+                if filename not in self._failed and not (
+                    filename in self._seen and filename in self.files
+                    and self.files[filename]["mtime"] == stat.st_mtime and self.files[filename]["size"] == stat.st_size)
+            ]
+            changes["deleted"] = [filename for filename in self.files if filename not in stats]
+            manifest_dirty = False
+
+            # Another server process sharing the index directory may already have indexed
+            # these changes: attach to the index it saved instead of embedding them again.
+            attached = None
+            stat_changed = any(filename not in self.files or (self.files[filename]["mtime"], self.files[filename]["size"])
+                               != (stats[filename].st_mtime, stats[filename].st_size) for filename in to_read)
+            if self.embeddings and (stat_changed or changes["deleted"]):
+                attached = self._attach_saved({filename: (stat.st_mtime, stat.st_size) for filename, stat in stats.items()})
+
+            # Extract, split and embed as files stream in, before taking the lock: this is
+            # the slow part, and queries keep hitting the old index while it runs.
+            embedder = BatchEmbedder(self.embeddings, run) if self.embeddings and not attached else None
+            new_texts, new_metadatas, new_ids = [], [], []
+            new_chunks = {}
+            read = {}      # filename -> file entry, for the files read this time
+            contents = {}  # top-level files' text, for raw_docs and the policy table
+            for filename, text, sha, error in extract_files(self.data_dir, to_read):
+                run.extract_seconds = time.perf_counter() - started
+                stat = stats[filename]
+                if error:
+                    print(f"Could not extract text from {filename}, skipping it: {error}")
+                    self._failed[filename] = (stat.st_mtime, stat.st_size)
+                    run.failed += 1
+                    continue
+                run.files += 1
+                run.bytes += stat.st_size
+                if is_top_level(filename):
+                    contents[filename] = text
+                known = self.files.get(filename)
+                entry = {"sha256": sha, "mtime": stat.st_mtime, "size": stat.st_size}
+                if attached and attached[1].get(filename, {}).get("sha256") != sha:
+                    # Edited again since the other process saved: embed ourselves after all
+                    attached = None
+                    embedder = BatchEmbedder(self.embeddings, run)
+                    embedder.add(new_texts)
+                if known and known["sha256"] == sha:
+                    # Touched but not edited (or first read after loading the saved index):
+                    # only needs re-splitting for the BM25 index if its chunks aren't loaded
+                    entry = {**known, **entry}
+                    manifest_dirty = manifest_dirty or known["mtime"] != stat.st_mtime
+                    if not entry.get("chunk_ids") or any(chunk_id not in self.chunks for chunk_id in entry["chunk_ids"]):
+                        with timed(run, "split_seconds"):
+                            chunks = split_sections(text, filename, CHUNK_SIZE, CHUNK_OVERLAP)
+                        new_chunks.update(zip([f"{filename}:{sha[:12]}:{i}" for i in range(len(chunks))], chunks))
+                    read[filename] = entry
+                    continue
+                changes["modified" if known else "added"].append(filename)
+                with timed(run, "split_seconds"):
+                    chunks = split_sections(text, filename, CHUNK_SIZE, CHUNK_OVERLAP)
+                run.chunks += len(chunks)
+                entry["chunk_ids"] = [f"{filename}:{sha[:12]}:{i}" for i in range(len(chunks))]
+                texts = [chunk.page_content for chunk in chunks]
+                new_texts.extend(texts)
+                new_metadatas.extend(chunk.metadata for chunk in chunks)
+                new_ids.extend(entry["chunk_ids"])
+                new_chunks.update(zip(entry["chunk_ids"], chunks))
+                if embedder:
+                    embedder.add(texts)
+                read[filename] = entry
+            new_vectors = embedder.finish() if embedder else []
+
+            with _index_lock:
+                for filename, text in contents.items():
+                    self.raw_docs[source_key(filename)] = text
+                for filename in changes["deleted"]:
+                    if is_top_level(filename):
+                        self.raw_docs.pop(source_key(filename), None)
+                # Reading covers the first read after attaching to a saved index too
+                changed_sources = {source_key(filename) for filename in [*contents, *changes["deleted"]] if is_top_level(filename)}
+                if changed_sources & set(POLICY_SOURCES):
+                    self.policies = compile_policies(self.raw_docs)
+
+                stale_ids = [chunk_id for filename in changes["modified"] + changes["deleted"]
+                             for chunk_id in self.files[filename].get("chunk_ids", [])]
+                if stale_ids or new_chunks:
+                    for chunk_id in stale_ids:
+                        self.chunks.pop(chunk_id, None)
+                    self.chunks.update(new_chunks)
+                    # Rebuilt from scratch: a few thousand chunks take milliseconds
+                    self.bm25 = BM25Index(list(self.chunks), [doc.page_content for doc in self.chunks.values()]) if self.chunks else None
+                    # Per-file sub-indexes are only rebuilt for the files that changed, when next queried
+                    changed_files = {doc.metadata["source"] for doc in new_chunks.values()} | set(changes["modified"] + changes["deleted"])
+                    for filename in changed_files:
+                        self.bm25_by_source.pop(source_key(filename), None)
+                if attached:
+                    self.vector_store, self.index_mapped = attached[0], MMAP_INDEX
+                    self.ann_index, self._ann_key = None, None
+                elif self.embeddings:
+                    try:
+                        self._swap_chunks(stale_ids, new_texts, new_vectors, new_metadatas, new_ids)
+                    except Exception as e:
+                        st.error(f"Failed to initialize embeddings or FAISS: {e}")
+                        return changes
+
+                self.files.update(read)
+                self._seen.update(read)
+                for filename in changes["deleted"]:
+                    del self.files[filename]
+                    self._seen.discard(filename)
+                if any(changes.values()):
+                    self.version += 1
+                    _invalidate_results()
 
+            run.total_seconds = time.perf_counter() - started
+            if run.files or run.failed:
+                self.last_ingest = run
+            if run.chunks or run.failed:
+                print(f"Knowledge base ingestion: {run.summary()}")
+
+            if self.vector_store is not None and not attached and (manifest_dirty or any(changes.values())):
+                try:
+                    save_index(self.vector_store, build_manifest(self.settings, self.files), self.index_dir)
+                except Exception as e:
+                    # Not fatal: the next start just re-embeds what it can't trust
+                    print(f"Could not save knowledge base index: {e}")
+                else:
+                    if MMAP_INDEX and not self.index_mapped:
+                        # Swap our private copy for the mapped file we just wrote
+                        remapped = self._attach_saved({filename: (entry["mtime"], entry["size"]) for filename, entry in self.files.items()})
+                        if remapped:
+                            with _index_lock:
+                                self.vector_store, self.index_mapped = remapped[0], True
+            self._update_ann()
+            return changes
+
+    def _attach_saved(self, file_stats):
+        """
+        Loads the saved index if it was built from exactly these file versions
+        ({filename: (mtime, size)}). Returns (vector_store, manifest files) or None.
+        """
+        def _matches(manifest):
+            return {filename: (entry.get("mtime"), entry.get("size")) for filename, entry in manifest.get("files", {}).items()} == file_stats
+        manifest = read_manifest(self.index_dir)
+        if not manifest or not _matches(manifest):
+            return None
+        try:
+            vector_store, manifest = load_index(self.embeddings, self.settings, self.index_dir)
+        except Exception as e:
+            print(f"Could not attach to the saved knowledge base index: {e}")
+            return None
+        # Re-checked: the index may have been saved again between the two reads
+        if vector_store is None or not _matches(manifest):
+            return None
+        return vector_store, manifest["files"]
+
+    def _update_ann(self):
+        """
+        Brings the approximate index in line with the flat one: attaches to a saved one built
+        from the same vectors, or trains and saves a new one. Until it's ready, queries
+        search the flat index (exact, just slower on a big corpus).
+        """
+        if self.index_spec.kind == "flat" or self.vector_store is None:
+            return
+        with _index_lock:
+            store = self.vector_store
+            key = ann_key(self.settings, [store.index_to_docstore_id[i] for i in range(store.index.ntotal)])
+            if key == self._ann_key:
+                return
+        name = self.index_spec.name
+        try:
+            index = load_ann(self.index_dir, name, key)
+            if index is not None:
+                configure_search(index, self.index_spec)
+            else:
+                started = time.perf_counter()
+                index = build_index(self.index_spec, store.index.reconstruct_n(0, store.index.ntotal), store.index.metric_type)
+                if index is not None:
+                    print(f"Knowledge base {self.index_spec} index built over {index.ntotal} chunks in {time.perf_counter() - started:.2f}s")
+                    try:
+                        save_ann(index, self.index_dir, name, key)
+                    except Exception as e:
+                        print(f"Could not save the {self.index_spec} index: {e}")
         except Exception as e:
-            st.error(f"Failed to initialize embeddings or FAISS: {e}")
-            return None, doc_metadata
+            print(f"Could not build the {self.index_spec} index, using exact search: {e}")
+            return
+        with _index_lock:
+            if self.vector_store is store:
+                self.ann_index, self._ann_key = index, key
 
+    def filtered_ids(self, source=None, course=None):
+        """
+        The chunk ids a filtered query can return, as (ids, course-specific ids): the chunks
+        of one source file (e.g. "fee_structure"), narrowed to one course plus the chunks that
+        apply to every course. A course without chunks of its own uses its family's
+        ("B.Tech Data Science" -> the B.Tech ones), as the policy table does. Call under _index_lock.
+        """
+        chunks = [(chunk_id, doc.metadata.get("course")) for chunk_id, doc in self.chunks.items()
+                  if source is None or source_key(doc.metadata["source"]) == source]
+        if course is None:
+            return [chunk_id for chunk_id, _ in chunks], set()
+        courses = {chunk_course for _, chunk_course in chunks if chunk_course}
+        matching = {course} if course in courses else {c for c in courses if course_family(c) == course_family(course)}
+        specific = {chunk_id for chunk_id, chunk_course in chunks if chunk_course in matching}
+        return [chunk_id for chunk_id, chunk_course in chunks if chunk_course is None or chunk_id in specific], specific
+
+    def source_bm25(self, source):
+        """The BM25 index over one source file's chunks (None if it has none), built on first use. Call under _index_lock."""
+        if source not in self.bm25_by_source:
+            entries = [(chunk_id, doc.page_content) for chunk_id, doc in self.chunks.items()
+                       if source_key(doc.metadata["source"]) == source]
+            self.bm25_by_source[source] = BM25Index(*zip(*entries)) if entries else None
+        return self.bm25_by_source[source]
+
+    def dense_positions(self):
+        """{chunk id: position in the FAISS index}, rebuilt only when the index changes. Call under _index_lock."""
+        store = self.vector_store
+        key = (id(store), id(store.index), store.index.ntotal, self.version)
+        if self._positions[0] != key:
+            self._positions = (key, {chunk_id: position for position, chunk_id in store.index_to_docstore_id.items()})
+        return self._positions[1]
+
+    def _swap_chunks(self, stale_ids, texts, vectors, metadatas, ids):
+        """Deletes the chunks of changed/removed files and adds the re-embedded ones."""
+        if stale_ids or texts:
+            self.ann_index, self._ann_key = None, None  # positions are about to change; rebuilt after the refresh
+        if self.index_mapped and (stale_ids or texts):
+            # The mapped index is read-only (FAISS aborts on writes to it): copy it first
+            detach_index(self.vector_store)
+            self.index_mapped = False
+        if self.vector_store is None:
+            if texts:
+                from langchain.vectorstores import FAISS
+                self.vector_store = FAISS.from_embeddings(
+                    list(zip(texts, vectors)), self.embeddings, metadatas=metadatas, ids=ids
+                )
+            return
+        if stale_ids:
+            self.vector_store.delete(stale_ids)
+        if texts:
+            self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    def start_watcher(self, interval=REFRESH_INTERVAL_SECONDS):
+        """Polls the data directory in a daemon thread so edits go live without a restart."""
+        if self._watcher and self._watcher.is_alive():
+            return
+        def _watch():
+            stop = threading.Event()
+            while not stop.wait(interval):
+                try:
+                    changes = self.refresh()
+                    if any(changes.values()):
+                        print(f"Knowledge base re-indexed: {changes}")
+                except Exception as e:
+                    print(f"Knowledge base refresh failed: {e}")
+        self._watcher = threading.Thread(target=_watch, name="kb-watcher", daemon=True)
+        self._watcher.start()
+
+@st.cache_resource
+def get_indexer(index_spec=None):
+    """
+    Returns the process-wide knowledge base indexer, loading it on first use.
+    index_spec: "flat", "hnsw", "ivf" or "ivfpq", with optional parameters (default: KB_INDEX_SPEC, else flat).
+    """
+    indexer = KnowledgeBaseIndexer(index_spec=index_spec or DEFAULT_INDEX_SPEC)
+    try:
+        indexer.load()
     except FileNotFoundError:
         st.error(f"Error: The directory '{DATA_DIR}' was not found.")
-        return None, None
+        return indexer
     except Exception as e:
         st.error(f"An error occurred loading the knowledge base: {e}")
-        return None, None
+        return indexer
+    if not indexer.files:
+        st.error(f"No knowledge base files (.txt, .md, .html, .pdf) found in the '{DATA_DIR}' directory.")
+    indexer.start_watcher()
+    return indexer
+
+class Retriever:
+    """
+    What the agents query (pass it to query_knowledge_base / query_knowledge_base_batch).
+    mode picks the ranking: "dense", "bm25" or "hybrid". If the index a mode needs isn't
+    available (e.g. the embedding model couldn't be loaded) it uses the other one, and
+    the retriever is falsy only when neither exists.
+    """
+
+    def __init__(self, indexer, mode=DEFAULT_RETRIEVAL_MODE):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        self.indexer = indexer
+        self.mode = mode
+
+    @property
+    def effective_mode(self):
+        """The mode actually used given the indexes that exist, or None."""
+        available = {"dense": self.indexer.vector_store is not None, "bm25": self.indexer.bm25 is not None}
+        if self.mode == "hybrid" and all(available.values()):
+            return "hybrid"
+        for mode in (("bm25", "dense") if self.mode == "bm25" else ("dense", "bm25")):
+            if available[mode]:
+                return mode
+        return None
+
+    def __bool__(self):
+        return self.effective_mode is not None
+
+    def search(self, queries, k, source=None, course=None):
+        """
+        Uncached search: one list of Documents per (normalized) query.
+        source (e.g. "fee_structure") and course restrict it to that file's sub-index and
+        that course (see KnowledgeBaseIndexer.filtered_ids). A filtered search ranks every
+        chunk it allows, with the course's own chunks ahead of the general ones, so a
+        lookup like "the MBA fees" always gets the MBA fee chunk first.
+        """
+        mode = self.effective_mode
+        indexer = self.indexer
+        allowed = specific = None
+        if source is not None or course is not None:
+            with _index_lock:
+                allowed, specific = indexer.filtered_ids(source, course)
+                positions = indexer.dense_positions() if mode in ("dense", "hybrid") else {}
+                positions = [positions[chunk_id] for chunk_id in allowed if chunk_id in positions]
+            if not allowed:
+                return [[] for _ in queries]
+            n = len(allowed)  # one file's chunks: rank them all
+        else:
+            positions = None
+            n = max(k, HYBRID_CANDIDATES) if mode == "hybrid" else k
+        dense = _dense_search(indexer.vector_store, queries, n, positions, indexer.ann_index) if mode in ("dense", "hybrid") else None
+
+        with _index_lock:
+            lexical = None
+            if mode != "dense":
+                bm25 = indexer.bm25 if source is None else indexer.source_bm25(source)
+                lexical = [[chunk_id for chunk_id, _ in bm25.search(query, n if allowed is None else len(bm25))] if bm25 else []
+                           for query in queries]
+            results = []
+            for i in range(len(queries)):
+                rankings = [[chunk_id for chunk_id, _ in dense[i]]] if dense is not None else []
+                if lexical is not None:
+                    rankings.append(lexical[i])
+                ranked = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings, k=n)
+                if allowed is not None:
+                    allowed_set = set(allowed)
+                    ranked = [chunk_id for chunk_id in ranked if chunk_id in allowed_set]
+                    seen = set(ranked)
+                    ranked += [chunk_id for chunk_id in allowed if chunk_id not in seen]  # no shared terms: still a candidate
+                    ranked.sort(key=lambda chunk_id: chunk_id not in specific)  # stable: course chunks first
+                docs = dict(dense[i]) if dense is not None else {}
+                results.append([docs.get(chunk_id) or indexer.chunks[chunk_id] for chunk_id in ranked[:k]])
+            return results
+
+def _indexer_for(index_spec):
+    # One cached indexer per distinct spec, however it's spelled ("HNSW" == "hnsw"),
+    # and the default spec shares the indexer the rest of the app uses (get_indexer())
+    spec = str(parse_index_spec(index_spec)) if index_spec else None
+    if spec is None or spec == str(parse_index_spec(DEFAULT_INDEX_SPEC)):
+        return get_indexer()
+    return get_indexer(spec)
+
+def get_retriever(mode=None, index_spec=None):
+    """A retriever over the knowledge base (loaded on first use); mode defaults to KB_RETRIEVAL_MODE."""
+    return Retriever(_indexer_for(index_spec), mode or DEFAULT_RETRIEVAL_MODE)
+
+def load_knowledge_base(mode=None, index_spec=None):
+    """
+    Loads documents from the data directory and returns (retriever, raw file contents).
+    mode: "dense", "bm25" or "hybrid" (default: the KB_RETRIEVAL_MODE environment variable, else hybrid).
+    index_spec: the dense index, e.g. "flat", "hnsw", "ivf:nprobe=32" or "ivfpq" (default: KB_INDEX_SPEC, else flat).
+    """
+    return get_retriever(mode, index_spec), _indexer_for(index_spec).raw_docs
+
+def get_vector_store():
+    """The FAISS index over the knowledge base (None if it couldn't be built); loads it on first use."""
+    return get_indexer().vector_store
+
+def get_raw_docs():
+    """{source: file text} for the knowledge base files; loads them on first use."""
+    return get_indexer().raw_docs
 
-def query_knowledge_base(vector_store, query, k=2):
-    """Queries the vector store for relevant documents."""
+def get_policy_table():
+    """The structured eligibility/fee/loan rules compiled from the knowledge base files."""
+    return get_indexer().policies
+
+def refresh_knowledge_base():
+    """Re-indexes changed files in the data directory right away instead of waiting for the watcher."""
+    return get_indexer().refresh()
+
+def _invalidate_results():
+    global _index_generation
+    _index_generation += 1
+    _result_cache.clear()
+
+def _embed_query(vector_store, query):
+    normalized = normalize_query(query)
+    embedding = _query_embedding_cache.get(normalized)
+    if embedding is None:
+        # Depending on the langchain version this is an Embeddings object or a bare embed_query function
+        embedding_function = vector_store.embedding_function
+        if hasattr(embedding_function, "embed_query"):
+            embedding = embedding_function.embed_query(normalized)
+        else:
+            embedding = embedding_function(normalized)
+        _query_embedding_cache.set(normalized, embedding)
+    return embedding
+
+def _embed_queries(vector_store, queries):
+    """Embeds normalized queries, sending every cache miss to the model in one batched call."""
+    embeddings = {query: _query_embedding_cache.get(query) for query in queries}
+    missing = [query for query, embedding in embeddings.items() if embedding is None]
+    if missing:
+        embedding_function = vector_store.embedding_function
+        if hasattr(embedding_function, "embed_documents"):
+            vectors = embedding_function.embed_documents(missing)
+        else:
+            vectors = [embedding_function(query) for query in missing]
+        for query, vector in zip(missing, vectors):
+            _query_embedding_cache.set(query, vector)
+            embeddings[query] = vector
+    return [embeddings[query] for query in queries]
+
+def get_retrieval_cache_stats():
+    """Hit/miss counters for the query-embedding and result caches."""
+    return {
+        "query_embeddings": _query_embedding_cache.stats(),
+        "results": _result_cache.stats(),
+    }
+
+def _dense_search(vector_store, queries, k, positions=None, ann_index=None):
+    """
+    Embeds normalized queries (cache misses in one model call) and searches them with one
+    matrix FAISS search, restricted to the given index positions if any. Unrestricted
+    searches use ann_index (an approximate index over the same positions) when given.
+    Returns one [(chunk id, Document)] list per query.
+    """
+    import faiss
+    from langchain.docstore.document import Document # Already loaded along with the index
+    if positions is not None and not positions:
+        return [[] for _ in queries]
+    matrix = np.asarray(_embed_queries(vector_store, queries), dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    hits = []
+    with _index_lock:
+        if positions is None:
+            _, indices = (ann_index if ann_index is not None else vector_store.index).search(matrix, k)
+        else:
+            # Only the selected vectors are compared against the queries (always exactly:
+            # a graph or IVF index would miss most of a small selection)
+            selector = faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+            _, indices = vector_store.index.search(matrix, min(k, len(positions)), params=faiss.SearchParameters(sel=selector))
+        for row in indices:
+            row_hits = []
+            for i in row:
+                if i == -1:  # fewer than k chunks in the index
+                    continue
+                chunk_id = vector_store.index_to_docstore_id[i]
+                doc = vector_store.docstore.search(chunk_id)
+                if isinstance(doc, Document):
+                    row_hits.append((chunk_id, doc))
+            hits.append(row_hits)
+    return hits
+
+def _cached_search(scope, queries, k, search):
+    """
+    Serves queries from the result cache; search(normalized queries) -> one Document
+    list per query is called once for all the misses. Duplicates are searched once.
+    """
+    normalized = [normalize_query(query) for query in queries]
+    cache_keys = [(scope, _index_generation, query, k) for query in normalized]
+    results = {key: _result_cache.get(key) for key in cache_keys}
+    pending = list(dict.fromkeys(key for key, value in results.items() if value is None))
+    if pending:
+        for key, docs in zip(pending, search([key[2] for key in pending])):
+            results[key] = docs
+            _result_cache.set(key, docs)
+    return [list(results[key]) for key in cache_keys]
+
+def query_knowledge_base(vector_store, query, k=2, source=None, course=None):
+    """
+    Queries the knowledge base (a Retriever, or a bare FAISS store) for relevant documents.
+    With a Retriever, source (a data/ file name without .txt) and course restrict the search.
+    """
+    if isinstance(vector_store, Retriever):
+        return query_knowledge_base_batch(vector_store, [query], k, source=source, course=course)[0]
+    if source is not None or course is not None:
+        raise TypeError("source/course filters need a Retriever (see get_retriever)")
     if vector_store:
         try:
-            results = vector_store.similarity_search(query, k=k)
-            return results
+            cache_key = (id(vector_store), _index_generation, normalize_query(query), k)
+            results = _result_cache.get(cache_key)
+            if results is None:
+                # Embed outside the lock so concurrent queries only serialize on the search itself
+                embedding = _embed_query(vector_store, query)
+                with _index_lock:
+                    results = vector_store.similarity_search_by_vector(embedding, k=k)
+                _result_cache.set(cache_key, results)
+            return list(results)
         except Exception as e:
             st.error(f"Error querying knowledge base: {e}")
             return []
     return []
 
-# Initialize KB globally (cached)
-vector_store, raw_docs_content = load_knowledge_base()
+def query_knowledge_base_batch(vector_store, queries, k=2, source=None, course=None):
+    """
+    Queries the knowledge base (a Retriever, or a bare FAISS store) for many queries at once.
+    Uncached queries are embedded in a single model call and searched with one
+    matrix FAISS search (and/or scored with BM25). Returns one result list per query, in the same order.
+    source/course filter as in query_knowledge_base; course may also be a list with one course per query.
+    """
+    if not isinstance(vector_store, Retriever) and (source is not None or course is not None):
+        raise TypeError("source/course filters need a Retriever (see get_retriever)")
+    if not vector_store or not queries:
+        return [[] for _ in queries]
+    try:
+        if isinstance(vector_store, Retriever):
+            courses = list(course) if isinstance(course, (list, tuple)) else [course] * len(queries)
+            by_course = {}
+            for i, query_course in enumerate(courses):
+                by_course.setdefault(query_course, []).append(i)
+            results = [None] * len(queries)
+            for query_course, positions in by_course.items():
+                scope = (id(vector_store.indexer), vector_store.effective_mode, source, query_course)
+                docs = _cached_search(scope, [queries[i] for i in positions], k,
+                                      lambda pending, query_course=query_course: vector_store.search(pending, k, source, query_course))
+                for i, result in zip(positions, docs):
+                    results[i] = result
+            return results
+        return _cached_search(id(vector_store), queries, k,
+                              lambda pending: [[doc for _, doc in hits] for hits in _dense_search(vector_store, pending, k)])
+    except Exception as e:
+        st.error(f"Error querying knowledge base: {e}")
+        return [[] for _ in queries]
@@ -0,0 +1,255 @@
+# Loan budget ledger: every change to the university's loan budget goes through
+# reserve/commit/release, so concurrent loan decisions (other threads, sessions or
+# processes) can never hand out more than the budget.
+import os
+import time
+import sqlite3
+import threading
+import streamlit as st
+from .db import DB_PATH
+
+MAX_RETRIES = 50  # optimistic write attempts before giving up on a contended operation
+
+# Hold states, one hold per application
+RESERVED = "reserved"
+COMMITTED = "committed"
+RELEASED = "released"
+
+_SCHEMA = """
+-- The current balance: one row, so reading the remaining budget is O(1).
+-- version is bumped by every write; writers only succeed against the version they read.
+CREATE TABLE IF NOT EXISTS budget_account (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    budget NUMERIC NOT NULL,
+    reserved NUMERIC NOT NULL,
+    committed NUMERIC NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS budget_holds (
+    app_id INTEGER PRIMARY KEY,
+    amount NUMERIC NOT NULL,
+    state TEXT NOT NULL
+);
+-- Append-only transaction log; replaying it reproduces the account (see verify).
+CREATE TABLE IF NOT EXISTS budget_transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    app_id INTEGER,
+    amount NUMERIC NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_budget_transactions_no_update BEFORE UPDATE ON budget_transactions
+BEGIN SELECT RAISE(ABORT, 'budget_transactions is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS trg_budget_transactions_no_delete BEFORE DELETE ON budget_transactions
+BEGIN SELECT RAISE(ABORT, 'budget_transactions is append-only'); END;
+"""
+
+# How each transaction kind moves the balance: (reserved, committed) deltas per unit of amount.
+# "budget" sets the budget outright and is handled separately.
+_EFFECTS = {
+    "reserve": (1, 0),
+    "commit": (-1, 1),
+    "release": (-1, 0),   # a reservation given back
+    "refund": (0, -1),    # a committed (approved) loan given back
+    "opening": (0, 1),    # loans approved before the ledger existed
+}
+
+class LedgerConflict(RuntimeError):
+    """A ledger write kept losing to concurrent writers."""
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value # Shown as $92500, not $92500.0
+
+class BudgetLedger:
+    """
+    Loan budget with reservations. A loan decision first reserves its amount (refused
+    if the budget can't cover it), then commits the reservation once the decision is
+    recorded, or releases it if the decision falls through.
+
+    Writes are optimistic: each operation decides against the account row it read and
+    only applies if the row's version is unchanged, retrying on a fresh read otherwise.
+    Operations are idempotent per application, so retrying a loan decision never
+    reserves twice.
+    """
+
+    def __init__(self, path=DB_PATH, budget=0):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM budget_account WHERE id = 1").fetchone() is None:
+                self._open(conn, budget)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _open(self, conn, budget):
+        # A new ledger starts from the loans already approved in the repository, if any
+        conn.execute("INSERT INTO budget_account (id, budget, reserved, committed, version) VALUES (1, ?, 0, 0, 0)", (budget,))
+        self._log(conn, 0, "budget", None, budget)
+        has_loans = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'loan_requests'").fetchone()
+        approved = conn.execute(
+            "SELECT app_id, amount FROM loan_requests WHERE status = 'Loan Approved'"
+        ).fetchall() if has_loans else []
+        for row in approved:
+            conn.execute("INSERT INTO budget_holds (app_id, amount, state) VALUES (?, ?, ?)", (row["app_id"], row["amount"], COMMITTED))
+            conn.execute("UPDATE budget_account SET committed = committed + ? WHERE id = 1", (row["amount"],))
+            self._log(conn, 0, "opening", row["app_id"], row["amount"])
+
+    def _log(self, conn, version, kind, app_id, amount):
+        conn.execute(
+            "INSERT INTO budget_transactions (version, kind, app_id, amount, created_at) VALUES (?, ?, ?, ?, ?)",
+            (version, kind, app_id, amount, time.time())
+        )
+
+    def _read(self, app_id=None):
+        conn = self._conn()
+        account = conn.execute("SELECT budget, reserved, committed, version FROM budget_account WHERE id = 1").fetchone()
+        hold = conn.execute("SELECT amount, state FROM budget_holds WHERE app_id = ?", (int(app_id),)).fetchone() if app_id is not None else None
+        return account, hold
+
+    def _apply(self, version, kind, app_id, amount, state=None):
+        """Applies one transaction if the account is still at `version`; returns False if it moved on."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if kind == "budget":
+                cursor = conn.execute(
+                    "UPDATE budget_account SET budget = ?, version = version + 1 WHERE id = 1 AND version = ?",
+                    (amount, version)
+                )
+            else:
+                reserved_delta, committed_delta = _EFFECTS[kind]
+                cursor = conn.execute(
+                    "UPDATE budget_account SET reserved = reserved + ?, committed = committed + ?, version = version + 1"
+                    " WHERE id = 1 AND version = ?",
+                    (reserved_delta * amount, committed_delta * amount, version)
+                )
+            if cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                return False
+            if state is not None:
+                conn.execute(
+                    "INSERT INTO budget_holds (app_id, amount, state) VALUES (?, ?, ?)"
+                    " ON CONFLICT(app_id) DO UPDATE SET amount = excluded.amount, state = excluded.state",
+                    (int(app_id), amount, state)
+                )
+            self._log(conn, version + 1, kind, app_id, amount)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Reads ---
+    def balance(self):
+        """{"budget", "reserved", "committed", "available", "version"}: a single row read."""
+        account, _ = self._read()
+        available = account["budget"] - account["reserved"] - account["committed"]
+        return {
+            "budget": _number(account["budget"]),
+            "reserved": _number(account["reserved"]),
+            "committed": _number(account["committed"]),
+            "available": _number(available),
+            "version": account["version"],
+        }
+
+    def available(self):
+        """Budget not reserved or committed to any loan."""
+        return self.balance()["available"]
+
+    def hold(self, app_id):
+        """{"amount", "state"} of an application's hold, or None."""
+        _, hold = self._read(app_id)
+        return {"amount": _number(hold["amount"]), "state": hold["state"]} if hold else None
+
+    def transactions(self, limit=100):
+        """The latest transactions, newest first."""
+        rows = self._conn().execute(
+            "SELECT seq, version, kind, app_id, amount, created_at FROM budget_transactions ORDER BY seq DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def verify(self):
+        """True if replaying the transaction log reproduces the account row."""
+        budget = reserved = committed = 0
+        for row in self._conn().execute("SELECT kind, amount FROM budget_transactions ORDER BY seq"):
+            if row["kind"] == "budget":
+                budget = row["amount"]
+            else:
+                reserved_delta, committed_delta = _EFFECTS[row["kind"]]
+                reserved += reserved_delta * row["amount"]
+                committed += committed_delta * row["amount"]
+        account, _ = self._read()
+        return (budget, reserved, committed) == (account["budget"], account["reserved"], account["committed"])
+
+    # --- Writes ---
+    def set_budget(self, budget):
+        """Sets the total loan budget (e.g. from the loan policy); a no-op if unchanged."""
+        for _ in range(MAX_RETRIES):
+            account, _ = self._read()
+            if account["budget"] == budget or self._apply(account["version"], "budget", None, budget):
+                return
+        raise LedgerConflict("Could not update the loan budget")
+
+    def reserve(self, app_id, amount):
+        """
+        Reserves `amount` for an application. Returns (reserved, available), where
+        available is what is left after the reservation, or what was left when it
+        was refused. An application that already holds a reservation or an approved
+        loan keeps it and gets (True, available).
+        """
+        for _ in range(MAX_RETRIES):
+            account, hold = self._read(app_id)
+            available = account["budget"] - account["reserved"] - account["committed"]
+            if hold is not None and hold["state"] != RELEASED:
+                return True, _number(available)
+            if amount > available:
+                return False, _number(available)
+            if self._apply(account["version"], "reserve", app_id, amount, RESERVED):
+                return True, _number(available - amount)
+        raise LedgerConflict(f"Could not reserve loan budget for application {app_id}")
+
+    def commit(self, app_id):
+        """Turns an application's reservation into an approved loan. False if it has no reservation."""
+        for _ in range(MAX_RETRIES):
+            account, hold = self._read(app_id)
+            if hold is None or hold["state"] == RELEASED:
+                return False
+            if hold["state"] == COMMITTED:
+                return True
+            if self._apply(account["version"], "commit", app_id, hold["amount"], COMMITTED):
+                return True
+        raise LedgerConflict(f"Could not commit loan budget for application {app_id}")
+
+    def release(self, app_id):
+        """Gives an application's reservation or approved loan back to the budget. False if there was nothing to release."""
+        for _ in range(MAX_RETRIES):
+            account, hold = self._read(app_id)
+            if hold is None or hold["state"] == RELEASED:
+                return False
+            kind = "release" if hold["state"] == RESERVED else "refund"
+            if self._apply(account["version"], kind, app_id, hold["amount"], RELEASED):
+                return True
+        raise LedgerConflict(f"Could not release loan budget for application {app_id}")
+
+@st.cache_resource
+def get_ledger():
+    """The process-wide loan budget ledger (stored alongside the applications)."""
+    return BudgetLedger()
@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import weakref
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 8.0
+
+# Errors worth retrying: timeouts, dropped connections, rate limits and 5xx from the API
+TRANSIENT_ERRORS = (asyncio.TimeoutError, TimeoutError, ConnectionError)
+try:
+    from google.api_core import exceptions as google_exceptions
+    TRANSIENT_ERRORS += (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+except ImportError:
+    pass
+
+class AsyncLLMClient:
+    """
+    asyncio front-end for a Gemini-style model (anything with generate_content,
+    and optionally generate_content_async).
+    Every call is bounded by a concurrency limit and a timeout, and transient
+    errors are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, model, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT_SECONDS,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY_SECONDS,
+                 max_delay=DEFAULT_MAX_DELAY_SECONDS):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # asyncio primitives belong to one event loop, and the sync wrapper runs a fresh loop per call
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self, limit=None):
+        if limit is not None:
+            return asyncio.Semaphore(limit)
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _call(self, prompt, **kwargs):
+        if hasattr(self.model, "generate_content_async"):
+            response = await self.model.generate_content_async(prompt, **kwargs)
+        else:
+            # Note: on timeout the worker thread still runs to completion; we just stop waiting for it
+            response = await asyncio.to_thread(self.model.generate_content, prompt, **kwargs)
+        return response.text.strip()
+
+    def _backoff(self, attempt):
+        # "Full jitter": spreads retries out so parallel callers don't hammer the API in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def generate(self, prompt, semaphore=None, **kwargs):
+        """Returns the model's reply text. Raises the last error once retries are exhausted."""
+        semaphore = semaphore or self._semaphore()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    return await asyncio.wait_for(self._call(prompt, **kwargs), timeout=self.timeout)
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    if isinstance(e, (asyncio.TimeoutError, TimeoutError)) and not str(e):
+                        raise TimeoutError(f"LLM call timed out after {self.timeout}s") from e
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def gather(self, prompts, max_concurrency=None, **kwargs):
+        """
+        Runs many prompts concurrently (at most max_concurrency in flight, default: the
+        client's limit). Returns replies in order; a failed prompt yields its exception.
+        """
+        semaphore = self._semaphore(max_concurrency)
+        return await asyncio.gather(
+            *(self.generate(prompt, semaphore=semaphore, **kwargs) for prompt in prompts),
+            return_exceptions=True
+        )
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code.
+    Streamlit scripts have no running event loop, so this is normally just asyncio.run;
+    if one is already running in this thread, the coroutine runs on a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result = {}
+    def _runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+    thread = threading.Thread(target=_runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+# -------------------------
+# Streaming
+# -------------------------
+class LLMStream:
+    """
+    Iterable over a reply's text chunks as they arrive (e.g. for st.write_stream).
+    Once consumed, .text holds the full reply, and time_to_first_token / total_seconds
+    are measured from the moment iteration starts (which is when the request is sent).
+    """
+
+    def __init__(self, chunks, on_complete=None, from_cache=False):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self.from_cache = from_cache
+        self.text = ""
+        self.time_to_first_token = None
+        self.total_seconds = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        parts = []
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - started
+            parts.append(chunk)
+            yield chunk
+        self.text = "".join(parts)
+        self.total_seconds = time.perf_counter() - started
+        if self._on_complete:
+            self._on_complete(self.text)
+
+def stream_chunks(model, prompt):
+    """Yields the reply text chunk by chunk (Gemini's generate_content(stream=True))."""
+    for chunk in model.generate_content(prompt, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # a chunk without text parts (e.g. only safety ratings)
+        if text:
+            yield text
+
+# -------------------------
+# Local Fake Model
+# -------------------------
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """
+    Local stand-in for genai.GenerativeModel, for running the agents without the API.
+    Replies are deterministic per prompt; latency and a rate of transient failures
+    are configurable so timeouts, retries and concurrency limits can be exercised.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, model_name="fake-model", seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.model_name = model_name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _reply(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        if fail:
+            raise ConnectionError("FakeModel: simulated transient failure")
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return FakeResponse(f"[{self.model_name} reply {digest}] {prompt[-200:]}")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    def _stream(self, prompt, chunk_words=4):
+        # The first chunk arrives after a fraction of the latency, the rest spread over the remainder
+        words = self._reply(prompt).text.split(" ")
+        chunks = [" ".join(words[i:i + chunk_words]) for i in range(0, len(words), chunk_words)]
+        time.sleep(self.latency * 0.2)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(self.latency * 0.8 / max(len(chunks) - 1, 1))
+            yield FakeResponse((" " if i else "") + chunk)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+def fake_model_from_env(model_name="fake-model"):
+    """
+    A FakeModel when LLM_BACKEND=fake (benchmarks, offline demos), else None.
+    Latency and failure rate come from LLM_FAKE_LATENCY (seconds) and LLM_FAKE_FAILURE_RATE.
+    """
+    if os.getenv("LLM_BACKEND", "gemini").lower() != "fake":
+        return None
+    return FakeModel(
+        latency=float(os.getenv("LLM_FAKE_LATENCY", 0)),
+        failure_rate=float(os.getenv("LLM_FAKE_FAILURE_RATE", 0)),
+        model_name=model_name,
+    )
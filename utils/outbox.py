@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import sqlite3
+import smtplib
+import threading
+from email.message import EmailMessage
+
+STORAGE_DIR = "storage"
+OUTBOX_PATH = os.path.join(STORAGE_DIR, "outbox.sqlite3")
+SENT_MAIL_PATH = os.path.join(STORAGE_DIR, "sent_mail.jsonl")
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_POLL_INTERVAL_SECONDS = 0.5
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Delivery states, as shown in the communication log
+QUEUED = "Queued"
+SENDING = "Sending"
+SENT = "Sent"
+FAILED = "Failed"
+
+# -------------------------
+# Transports
+# -------------------------
+class FileTransport:
+    """Local stand-in for a mail server: appends each delivered message to a JSON-lines file."""
+
+    def __init__(self, path=SENT_MAIL_PATH):
+        self.path = path
+
+    def send_batch(self, messages):
+        """Delivers a batch; returns {message_id: error or None}."""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps({**message, "delivered_at": time.time()}, default=str) + "\n")
+        return {message["id"]: None for message in messages}
+
+class SMTPDebugTransport:
+    """
+    Sends through an SMTP server, one connection per batch. Meant for a local
+    debugging server (e.g. `python -m aiosmtpd -n -l localhost:1025`), not a real relay.
+    """
+
+    def __init__(self, host="localhost", port=1025, sender="admissions@university.example"):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send_batch(self, messages):
+        results = {}
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            for message in messages:
+                email = EmailMessage()
+                email["From"] = self.sender
+                email["To"] = message["recipient"]
+                email["Subject"] = f"[Application {message['app_id']}] {message['type']}"
+                email.set_content(str(message["details"]))
+                try:
+                    smtp.send_message(email)
+                    results[message["id"]] = None
+                except smtplib.SMTPException as e:
+                    results[message["id"]] = str(e)
+        return results
+
+def transport_from_env():
+    """OUTBOX_TRANSPORT=smtp selects the SMTP debug transport (SMTP_HOST/SMTP_PORT); default is the file transport."""
+    if os.getenv("OUTBOX_TRANSPORT", "file").lower() == "smtp":
+        return SMTPDebugTransport(os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", 1025)))
+    return FileTransport()
+
+# -------------------------
+# Outbox
+# -------------------------
+class Outbox:
+    """
+    Durable (SQLite) queue of outgoing messages. Agents enqueue and return
+    immediately; a background dispatcher thread drains the queue in batches to
+    the transport and records each message's delivery status.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, transport=None, batch_size=DEFAULT_BATCH_SIZE,
+                 poll_interval=DEFAULT_POLL_INTERVAL_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.transport = transport or FileTransport()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL survives an application crash, which is what the queue needs to outlive
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, app_id TEXT, recipient TEXT, type TEXT, details TEXT,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT,"
+            " created_at REAL NOT NULL, available_at REAL NOT NULL, sent_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_status ON messages(status, id)")
+        # Messages claimed by a dispatcher that died mid-batch go back in the queue (delivery is at-least-once)
+        self._conn.execute("UPDATE messages SET status = ? WHERE status = ?", (QUEUED, SENDING))
+
+    def enqueue(self, app_id, recipient, message_type, details):
+        """Queues a message and returns its id without waiting for delivery."""
+        with self._lock:
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT INTO messages (app_id, recipient, type, details, status, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(app_id), recipient, message_type, str(details), QUEUED, now, now)
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def statuses(self, message_ids):
+        """Returns {message_id: {"status", "sent_at", "error"}} for the given ids."""
+        ids = list(message_ids)
+        rows = []
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            with self._lock:
+                rows += self._conn.execute(
+                    f"SELECT id, status, sent_at, error FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+        return {row[0]: {"status": row[1], "sent_at": row[2], "error": row[3]} for row in rows}
+
+    def _claim_batch(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, app_id, recipient, type, details, attempts FROM messages"
+                    " WHERE status = ? AND available_at <= ? ORDER BY id LIMIT ?",
+                    (QUEUED, time.time(), self.batch_size)
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE messages SET status = ? WHERE id IN ({','.join('?' * len(rows))})",
+                        [SENDING] + [row[0] for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        keys = ("id", "app_id", "recipient", "type", "details", "attempts")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def drain_once(self):
+        """Sends one batch of queued messages. Returns how many were delivered."""
+        batch = self._claim_batch()
+        if not batch:
+            return 0
+        try:
+            results = self.transport.send_batch(batch)
+        except Exception as e:
+            # The whole batch failed (e.g. SMTP server down): retry each message later
+            results = {message["id"]: str(e) for message in batch}
+
+        now = time.time()
+        updates = []
+        for message in batch:
+            error = results.get(message["id"], "No result from transport")
+            attempts = message["attempts"] + 1
+            if error is None:
+                updates.append((SENT, attempts, None, now, now, message["id"]))
+            else:
+                # Retry later with exponential backoff, until max_attempts
+                status = FAILED if attempts >= self.max_attempts else QUEUED
+                updates.append((status, attempts, error, None, now + min(60, 2 ** attempts), message["id"]))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE messages SET status = ?, attempts = ?, error = ?, sent_at = ?, available_at = ? WHERE id = ?", updates
+            )
+        return sum(1 for update in updates if update[0] == SENT)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.drain_once():
+                    continue  # more may be waiting; keep draining
+                # Nothing delivered: idle (or the transport is failing), so wait before polling again
+            except Exception as e:
+                print(f"Outbox dispatcher error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Starts the background dispatcher thread (idempotent)."""
+        if self._dispatcher and self._dispatcher.is_alive():
+            return
+        self._stop.clear()
+        self._dispatcher = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout)
+
+    def pending_count(self):
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE status IN (?, ?)", (QUEUED, SENDING)
+            ).fetchone()
+        return count
@@ -0,0 +1,100 @@
+# Batch orchestration of the agents: the "process all pending" path of the
+# Admission Officer view. The single-application buttons still call the agents directly.
+import time
+from .agents import (
+    check_documents,
+    verify_application_documents,
+    bulk_shortlisting_agent,
+    draft_communications,
+    deliver_communication,
+    prefetch_communication_context
+)
+
+DEFAULT_MAX_WORKERS = 8
+DRAFT_CHUNK_SIZE = 50  # drafts per progress update
+DOCUMENT_CHECK_STATUSES = ("Application Submitted", "Documents Incomplete")
+PENDING_STATUSES = DOCUMENT_CHECK_STATUSES + ("Documents Complete",)  # what a batch run moves forward
+
+def count_pending(applications):
+    """Number of applications the batch run would move forward."""
+    return sum(1 for app in applications if app['status'] in PENDING_STATUSES)
+
+def process_pending_applications(applications, max_workers=DEFAULT_MAX_WORKERS, on_progress=None):
+    """
+    Runs Check Docs -> Shortlist -> Communicate over every pending application.
+    Applications (dicts) are updated in place; the caller persists them (e.g. with
+    ApplicationRepository.update_many, in one transaction). Every uploaded file is verified in
+    one batch across a process pool, shortlisting runs in bulk, and the LLM-bound email drafts run concurrently through the
+    async LLM client (at most max_workers calls in flight), and the drafted messages
+    are then delivered from the calling thread (which owns the Streamlit session state).
+
+    on_progress(fraction, text) is called as stages advance.
+    Returns {"stages": [{"stage", "applications", "seconds"}], "failed": [(app_id, error)]}.
+    """
+    stages = []
+    failed = []
+    to_notify = []
+
+    def _progress(fraction, text):
+        if on_progress:
+            on_progress(min(fraction, 1.0), text)
+
+    # --- Stage 1: document checks ---
+    started = time.perf_counter()
+    to_check = [app for app in applications if app['status'] in DOCUMENT_CHECK_STATUSES]
+    # Every file in the batch is verified at once, across the verifier's process pool
+    all_verdicts = verify_application_documents(to_check)
+    checked = 0
+    for app, verdicts in zip(to_check, all_verdicts):
+        previous_status = app['status']
+        app['status'], app['status_details'] = check_documents(app, verdicts)
+        checked += 1
+        # Same rule as the single-application flow: only incomplete documents trigger a message,
+        # and an application that was already incomplete isn't notified again.
+        if app['status'] == "Documents Incomplete" and previous_status != "Documents Incomplete":
+            to_notify.append(app)
+    stages.append({"stage": "Document Check", "applications": checked, "seconds": time.perf_counter() - started})
+    _progress(0.1, f"Checked documents for {checked} application(s).")
+
+    # --- Stage 2: shortlisting (vectorized) ---
+    started = time.perf_counter()
+    pending = [app for app in applications if app['status'] == "Documents Complete"]
+    if pending:
+        decided_df, _ = bulk_shortlisting_agent(pending)
+        for app, status, details in zip(pending, decided_df['status'], decided_df['status_details']):
+            app['status'], app['status_details'] = status, details
+            to_notify.append(app)
+    stages.append({"stage": "Shortlisting", "applications": len(pending), "seconds": time.perf_counter() - started})
+    _progress(0.2, f"Shortlisted {len(pending)} application(s).")
+
+    # --- Stage 3: draft communications concurrently ---
+    started = time.perf_counter()
+    contexts, fee_infos = prefetch_communication_context(to_notify)
+    drafts = [None] * len(to_notify)
+    # Drafted in chunks only so progress can be reported between them
+    for start in range(0, len(to_notify), DRAFT_CHUNK_SIZE):
+        chunk = slice(start, start + DRAFT_CHUNK_SIZE)
+        for i, (comm_type, message_body) in enumerate(
+            draft_communications(to_notify[chunk], contexts=contexts[chunk], max_concurrency=max_workers), start=start
+        ):
+            if message_body.startswith("Error:"):
+                failed.append((to_notify[i]['id'], message_body))
+            else:
+                drafts[i] = (comm_type, message_body)
+        done = min(start + DRAFT_CHUNK_SIZE, len(to_notify))
+        _progress(0.2 + 0.7 * done / len(to_notify), f"Drafted {done}/{len(to_notify)} message(s).")
+    stages.append({"stage": "Draft Communications", "applications": len(to_notify), "seconds": time.perf_counter() - started})
+
+    # --- Stage 4: deliver ---
+    started = time.perf_counter()
+    delivered = 0
+    for app, draft, fee_info in zip(to_notify, drafts, fee_infos):
+        if draft is None:
+            continue
+        comm_type, message_body = draft
+        deliver_communication(app, comm_type, message_body, fee_info)
+        delivered += 1
+    stages.append({"stage": "Deliver Communications", "applications": delivered, "seconds": time.perf_counter() - started})
+    _progress(1.0, f"Done: {delivered} message(s) sent, {len(failed)} failed.")
+
+    return {"stages": stages, "failed": failed}
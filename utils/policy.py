@@ -0,0 +1,134 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Source files (data/<name>.txt) the policy table is compiled from
+POLICY_SOURCES = ("eligibility_criteria", "fee_structure", "loan_policy")
+
+_COURSE_RE = re.compile(r"^-?\s*Course:\s*(?P<course>.+?)\s*$")
+_MIN_PERCENTAGE_RE = re.compile(r"Minimum\s*_PERCENTAGE_\s*:\s*(?P<value>\d+(?:\.\d+)?)\s*%(?:\s*in\s*(?P<qualification>[^.(]+))?")
+_FEE_LINE_RE = re.compile(r"^-\s*(?P<course>[^:(]+?)\s*\((?P<period>[^)]+)\)\s*:\s*(?P<items>.+)$")
+_FEE_ITEM_RE = re.compile(r"(?P<item>[A-Za-z]+)\s*\$(?P<amount>[\d,]+(?:\.\d+)?)")
+_LOAN_MAX_RE = re.compile(r"Up to\s*(?P<value>\d+(?:\.\d+)?)\s*%\s*of\s*Tuition", re.IGNORECASE)
+_LOAN_MIN_SCORE_RE = re.compile(r"Minimum academic score:\s*(?P<value>\d+(?:\.\d+)?)\s*%", re.IGNORECASE)
+_LOAN_BUDGET_RE = re.compile(r"Budget:\s*\$(?P<value>[\d,]+(?:\.\d+)?)", re.IGNORECASE)
+
+@dataclass(frozen=True)
+class CoursePolicy:
+    """Eligibility and fee rules for one course."""
+    course: str
+    min_percentage: Optional[float] = None
+    qualification: Optional[str] = None  # e.g. "12th Grade"
+    tuition_fee: Optional[float] = None
+    hostel_fee: Optional[float] = None
+    other_fee: Optional[float] = None
+    total_fee: Optional[float] = None
+    fee_period: Optional[str] = None  # e.g. "Annual"
+
+@dataclass(frozen=True)
+class LoanPolicy:
+    """University-wide student loan rules."""
+    max_loan_fraction: Optional[float] = None  # of the tuition fee
+    min_academic_score: Optional[float] = None
+    budget: Optional[float] = None
+
+def _course_family(course):
+    # "B.Tech Data Science" -> "B.Tech", "MBA" -> "MBA"
+    return course.split()[0] if course else ""
+
+def _amount(text):
+    return float(text.replace(",", ""))
+
+class PolicyTable:
+    """
+    Per-course rules compiled from the knowledge base text files.
+    Lookups are dictionary hits: a course without its own entry resolves to its
+    family (e.g. every "B.Tech ..." course uses the B.Tech fees and the first
+    B.Tech eligibility rule listed), and the resolution is memoized.
+    """
+
+    def __init__(self, courses: Dict[str, CoursePolicy], loan: LoanPolicy):
+        self.courses = courses
+        self.loan = loan
+        self._resolved = dict(courses)
+
+    def for_course(self, course) -> Optional[CoursePolicy]:
+        """Returns the rules for a course, or None if the knowledge base has none for it."""
+        if course in self._resolved:
+            return self._resolved[course]
+        policy = self.courses.get(_course_family(course or ""))
+        self._resolved[course] = policy
+        return policy
+
+def _parse_eligibility(text):
+    """Returns {course: (min_percentage, qualification)} in file order."""
+    rules = {}
+    current_course = None
+    for line in text.splitlines():
+        course_match = _COURSE_RE.match(line.strip())
+        if course_match:
+            current_course = course_match.group("course")
+            continue
+        percentage_match = _MIN_PERCENTAGE_RE.search(line)
+        if percentage_match and current_course:
+            qualification = percentage_match.group("qualification")
+            rules[current_course] = (float(percentage_match.group("value")), qualification.strip() if qualification else None)
+            current_course = None
+    return rules
+
+def _parse_fees(text):
+    """Returns {course or family: {"period", "tuition", "hostel", "other", "total"}}."""
+    fees = {}
+    for line in text.splitlines():
+        match = _FEE_LINE_RE.match(line.strip())
+        if not match:
+            continue
+        items = {item.group("item").lower(): _amount(item.group("amount")) for item in _FEE_ITEM_RE.finditer(match.group("items"))}
+        if items:
+            fees[match.group("course")] = {"period": match.group("period"), **items}
+    return fees
+
+def _parse_loan_policy(text):
+    max_match = _LOAN_MAX_RE.search(text)
+    min_score_match = _LOAN_MIN_SCORE_RE.search(text)
+    budget_match = _LOAN_BUDGET_RE.search(text)
+    return LoanPolicy(
+        max_loan_fraction=float(max_match.group("value")) / 100 if max_match else None,
+        min_academic_score=float(min_score_match.group("value")) if min_score_match else None,
+        budget=_amount(budget_match.group("value")) if budget_match else None,
+    )
+
+def compile_policies(raw_docs):
+    """
+    Parses the eligibility, fee and loan policy files (as loaded into raw_docs,
+    keyed by file name without .txt) into a PolicyTable.
+    Missing files or lines just leave the corresponding fields as None.
+    """
+    eligibility = _parse_eligibility(raw_docs.get("eligibility_criteria", ""))
+    fees = _parse_fees(raw_docs.get("fee_structure", ""))
+
+    def _policy(course, rule, fee):
+        min_percentage, qualification = rule or (None, None)
+        fee = fee or {}
+        tuition, hostel, other = fee.get("tuition"), fee.get("hostel"), fee.get("other")
+        total = fee.get("total")
+        if total is None and tuition is not None:
+            total = tuition + (hostel or 0) + (other or 0)
+        return CoursePolicy(
+            course=course, min_percentage=min_percentage, qualification=qualification,
+            tuition_fee=tuition, hostel_fee=hostel, other_fee=other, total_fee=total,
+            fee_period=fee.get("period"),
+        )
+
+    courses = {}
+    for course, rule in eligibility.items():
+        fee = fees.get(course) or fees.get(_course_family(course))
+        courses[course] = _policy(course, rule, fee)
+    # Family-level entries, so e.g. "B.Tech Data Science" still gets B.Tech fees and eligibility
+    for family in {_course_family(course) for course in list(eligibility) + list(fees)}:
+        if family in courses:
+            continue
+        rule = next((rule for course, rule in eligibility.items() if _course_family(course) == family), None)
+        courses[family] = _policy(family, rule, fees.get(family))
+
+    return PolicyTable(courses, _parse_loan_policy(raw_docs.get("loan_policy", "")))
@@ -0,0 +1,86 @@
+# Content-addressed storage for uploaded documents: each file is streamed to disk in
+# chunks while it is hashed, and stored once under its SHA-256 however often it is uploaded.
+import os
+import hashlib
+import tempfile
+import mimetypes
+import streamlit as st
+
+UPLOADS_DIR = os.path.join("storage", "uploads")
+CHUNK_SIZE = 1024 * 1024  # bytes read and written per step
+
+class UploadTooLarge(ValueError):
+    """The upload went over the size limit while it was being stored."""
+
+class UploadStore:
+    """
+    Stores uploads at objects/<first two hex digits>/<sha256>. A file is written to a
+    temporary file chunk by chunk (never held in memory whole), hashed on the way,
+    and then either moved into place or, if that content is already stored, discarded.
+    """
+
+    def __init__(self, root=UPLOADS_DIR, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path_for(self, sha256):
+        """Where the content with this hash is (or would be) stored."""
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self.path_for(sha256))
+
+    def store(self, fileobj, filename, max_bytes=None):
+        """
+        Streams a file-like object (e.g. an st.file_uploader result) into the store.
+        Returns the reference to keep on the application: {"filename", "size",
+        "sha256", "path", "content_type", "deduplicated"}. Raises UploadTooLarge as
+        soon as more than max_bytes have been read; nothing is kept in that case.
+        """
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLarge(f"'{filename}' is larger than {max_bytes / (1024 * 1024):g}MB.")
+                    digest.update(chunk)
+                    out.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256)
+            deduplicated = os.path.exists(path)
+            if deduplicated:
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path) # Atomic: readers never see a partly written object
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {
+            "filename": filename,
+            "size": size,
+            "sha256": sha256,
+            "path": path,
+            "content_type": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            "deduplicated": deduplicated,
+        }
+
+    def open(self, reference):
+        """Opens a stored upload (a reference returned by store) for reading."""
+        return open(self.path_for(reference["sha256"]), "rb")
+
+@st.cache_resource
+def get_upload_store():
+    """The process-wide upload store."""
+    return UploadStore()
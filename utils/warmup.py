@@ -0,0 +1,37 @@
+# Background warm-up: once the landing page has rendered, load the slow resources
+# (embedding model + FAISS index, intent router, Gemini client) in a daemon thread,
+# so the first agent call on another page doesn't pay for them.
+import os
+import time
+import threading
+
+_started = False
+_lock = threading.Lock()
+
+def _warm_up():
+    # Imported here so that importing this module stays free
+    from .knowledge_base import get_indexer
+    from .agents import get_intent_router
+    from .helpers import get_llm_client
+    for name, load in (("knowledge base", get_indexer), ("intent router", get_intent_router), ("Gemini client", get_llm_client)):
+        started = time.perf_counter()
+        try:
+            load()
+            print(f"Warm-up: {name} ready in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Warm-up: {name} failed: {e}")
+
+def start_warmup():
+    """
+    Starts the warm-up thread, once per process. Set WARMUP=0 to turn it off (everything
+    is still loaded on first use). Returns True if this call started it.
+    """
+    global _started
+    if os.getenv("WARMUP", "1") == "0":
+        return False
+    with _lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    return True